@@ -1,17 +1,155 @@
+import re
 import json
+import math
 import boto3
 import uuid
+import time
+import base64
+import binascii
+import threading
+import zlib
+from types import SimpleNamespace
+from collections import OrderedDict
 from datetime import datetime
 from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.table import BatchWriter
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from emf_metrics import Metrics, instrument_client
 
-# Initialize DynamoDB client
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table('ServerlessAPI-Items')
+# The redis package is only needed for the optional external cache backend
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# orjson is an optional faster JSON encoder (add it through a Lambda layer)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# DynamoDB client settings. The client is created on first use rather than at
+# import time and reused for the life of the container. This does not make cold
+# starts faster: building it moves from init into the first request that reaches
+# DynamoDB. Only containers whose requests never reach DynamoDB (cache hits,
+# validation errors) skip the cost.
+TABLE_NAME = 'ServerlessAPI-Items'
+# 'resource' uses the boto3 Table resource; 'client' uses the low-level client,
+# which skips loading the resource model and starts faster
+DYNAMODB_INTERFACE = 'resource'
+DYNAMODB_ENDPOINT_URL = None  # e.g. 'http://localhost:8000' for DynamoDB Local
+BOTO_CONFIG = Config(
+    connect_timeout=2,
+    read_timeout=5,
+    retries={'max_attempts': 3, 'mode': 'standard'},
+    # Keep connections alive between warm invocations, with enough of them for
+    # the parallel scan threads
+    tcp_keepalive=True,
+    max_pool_connections=16
+)
+
+dynamodb = None
+table = None
+client_lock = threading.Lock()  # parallel scan and shard query threads may ask for the table concurrently
+
+# Pagination settings for GET /items. Every page is a single bounded Scan call
+# per segment, so latency and payload size stay flat as the table grows.
+DEFAULT_PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 1000
+
+# Parallel scan for admin bulk exports (GET /items?segments=N). Each segment is
+# scanned on its own worker thread and the cursor tracks every segment.
+MAX_SCAN_SEGMENTS = 8
+
+# Secondary indexes the query planner may use for filtered listing
+# (GET /items?name=...&created_after=...&created_before=...). Create them with
+# projection type ALL. The item_type index lets created_at ranges be queried
+# without a name. Its partition key is spread over ITEM_TYPE_SHARDS values
+# (item#0 ... item#7, picked from the id) so that writes do not all land on one
+# hot partition; a range query reads every shard in parallel and merges them.
+# Changing ITEM_TYPE_SHARDS means backfilling item_type on existing items.
+ITEM_TYPE_ATTRIBUTE = 'item_type'
+ITEM_TYPE_VALUE = 'item'
+ITEM_TYPE_SHARDS = 8
+RANGE_ATTRIBUTE = 'created_at'
+SECONDARY_INDEXES = [
+    {'name': 'name-created_at-index', 'partition_key': 'name', 'sort_key': 'created_at'},
+    {'name': 'item_type-created_at-index', 'partition_key': ITEM_TYPE_ATTRIBUTE, 'sort_key': 'created_at'}
+]
+
+# Query string parameters that control listing; any other parameter is an
+# attribute equality filter
+LIST_PARAMETERS = ('limit', 'next_token', 'fields', 'segments', 'created_after', 'created_before')
+
+# Field selection (GET /items?fields=name,price) is sent as a ProjectionExpression
+MAX_PROJECTION_FIELDS = 20
+FIELD_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_\-]+$')
+
+# Read-through cache for GET /items/{id}, kept across warm invocations.
+# 'none' disables it, 'memory' keeps an LRU in the Lambda container and 'redis'
+# adds a shared external tier (e.g. ElastiCache) behind the in-process LRU.
+# update_item and delete_item invalidate entries; other containers only see the
+# change once their copy expires, so keep the TTL short.
+CACHE_BACKEND = 'memory'
+CACHE_TTL_SECONDS = 30
+CACHE_MAX_ENTRIES = 1024
+CACHE_REDIS_URL = ''  # e.g. 'redis://my-cache.xxxxxx.use1.cache.amazonaws.com:6379/0'
+CACHE_REDIS_TIMEOUT_SECONDS = 0.2
+CACHE_KEY_PREFIX = 'serverless-api:item:'
+
+item_cache = None
+
+# Optimistic concurrency: every item carries a version number that is returned
+# as the ETag header. Sending it back in If-Match on PUT/DELETE makes the write
+# fail with 412 if someone else modified the item in the meantime.
+VERSION_ATTRIBUTE = 'version'
+
+# Response encoding: 'auto' uses orjson when it is installed, 'json' always
+# uses the standard library encoder
+JSON_BACKEND = 'auto'
+
+# Batch endpoints (POST /items:batch, /items:batchGet, /items:batchDelete).
+# Requests are split into DynamoDB's per-call limits: 25 items for
+# BatchWriteItem and 100 keys for BatchGetItem.
+MAX_BATCH_REQUEST_ITEMS = 1000
+BATCH_WRITE_CHUNK_SIZE = 25
+BATCH_GET_CHUNK_SIZE = 100
+BATCH_GET_MAX_RETRIES = 5
+BATCH_GET_RETRY_BASE_DELAY = 0.05
+BATCH_PATH_PATTERN = re.compile(r'/items[:/](batch|batchGet|batchDelete)/?$')
+
+# Metrics are written to the function's log as CloudWatch Embedded Metric
+# Format: one line per invocation, turned into metrics by CloudWatch Logs. The
+# recorder comes from emf_metrics.py, which is deployed next to this file
+METRICS_ENABLED = True
+METRICS_NAMESPACE = 'ServerlessAPI'
+METRICS_SERVICE = 'items-api'
+metrics = None
 
 def lambda_handler(event, context):
     """
     Main Lambda handler for CRUD operations on DynamoDB
     Supports GET, POST, PUT, DELETE operations
+    
+    Request latency, DynamoDB calls and JSON encoding are timed and written as
+    one EMF metrics line per invocation, with the API Gateway route as a dimension.
+    """
+    metrics = get_metrics()
+    started = time.perf_counter()
+    response = route_request(event)
+    
+    metrics.record('RequestLatency', (time.perf_counter() - started) * 1000)
+    metrics.count('Requests')
+    metrics.count(f"Status{response['statusCode'] // 100}xx")
+    metrics.flush({'Route': f"{event.get('httpMethod')} {event.get('resource') or '/items'}"})
+    return response
+
+def route_request(event):
+    """
+    Route an API Gateway request to the handler for its method and path
     """
     
     try:
@@ -25,20 +163,24 @@ def lambda_handler(event, context):
                 # GET /items/{id} - Get specific item
                 return get_item(path_parameters['id'])
             else:
-                # GET /items - Get all items
-                return get_all_items()
+                # GET /items - Get a page of items
+                return get_all_items(event.get('queryStringParameters') or {})
                 
         elif http_method == 'POST':
+            batch_match = BATCH_PATH_PATTERN.search(event.get('path') or '')
+            if batch_match:
+                # POST /items:batch, /items:batchGet, /items:batchDelete
+                return handle_batch_request(batch_match.group(1), event.get('body'))
             # POST /items - Create new item
             return create_item(event.get('body'))
             
         elif http_method == 'PUT':
             # PUT /items/{id} - Update existing item
-            return update_item(path_parameters['id'], event.get('body'))
+            return update_item(path_parameters['id'], event.get('body'), event.get('headers'))
             
         elif http_method == 'DELETE':
             # DELETE /items/{id} - Delete item
-            return delete_item(path_parameters['id'])
+            return delete_item(path_parameters['id'], event.get('headers'))
             
         else:
             return create_response(405, {'error': 'Method not allowed'})
@@ -47,38 +189,480 @@ def lambda_handler(event, context):
         print(f"Error: {str(e)}")
         return create_response(500, {'error': 'Internal server error', 'details': str(e)})
 
-def get_all_items():
+def get_all_items(query_parameters=None):
     """
-    Retrieve all items from DynamoDB table
+    Retrieve one page of items from DynamoDB table
+    
+    Filters are served by a secondary index Query when one matches, otherwise by
+    a filtered Scan. The response's query_plan reports which path was used.
+    
+    Query parameters:
+        limit: Maximum number of items to return (default 100, max 1000)
+        next_token: Opaque cursor returned by the previous page
+        fields: Comma-separated attribute names to return (id is always included)
+        segments: Number of parallel scan segments for bulk exports (max 8)
+        created_after, created_before: Inclusive created_at range (ISO 8601)
+        any other attribute: Equality filter on that (string) attribute
     """
     try:
-        response = table.scan()
-        items = response.get('Items', [])
+        query_parameters = query_parameters or {}
         
-        # Convert Decimal objects to float for JSON serialization
-        items = convert_decimals(items)
+        try:
+            limit = parse_limit(query_parameters.get('limit'))
+            projection = build_projection(query_parameters.get('fields'))
+            plan = plan_query(*parse_filters(query_parameters))
+            if query_parameters.get('next_token'):
+                total_segments, cursors, index_name = decode_next_token(query_parameters['next_token'])
+                if index_name != plan['index']:
+                    raise ValueError('next_token does not belong to this query')
+            elif plan['path'] == 'query':
+                total_segments = plan['shards']
+                cursors = {segment: None for segment in range(total_segments)}
+            else:
+                total_segments = parse_segments(query_parameters.get('segments'))
+                # None marks a segment that has not been started yet
+                cursors = {segment: None for segment in range(total_segments)}
+        except ValueError as e:
+            return create_response(400, {'error': str(e)})
+        
+        arguments = merge_expression_arguments(plan['arguments'], projection)
+        if plan['path'] == 'scan':
+            items, cursors = scan_page(total_segments, cursors, limit, arguments)
+        elif plan['shards'] > 1:
+            items, cursors = query_shards(plan, cursors, limit, arguments)
+        else:
+            items, last_key = query_index(plan['index'], cursors[0], limit, arguments)
+            cursors = {0: last_key} if last_key else {}
         
-        return create_response(200, {
+        body = {
             'items': items,
-            'count': len(items)
-        })
+            'count': len(items),
+            'query_plan': {'path': plan['path'], 'index': plan['index']}
+        }
+        if cursors:
+            body['next_token'] = encode_next_token(total_segments, cursors, plan['index'])
+        
+        return create_response(200, body)
         
     except Exception as e:
         print(f"Error getting all items: {str(e)}")
         return create_response(500, {'error': 'Could not retrieve items'})
 
+def parse_filters(query_parameters):
+    """
+    Split listing query parameters into equality filters and a created_at range
+    
+    Returns:
+        Tuple of (dict of attribute -> value, (created_after, created_before))
+    """
+    equality = {}
+    for name, value in query_parameters.items():
+        if name in LIST_PARAMETERS:
+            continue
+        if not FIELD_NAME_PATTERN.match(name):
+            raise ValueError(f'Invalid filter attribute: {name}')
+        equality[name] = value
+    
+    created_range = (query_parameters.get('created_after') or None, query_parameters.get('created_before') or None)
+    if created_range[0] and created_range[1] and created_range[0] > created_range[1]:
+        raise ValueError('created_after must not be later than created_before')
+    
+    return equality, created_range
+
+def plan_query(equality, created_range):
+    """
+    Pick the cheapest access path for a set of filters
+    
+    An index is usable when its partition key has an equality filter (or is the
+    sharded item_type key and a created_at range was given). Among usable
+    indexes, one whose sort key is also constrained wins. Conditions the key
+    cannot express become a FilterExpression, which still reads (and bills) the
+    items it discards.
+    
+    Returns:
+        Dict with path ('query' or 'scan'), index name (or None), the
+        expression arguments for the call and, for queries, the number of
+        item_type shards to read (1 for any other index)
+    """
+    range_condition = None
+    if created_range[0] and created_range[1]:
+        range_condition = (RANGE_ATTRIBUTE, 'BETWEEN', list(created_range))
+    elif created_range[0]:
+        range_condition = (RANGE_ATTRIBUTE, '>=', [created_range[0]])
+    elif created_range[1]:
+        range_condition = (RANGE_ATTRIBUTE, '<=', [created_range[1]])
+    
+    best = None
+    best_score = 0
+    for index in SECONDARY_INDEXES:
+        partition_key = index['partition_key']
+        sort_key = index.get('sort_key')
+        if partition_key in equality:
+            partition_value = equality[partition_key]
+        elif partition_key == ITEM_TYPE_ATTRIBUTE and range_condition and sort_key == RANGE_ATTRIBUTE:
+            partition_value = ITEM_TYPE_VALUE
+        else:
+            continue
+        
+        key_conditions = [(partition_key, '=', [partition_value])]
+        if sort_key in equality:
+            key_conditions.append((sort_key, '=', [equality[sort_key]]))
+        elif sort_key == RANGE_ATTRIBUTE and range_condition:
+            key_conditions.append(range_condition)
+        
+        # Prefer a real partition key over the sharded one, then a constrained sort key
+        score = (2 if partition_key in equality else 1) * 2 + len(key_conditions)
+        if score > best_score:
+            best, best_score = (index, key_conditions), score
+    
+    filter_conditions = [(name, '=', [value]) for name, value in equality.items()]
+    if range_condition:
+        filter_conditions.append(range_condition)
+    
+    arguments = {'ExpressionAttributeNames': {}, 'ExpressionAttributeValues': {}}
+    if best is None:
+        if filter_conditions:
+            arguments['FilterExpression'] = build_conditions(filter_conditions, 'c', arguments)
+        return {'path': 'scan', 'index': None, 'arguments': compact_arguments(arguments)}
+    
+    index, key_conditions = best
+    key_attributes = {condition[0] for condition in key_conditions}
+    filter_conditions = [condition for condition in filter_conditions if condition[0] not in key_attributes]
+    arguments['IndexName'] = index['name']
+    arguments['KeyConditionExpression'] = build_conditions(key_conditions, 'k', arguments)
+    if filter_conditions:
+        arguments['FilterExpression'] = build_conditions(filter_conditions, 'c', arguments)
+    sharded = index['partition_key'] == ITEM_TYPE_ATTRIBUTE and ITEM_TYPE_ATTRIBUTE not in equality
+    return {
+        'path': 'query',
+        'index': index['name'],
+        'arguments': compact_arguments(arguments),
+        'shards': ITEM_TYPE_SHARDS if sharded else 1
+    }
+
+def build_conditions(conditions, prefix, arguments):
+    """
+    Render (attribute, operator, operands) conditions as an AND expression
+    
+    Names and values are added to the expression attribute maps in arguments.
+    """
+    clauses = []
+    for index, (attribute, operator, operands) in enumerate(conditions):
+        name = f'#{prefix}{index}'
+        arguments['ExpressionAttributeNames'][name] = attribute
+        placeholders = []
+        for position, operand in enumerate(operands):
+            placeholder = f':{prefix}{index}_{position}'
+            arguments['ExpressionAttributeValues'][placeholder] = operand
+            placeholders.append(placeholder)
+        if operator == 'BETWEEN':
+            clauses.append(f'{name} BETWEEN {placeholders[0]} AND {placeholders[1]}')
+        else:
+            clauses.append(f'{name} {operator} {placeholders[0]}')
+    return ' AND '.join(clauses)
+
+def compact_arguments(arguments):
+    """
+    Drop empty expression attribute maps, which DynamoDB rejects
+    """
+    return {key: value for key, value in arguments.items() if value}
+
+def merge_expression_arguments(arguments, projection):
+    """
+    Combine planner arguments with ProjectionExpression arguments
+    """
+    if not projection:
+        return arguments
+    merged = dict(arguments)
+    merged['ProjectionExpression'] = projection['ProjectionExpression']
+    merged['ExpressionAttributeNames'] = {
+        **arguments.get('ExpressionAttributeNames', {}),
+        **projection['ExpressionAttributeNames']
+    }
+    return merged
+
+def query_index(index_name, start_key, limit, arguments):
+    """
+    Run a single Query call against a secondary index
+    
+    Returns:
+        Tuple of (items, LastEvaluatedKey or None)
+    """
+    query_kwargs = dict(arguments, Limit=limit)
+    if start_key:
+        query_kwargs['ExclusiveStartKey'] = start_key
+    response = get_table().query(**query_kwargs)
+    return response.get('Items', []), response.get('LastEvaluatedKey')
+
+def item_type_value(item_id):
+    """
+    item_type shard of an item, e.g. 'item#3'
+    """
+    return f"{ITEM_TYPE_VALUE}#{zlib.crc32(item_id.encode('utf-8')) % ITEM_TYPE_SHARDS}"
+
+def query_shards(plan, cursors, limit, arguments):
+    """
+    Query every unfinished item_type shard in parallel and merge the results
+    
+    Each shard reads limit / shards items rounded up, in created_at order. A
+    shard that stopped early has only been read up to its LastEvaluatedKey, so
+    the page keeps the items up to the earliest of those positions (and at
+    most limit of them). Pages therefore stay in created_at order across
+    shards, and every shard resumes after the last item it actually returned.
+    
+    Returns:
+        Tuple of (items, cursors) like scan_page
+    """
+    shards = sorted(cursors)
+    per_shard_limit = max(1, math.ceil(limit / len(shards)))
+    
+    # The merge and the cursors need created_at even if fields leaves it out
+    query_arguments = dict(arguments)
+    names = arguments.get('ExpressionAttributeNames', {})
+    projection = arguments.get('ProjectionExpression')
+    strip_created_at = projection and RANGE_ATTRIBUTE not in {
+        names[placeholder.strip()] for placeholder in projection.split(',')
+    }
+    if strip_created_at:
+        query_arguments['ProjectionExpression'] = f'{projection}, #shard_sort'
+        query_arguments['ExpressionAttributeNames'] = {**names, '#shard_sort': RANGE_ATTRIBUTE}
+    
+    client = get_table().meta.client
+    
+    def query_shard(shard):
+        # The partition key is the first key condition, so its value is :k0_0
+        query_kwargs = dict(query_arguments, TableName=TABLE_NAME, Limit=per_shard_limit)
+        query_kwargs['ExpressionAttributeValues'] = {
+            **query_arguments['ExpressionAttributeValues'],
+            ':k0_0': f'{ITEM_TYPE_VALUE}#{shard}'
+        }
+        if cursors[shard]:
+            query_kwargs['ExclusiveStartKey'] = cursors[shard]
+        response = client.query(**query_kwargs)
+        return response.get('Items', []), response.get('LastEvaluatedKey')
+    
+    with ThreadPoolExecutor(max_workers=len(shards)) as executor:
+        results = list(executor.map(query_shard, shards))
+    
+    position = lambda item: (item[RANGE_ATTRIBUTE], item['id'])
+    stops = [position(last_key) for _, last_key in results if last_key]
+    boundary = min(stops) if stops else None
+    candidates = sorted(
+        (item for shard_items, _ in results for item in shard_items
+         if boundary is None or position(item) <= boundary),
+        key=position
+    )
+    kept = {item['id'] for item in candidates[:limit]}
+    
+    items = []
+    next_cursors = {}
+    for shard, (shard_items, last_key) in zip(shards, results):
+        # Only a leading run of each shard is returned, so its cursor skips nothing
+        returned = []
+        for item in shard_items:
+            if item['id'] not in kept:
+                break
+            returned.append(item)
+        items.extend(returned)
+        if len(returned) < len(shard_items):
+            # An empty key restarts a shard that has returned nothing yet
+            next_cursors[shard] = ({
+                'id': returned[-1]['id'],
+                ITEM_TYPE_ATTRIBUTE: f'{ITEM_TYPE_VALUE}#{shard}',
+                RANGE_ATTRIBUTE: returned[-1][RANGE_ATTRIBUTE]
+            } if returned else (cursors[shard] or {}))
+        elif last_key:
+            next_cursors[shard] = last_key
+    
+    items.sort(key=position)
+    if strip_created_at:
+        for item in items:
+            item.pop(RANGE_ATTRIBUTE, None)
+    return items, next_cursors
+
+def scan_page(total_segments, cursors, limit, arguments):
+    """
+    Scan the next page of every unfinished segment
+    
+    Each segment reads limit / segments items rounded up, so the merged page can
+    hold a few more than limit. It is cut back to limit, and a segment whose
+    items were cut resumes after the last item it actually returned.
+    
+    Returns:
+        Tuple of (items, cursors) where cursors maps each segment that still has
+        data to the key to resume it from (empty once the whole table has been read)
+    """
+    segments = sorted(cursors)
+    per_segment_limit = max(1, math.ceil(limit / len(segments)))
+    
+    if total_segments == 1:
+        results = [scan_segment(get_table().scan, 0, 1, cursors[0], per_segment_limit, arguments)]
+    else:
+        # Resource objects are not thread-safe, but the underlying client is
+        client = get_table().meta.client
+        scan_call = lambda **kwargs: client.scan(TableName=TABLE_NAME, **kwargs)
+        with ThreadPoolExecutor(max_workers=len(segments)) as executor:
+            results = list(executor.map(
+                lambda segment: scan_segment(
+                    scan_call, segment, total_segments, cursors[segment],
+                    per_segment_limit, arguments
+                ),
+                segments
+            ))
+    
+    items = []
+    next_cursors = {}
+    for segment, (segment_items, last_key) in zip(segments, results):
+        returned = segment_items[:limit - len(items)]
+        items.extend(returned)
+        if len(returned) < len(segment_items):
+            # An empty key restarts a segment that has returned nothing yet
+            next_cursors[segment] = {'id': returned[-1]['id']} if returned else (cursors[segment] or {})
+        elif last_key:
+            next_cursors[segment] = last_key
+    
+    return items, next_cursors
+
+def scan_segment(scan_call, segment, total_segments, start_key, limit, arguments):
+    """
+    Run a single Scan call for one segment
+    
+    Limit caps the items read, not the items returned, so a filtered page can
+    hold fewer than limit items (or none) and still have a next_token.
+    
+    Returns:
+        Tuple of (items, LastEvaluatedKey or None)
+    """
+    scan_kwargs = dict(arguments, Limit=limit)
+    if total_segments > 1:
+        scan_kwargs['Segment'] = segment
+        scan_kwargs['TotalSegments'] = total_segments
+    if start_key:
+        scan_kwargs['ExclusiveStartKey'] = start_key
+    
+    response = scan_call(**scan_kwargs)
+    return response.get('Items', []), response.get('LastEvaluatedKey')
+
+def parse_limit(value):
+    """
+    Validate the limit query parameter
+    """
+    if value is None or value == '':
+        return DEFAULT_PAGE_LIMIT
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    if limit < 1 or limit > MAX_PAGE_LIMIT:
+        raise ValueError(f'limit must be between 1 and {MAX_PAGE_LIMIT}')
+    return limit
+
+def parse_segments(value):
+    """
+    Validate the segments query parameter
+    """
+    if value is None or value == '':
+        return 1
+    try:
+        segments = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('segments must be an integer')
+    if segments < 1 or segments > MAX_SCAN_SEGMENTS:
+        raise ValueError(f'segments must be between 1 and {MAX_SCAN_SEGMENTS}')
+    return segments
+
+def build_projection(fields):
+    """
+    Build ProjectionExpression arguments from a comma-separated field list
+    
+    A list of field names is accepted too, as sent in batch request bodies.
+    Attribute names are passed through ExpressionAttributeNames because common
+    names such as "name" are DynamoDB reserved words.
+    """
+    if fields is None or isinstance(fields, str):
+        fields = fields.split(',') if fields else []
+    elif not isinstance(fields, list) or not all(isinstance(field, str) for field in fields):
+        raise ValueError('fields must be a comma-separated string or a list of strings')
+    if not fields:
+        return None
+    
+    names = ['id']
+    for field in fields:
+        field = field.strip()
+        if not field:
+            continue
+        if not FIELD_NAME_PATTERN.match(field):
+            raise ValueError(f'Invalid field name: {field}')
+        if field not in names:
+            names.append(field)
+    
+    if len(names) > MAX_PROJECTION_FIELDS:
+        raise ValueError(f'At most {MAX_PROJECTION_FIELDS} fields can be selected')
+    
+    placeholders = {f'#f{index}': name for index, name in enumerate(names)}
+    return {
+        'ProjectionExpression': ', '.join(placeholders),
+        'ExpressionAttributeNames': placeholders
+    }
+
+def encode_next_token(total_segments, cursors, index_name=None):
+    """
+    Encode the scan position of every unfinished segment as an opaque token
+    """
+    payload = {
+        'segments': total_segments,
+        'index': index_name,
+        # Key attributes of this table and its indexes are strings, so default=str is lossless
+        'cursors': {str(segment): key for segment, key in cursors.items()}
+    }
+    token = json.dumps(payload, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(token.encode('utf-8')).decode('ascii')
+
+def decode_next_token(token):
+    """
+    Decode a token produced by encode_next_token
+    
+    Returns:
+        Tuple of (total_segments, cursors, index name or None)
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        total_segments = int(payload['segments'])
+        index_name = payload.get('index')
+        cursors = {int(segment): key for segment, key in payload['cursors'].items()}
+    except (binascii.Error, UnicodeError, ValueError, TypeError, KeyError, AttributeError):
+        raise ValueError('Invalid next_token')
+    
+    if (total_segments < 1 or total_segments > max(MAX_SCAN_SEGMENTS, ITEM_TYPE_SHARDS) or not cursors
+            or any(segment < 0 or segment >= total_segments or not isinstance(key, dict)
+                   for segment, key in cursors.items())):
+        raise ValueError('Invalid next_token')
+    
+    return total_segments, cursors, index_name
+
 def get_item(item_id):
     """
     Retrieve a specific item by ID
     """
     try:
-        response = table.get_item(Key={'id': item_id})
+        cache = get_item_cache()
+        if cache:
+            cached_item = cache.get(item_id)
+            if cached_item is not None:
+                get_metrics().count('CacheHits')
+                return create_response(200, cached_item, {'X-Cache': 'HIT', **etag_header(cached_item)})
+        
+        response = get_table().get_item(Key={'id': item_id})
         
         if 'Item' not in response:
             return create_response(404, {'error': 'Item not found'})
         
-        item = convert_decimals(response['Item'])
-        return create_response(200, item)
+        item = response['Item']
+        if cache:
+            cache.set(item_id, item)
+            get_metrics().count('CacheMisses')
+            return create_response(200, item, {'X-Cache': 'MISS', **etag_header(item)})
+        return create_response(200, item, etag_header(item))
         
     except Exception as e:
         print(f"Error getting item {item_id}: {str(e)}")
@@ -92,35 +676,19 @@ def create_item(body):
         if not body:
             return create_response(400, {'error': 'Request body is required'})
         
-        # Parse JSON body
-        data = json.loads(body)
+        # Parse numbers as Decimal, the only number type DynamoDB accepts
+        data = json.loads(body, parse_float=Decimal)
         
         # Validate required fields
-        if 'name' not in data:
-            return create_response(400, {'error': 'Name field is required'})
-        
-        # Generate unique ID and timestamp
-        item_id = str(uuid.uuid4())
-        timestamp = datetime.utcnow().isoformat()
-        
-        # Prepare item for DynamoDB
-        item = {
-            'id': item_id,
-            'name': data['name'],
-            'description': data.get('description', ''),
-            'created_at': timestamp,
-            'updated_at': timestamp
-        }
-        
-        # Add any additional fields from the request
-        for key, value in data.items():
-            if key not in ['id', 'created_at', 'updated_at']:
-                item[key] = value
+        try:
+            item = build_new_item(data)
+        except ValueError as e:
+            return create_response(400, {'error': str(e)})
         
         # Save to DynamoDB
-        table.put_item(Item=item)
+        get_table().put_item(Item=item)
         
-        return create_response(201, item)
+        return create_response(201, item, etag_header(item))
         
     except json.JSONDecodeError:
         return create_response(400, {'error': 'Invalid JSON in request body'})
@@ -128,42 +696,308 @@ def create_item(body):
         print(f"Error creating item: {str(e)}")
         return create_response(500, {'error': 'Could not create item'})
 
-def update_item(item_id, body):
+def build_new_item(data):
+    """
+    Build a new item for DynamoDB from request data
+    
+    Raises:
+        ValueError: If required fields are missing or invalid
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Item must be a JSON object')
+    if 'name' not in data:
+        raise ValueError('Name field is required')
+    validate_name(data['name'])
+    
+    # Generate unique ID and timestamp
+    item_id = str(uuid.uuid4())
+    timestamp = datetime.utcnow().isoformat()
+    
+    # Prepare item for DynamoDB
+    item = {
+        'id': item_id,
+        'name': data['name'],
+        'description': data.get('description', ''),
+        'created_at': timestamp,
+        'updated_at': timestamp,
+        VERSION_ATTRIBUTE: 1,
+        ITEM_TYPE_ATTRIBUTE: item_type_value(item_id)
+    }
+    
+    # Add any additional fields from the request
+    for key, value in data.items():
+        if key not in ['id', 'created_at', 'updated_at', VERSION_ATTRIBUTE, ITEM_TYPE_ATTRIBUTE]:
+            item[key] = value
+    
+    return item
+
+def validate_name(name):
+    """
+    Reject names that are not non-empty strings
+    
+    name is the partition key of name-created_at-index, which only accepts
+    strings, so any other type would fail the write instead of returning 400.
+    """
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError('Name must be a non-empty string')
+
+def handle_batch_request(action, body):
+    """
+    Validate a batch request body and dispatch it to the batch operation
+    
+    Bodies are {"items": [...]} for batch create and {"ids": [...]} for batch
+    get/delete. Each entry gets its own result, so one invalid entry does not
+    fail the rest of the batch.
+    """
+    try:
+        if not body:
+            return create_response(400, {'error': 'Request body is required'})
+        
+        # Parse numbers as Decimal, the only number type DynamoDB accepts
+        data = json.loads(body, parse_float=Decimal)
+        field = 'items' if action == 'batch' else 'ids'
+        entries = data.get(field) if isinstance(data, dict) else None
+        if not isinstance(entries, list) or not entries:
+            return create_response(400, {'error': f'Request body must contain a non-empty "{field}" list'})
+        if len(entries) > MAX_BATCH_REQUEST_ITEMS:
+            return create_response(400, {'error': f'At most {MAX_BATCH_REQUEST_ITEMS} entries are allowed per request'})
+        
+        if action == 'batch':
+            return batch_create_items(entries)
+        if action == 'batchGet':
+            try:
+                projection = build_projection(data.get('fields'))
+            except ValueError as e:
+                return create_response(400, {'error': str(e)})
+            return batch_get_items(entries, projection)
+        return batch_delete_items(entries)
+        
+    except json.JSONDecodeError:
+        return create_response(400, {'error': 'Invalid JSON in request body'})
+    except Exception as e:
+        print(f"Error handling batch {action} request: {str(e)}")
+        return create_response(500, {'error': 'Could not process batch request'})
+
+def batch_create_items(entries):
+    """
+    Create many items with BatchWriteItem in chunks of 25
+    
+    Returns one result per entry, in request order: 201 with the new id, 400 if
+    the entry is invalid, or 500 if its chunk could not be written.
+    """
+    results = [None] * len(entries)
+    valid = []
+    for index, data in enumerate(entries):
+        try:
+            valid.append((index, build_new_item(data)))
+        except ValueError as e:
+            results[index] = {'index': index, 'status': 400, 'error': str(e)}
+    
+    for start in range(0, len(valid), BATCH_WRITE_CHUNK_SIZE):
+        chunk = valid[start:start + BATCH_WRITE_CHUNK_SIZE]
+        try:
+            # batch_writer resends UnprocessedItems until the chunk is stored
+            with get_table().batch_writer() as writer:
+                for _, item in chunk:
+                    writer.put_item(Item=item)
+            for index, item in chunk:
+                results[index] = {'index': index, 'status': 201, 'id': item['id']}
+        except Exception as e:
+            print(f"Error writing batch of {len(chunk)} items: {str(e)}")
+            for index, _ in chunk:
+                results[index] = {'index': index, 'status': 500, 'error': 'Could not create item'}
+    
+    return create_response(200, batch_summary(results))
+
+def batch_get_items(ids, projection=None):
+    """
+    Fetch many items with BatchGetItem in chunks of 100
+    
+    Full items are served from and added to the item cache; projected reads
+    bypass it. UnprocessedKeys are retried with exponential backoff, and any
+    still left afterwards are reported so the client can ask again.
+    """
+    results = {}
+    pending = []
+    cache = None if projection else get_item_cache()
+    for item_id in ids:
+        if not isinstance(item_id, str) or not item_id:
+            results[invalid_id_key(item_id)] = {'id': item_id, 'status': 400, 'error': 'Invalid id'}
+            continue
+        if item_id in results or item_id in pending:
+            continue
+        cached_item = cache.get(item_id) if cache else None
+        if cached_item is not None:
+            results[item_id] = {'id': item_id, 'status': 200, 'item': cached_item}
+        else:
+            pending.append(item_id)
+    
+    for start in range(0, len(pending), BATCH_GET_CHUNK_SIZE):
+        chunk = pending[start:start + BATCH_GET_CHUNK_SIZE]
+        request = {'Keys': [{'id': item_id} for item_id in chunk]}
+        if projection:
+            request.update(projection)
+        
+        found, unprocessed = fetch_batch(request)
+        for item in found:
+            if cache:
+                cache.set(item['id'], item)
+            results[item['id']] = {'id': item['id'], 'status': 200, 'item': item}
+        for item_id in chunk:
+            if item_id in unprocessed:
+                results[item_id] = {'id': item_id, 'status': 503, 'error': 'Not processed, retry later'}
+            elif item_id not in results:
+                results[item_id] = {'id': item_id, 'status': 404, 'error': 'Item not found'}
+    
+    # Report results in request order, one per distinct id
+    ordered = []
+    seen = set()
+    for item_id in ids:
+        key = item_id if isinstance(item_id, str) and item_id else invalid_id_key(item_id)
+        if key not in seen:
+            seen.add(key)
+            ordered.append(results[key])
+    
+    return create_response(200, batch_summary(ordered))
+
+def invalid_id_key(item_id):
+    """
+    Result key for an invalid id, typed so that 123 never collides with the id "123"
+    """
+    return (type(item_id).__name__, json.dumps(item_id, default=str))
+
+def fetch_batch(request):
+    """
+    Run BatchGetItem for up to 100 keys, retrying UnprocessedKeys
+    
+    Returns:
+        Tuple of (items found, set of ids still unprocessed)
+    """
+    items = []
+    for attempt in range(BATCH_GET_MAX_RETRIES + 1):
+        response = get_dynamodb().batch_get_item(RequestItems={TABLE_NAME: request})
+        items.extend(response.get('Responses', {}).get(TABLE_NAME, []))
+        unprocessed = response.get('UnprocessedKeys', {}).get(TABLE_NAME)
+        if not unprocessed:
+            return items, set()
+        request = unprocessed
+        if attempt < BATCH_GET_MAX_RETRIES:
+            time.sleep(BATCH_GET_RETRY_BASE_DELAY * (2 ** attempt))
+    
+    return items, {key['id'] for key in request['Keys']}
+
+def batch_delete_items(ids):
+    """
+    Delete many items with BatchWriteItem in chunks of 25
+    
+    BatchWriteItem does not support conditions, so ids that do not exist are
+    reported as deleted, as with any idempotent delete.
+    """
+    results = []
+    valid = []
+    seen = set()
+    for item_id in ids:
+        if not isinstance(item_id, str) or not item_id:
+            results.append({'id': item_id, 'status': 400, 'error': 'Invalid id'})
+        elif item_id not in seen:
+            # Duplicate keys in one BatchWriteItem call are rejected by DynamoDB
+            seen.add(item_id)
+            result = {'id': item_id, 'status': 200}
+            results.append(result)
+            valid.append(result)
+    
+    for start in range(0, len(valid), BATCH_WRITE_CHUNK_SIZE):
+        chunk = valid[start:start + BATCH_WRITE_CHUNK_SIZE]
+        try:
+            with get_table().batch_writer() as writer:
+                for result in chunk:
+                    writer.delete_item(Key={'id': result['id']})
+        except Exception as e:
+            print(f"Error deleting batch of {len(chunk)} items: {str(e)}")
+            for result in chunk:
+                result['status'] = 500
+                result['error'] = 'Could not delete item'
+        finally:
+            # Invalidate even on failure, since part of the chunk may be gone
+            for result in chunk:
+                invalidate_cached_item(result['id'])
+    
+    return create_response(200, batch_summary(results))
+
+def batch_summary(results):
+    """
+    Build the response body for a batch request from per-entry results
+    """
+    succeeded = sum(1 for result in results if result['status'] < 300)
+    return {
+        'results': results,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded
+    }
+
+def update_item(item_id, body, headers=None):
     """
     Update an existing item in DynamoDB
+    
+    The existence check (and the If-Match version check, if sent) is part of the
+    conditional write, so an update costs a single DynamoDB call.
     """
     try:
         if not body:
             return create_response(400, {'error': 'Request body is required'})
         
-        # Parse JSON body
-        data = json.loads(body)
+        # Parse numbers as Decimal, the only number type DynamoDB accepts
+        data = json.loads(body, parse_float=Decimal)
         
-        # Check if item exists
-        existing_item = table.get_item(Key={'id': item_id})
-        if 'Item' not in existing_item:
-            return create_response(404, {'error': 'Item not found'})
+        try:
+            if not isinstance(data, dict):
+                raise ValueError('Item must be a JSON object')
+            if 'name' in data:
+                validate_name(data['name'])
+            expected_version = parse_if_match(headers)
+        except ValueError as e:
+            return create_response(400, {'error': str(e)})
         
-        # Build update expression
-        update_expression = "SET updated_at = :timestamp"
-        expression_values = {':timestamp': datetime.utcnow().isoformat()}
+        # Build update expression. Attribute names go through placeholders
+        # because fields such as "name" are DynamoDB reserved words.
+        update_expression = "SET #updated_at = :timestamp, #version = if_not_exists(#version, :zero) + :one"
+        expression_names = {'#id': 'id', '#updated_at': 'updated_at', '#version': VERSION_ATTRIBUTE}
+        expression_values = {
+            ':timestamp': datetime.utcnow().isoformat(),
+            ':zero': 0,
+            ':one': 1
+        }
         
         # Add fields to update
-        for key, value in data.items():
-            if key not in ['id', 'created_at']:  # Don't allow updating these fields
-                update_expression += f", {key} = :{key}"
-                expression_values[f":{key}"] = value
-        
-        # Update item in DynamoDB
-        response = table.update_item(
-            Key={'id': item_id},
-            UpdateExpression=update_expression,
-            ExpressionAttributeValues=expression_values,
-            ReturnValues='ALL_NEW'
-        )
-        
-        updated_item = convert_decimals(response['Attributes'])
-        return create_response(200, updated_item)
+        for index, (key, value) in enumerate(data.items()):
+            # Don't allow updating these fields
+            if key not in ['id', 'created_at', 'updated_at', VERSION_ATTRIBUTE, ITEM_TYPE_ATTRIBUTE]:
+                update_expression += f", #f{index} = :f{index}"
+                expression_names[f"#f{index}"] = key
+                expression_values[f":f{index}"] = value
+        
+        condition_expression, condition_values = build_write_condition(expected_version)
+        expression_values.update(condition_values)
+        
+        # Update item in DynamoDB, failing instead of creating it if it is missing
+        try:
+            response = get_table().update_item(
+                Key={'id': item_id},
+                UpdateExpression=update_expression,
+                ConditionExpression=condition_expression,
+                ExpressionAttributeNames=expression_names,
+                ExpressionAttributeValues=expression_values,
+                ReturnValues='ALL_NEW',
+                ReturnValuesOnConditionCheckFailure='ALL_OLD'
+            )
+        except ClientError as e:
+            if is_condition_check_failure(e):
+                return condition_failure_response(e)
+            raise
+        invalidate_cached_item(item_id)
+        
+        updated_item = response['Attributes']
+        return create_response(200, updated_item, etag_header(updated_item))
         
     except json.JSONDecodeError:
         return create_response(400, {'error': 'Invalid JSON in request body'})
@@ -171,18 +1005,35 @@ def update_item(item_id, body):
         print(f"Error updating item {item_id}: {str(e)}")
         return create_response(500, {'error': 'Could not update item'})
 
-def delete_item(item_id):
+def delete_item(item_id, headers=None):
     """
-    Delete an item from DynamoDB
+    Delete an item from DynamoDB with a single conditional delete
     """
     try:
-        # Check if item exists
-        existing_item = table.get_item(Key={'id': item_id})
-        if 'Item' not in existing_item:
-            return create_response(404, {'error': 'Item not found'})
+        try:
+            expected_version = parse_if_match(headers)
+        except ValueError as e:
+            return create_response(400, {'error': str(e)})
         
-        # Delete the item
-        table.delete_item(Key={'id': item_id})
+        condition_expression, condition_values = build_write_condition(expected_version)
+        delete_kwargs = {
+            'Key': {'id': item_id},
+            'ConditionExpression': condition_expression,
+            'ExpressionAttributeNames': {'#id': 'id'},
+            'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+        }
+        if expected_version is not None:
+            delete_kwargs['ExpressionAttributeNames']['#version'] = VERSION_ATTRIBUTE
+            delete_kwargs['ExpressionAttributeValues'] = condition_values
+        
+        # Delete the item, failing if it does not exist
+        try:
+            get_table().delete_item(**delete_kwargs)
+        except ClientError as e:
+            if is_condition_check_failure(e):
+                return condition_failure_response(e)
+            raise
+        invalidate_cached_item(item_id)
         
         return create_response(200, {'message': f'Item {item_id} deleted successfully'})
         
@@ -190,30 +1041,417 @@ def delete_item(item_id):
         print(f"Error deleting item {item_id}: {str(e)}")
         return create_response(500, {'error': 'Could not delete item'})
 
-def create_response(status_code, body):
+def get_header(headers, name):
+    """
+    Look up a request header case-insensitively (API Gateway keeps client casing)
+    """
+    if not headers:
+        return None
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+def parse_if_match(headers):
+    """
+    Return the item version required by the If-Match header, or None if absent
+    
+    Accepts the ETag value returned by this API ("3", W/"3" or 3). "*" only
+    requires the item to exist, which every conditional write checks anyway.
+    """
+    value = get_header(headers, 'If-Match')
+    if value is None or value.strip() in ('', '*'):
+        return None
+    value = value.strip()
+    if value.startswith('W/'):
+        value = value[2:]
+    try:
+        return int(value.strip('"'))
+    except ValueError:
+        raise ValueError('If-Match must be an ETag returned by this API')
+
+def build_write_condition(expected_version):
+    """
+    Build the ConditionExpression for a write to an existing item
+    
+    Returns:
+        Tuple of (condition expression, expression attribute values)
+    """
+    if expected_version is None:
+        return 'attribute_exists(#id)', {}
+    return 'attribute_exists(#id) AND #version = :expected_version', {':expected_version': expected_version}
+
+def is_condition_check_failure(error):
+    """
+    Check whether a ClientError was raised by a failed ConditionExpression
+    """
+    return error.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException'
+
+def condition_failure_response(error):
+    """
+    Map a failed write condition to 404 (item missing) or 412 (version mismatch)
+    
+    ReturnValuesOnConditionCheckFailure returns the current item with the error,
+    so telling the two cases apart needs no extra read. Error responses bypass
+    the resource layer, so the item arrives in DynamoDB JSON.
+    """
+    current_item = error.response.get('Item')
+    if not current_item:
+        return create_response(404, {'error': 'Item not found'})
+    deserializer = TypeDeserializer()
+    current_item = {key: deserializer.deserialize(value) for key, value in current_item.items()}
+    return create_response(
+        412,
+        {'error': 'Item was modified by another request', VERSION_ATTRIBUTE: current_item.get(VERSION_ATTRIBUTE)},
+        etag_header(current_item)
+    )
+
+def etag_header(item):
+    """
+    Build the ETag header for an item from its version number
+    """
+    version = item.get(VERSION_ATTRIBUTE)
+    if version is None:
+        return {}
+    return {'ETag': f'"{int(version)}"'}
+
+def get_table():
+    """
+    Return the DynamoDB table (created on first use, reused across warm invocations)
+    """
+    global dynamodb, table
+    
+    if table is None:
+        with client_lock:
+            if table is None:
+                if DYNAMODB_INTERFACE == 'client':
+                    client = boto3.client('dynamodb', endpoint_url=DYNAMODB_ENDPOINT_URL, config=BOTO_CONFIG)
+                    dynamodb = ClientTable(instrument_client(client, get_metrics), TABLE_NAME)
+                    table = dynamodb
+                else:
+                    dynamodb = boto3.resource('dynamodb', endpoint_url=DYNAMODB_ENDPOINT_URL, config=BOTO_CONFIG)
+                    instrument_client(dynamodb.meta.client, get_metrics)
+                    # Set last, so other threads never see a table without its dynamodb
+                    table = dynamodb.Table(TABLE_NAME)
+    
+    return table
+
+def get_metrics():
+    """
+    Return the metrics recorder (created once per container)
+    """
+    global metrics
+    
+    if metrics is None:
+        metrics = Metrics(METRICS_NAMESPACE, {'Service': METRICS_SERVICE}, enabled=METRICS_ENABLED)
+    
+    return metrics
+
+def get_dynamodb():
+    """
+    Return the DynamoDB service object used for batch_get_item
+    """
+    get_table()
+    return dynamodb
+
+class ClientTable:
+    """
+    Table-like wrapper over the low-level DynamoDB client
+    
+    Converts between Python values and DynamoDB JSON for the calls this function
+    makes, so the rest of the code works the same with either interface.
+    """
+    
+    def __init__(self, client, table_name):
+        self.client = client
+        self.name = table_name
+        self.serializer = TypeSerializer()
+        self.deserializer = TypeDeserializer()
+        # Parallel scans call table.meta.client.scan(TableName=...)
+        self.meta = SimpleNamespace(client=self)
+    
+    def serialize(self, item):
+        return {key: self.serializer.serialize(value) for key, value in item.items()}
+    
+    def deserialize(self, item):
+        return {key: self.deserializer.deserialize(value) for key, value in item.items()}
+    
+    def call(self, operation, kwargs):
+        kwargs = dict(kwargs, TableName=self.name)
+        for name in ('Key', 'Item', 'ExclusiveStartKey', 'ExpressionAttributeValues'):
+            if name in kwargs:
+                kwargs[name] = self.serialize(kwargs[name])
+        
+        response = getattr(self.client, operation)(**kwargs)
+        
+        for name in ('Item', 'Attributes', 'LastEvaluatedKey'):
+            if name in response:
+                response[name] = self.deserialize(response[name])
+        if 'Items' in response:
+            response['Items'] = [self.deserialize(item) for item in response['Items']]
+        return response
+    
+    def get_item(self, **kwargs):
+        return self.call('get_item', kwargs)
+    
+    def put_item(self, **kwargs):
+        return self.call('put_item', kwargs)
+    
+    def update_item(self, **kwargs):
+        return self.call('update_item', kwargs)
+    
+    def delete_item(self, **kwargs):
+        return self.call('delete_item', kwargs)
+    
+    def query(self, **kwargs):
+        return self.call('query', kwargs)
+    
+    def scan(self, TableName=None, **kwargs):
+        return self.call('scan', kwargs)
+    
+    def batch_get_item(self, RequestItems):
+        request_items = {
+            table_name: dict(request, Keys=[self.serialize(key) for key in request['Keys']])
+            for table_name, request in RequestItems.items()
+        }
+        response = self.client.batch_get_item(RequestItems=request_items)
+        response['Responses'] = {
+            table_name: [self.deserialize(item) for item in items]
+            for table_name, items in response.get('Responses', {}).items()
+        }
+        response['UnprocessedKeys'] = {
+            table_name: dict(request, Keys=[self.deserialize(key) for key in request['Keys']])
+            for table_name, request in response.get('UnprocessedKeys', {}).items()
+        }
+        return response
+    
+    def batch_write_item(self, RequestItems):
+        response = self.client.batch_write_item(RequestItems={
+            table_name: [self.convert_write_request(request, self.serialize) for request in requests]
+            for table_name, requests in RequestItems.items()
+        })
+        response['UnprocessedItems'] = {
+            table_name: [self.convert_write_request(request, self.deserialize) for request in requests]
+            for table_name, requests in response.get('UnprocessedItems', {}).items()
+        }
+        return response
+    
+    @staticmethod
+    def convert_write_request(request, convert):
+        if 'PutRequest' in request:
+            return {'PutRequest': {'Item': convert(request['PutRequest']['Item'])}}
+        return {'DeleteRequest': {'Key': convert(request['DeleteRequest']['Key'])}}
+    
+    def batch_writer(self):
+        # boto3's BatchWriter only needs batch_write_item, which this class provides
+        return BatchWriter(self.name, self)
+
+def create_response(status_code, body, extra_headers=None):
     """
     Create a standardized API Gateway response
     """
+    headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*',  # Enable CORS
+        'Access-Control-Allow-Headers': 'Content-Type,If-Match',
+        'Access-Control-Expose-Headers': 'ETag',
+        'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
+    }
+    if extra_headers:
+        headers.update(extra_headers)
+    with get_metrics().timer('JSONEncode'):
+        encoded = encode_json(body)
     return {
         'statusCode': status_code,
-        'headers': {
-            'Content-Type': 'application/json',
-            'Access-Control-Allow-Origin': '*',  # Enable CORS
-            'Access-Control-Allow-Headers': 'Content-Type',
-            'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
-        },
-        'body': json.dumps(body, default=str)
+        'headers': headers,
+        'body': encoded
     }
 
-def convert_decimals(obj):
+def json_default(obj):
     """
-    Convert DynamoDB Decimal objects to float for JSON serialization
+    Serialize the types DynamoDB returns that JSON has no direct form for
+    
+    Called by the encoder only when it reaches such a value, so items are
+    encoded in a single pass without copying them first. Integer Decimals stay
+    integers; other Decimals become floats.
     """
-    if isinstance(obj, list):
-        return [convert_decimals(item) for item in obj]
-    elif isinstance(obj, dict):
-        return {key: convert_decimals(value) for key, value in obj.items()}
-    elif isinstance(obj, Decimal):
+    if isinstance(obj, Decimal):
+        if obj == obj.to_integral_value():
+            return int(obj)
         return float(obj)
-    else:
-        return obj
+    if isinstance(obj, (set, frozenset)):
+        # String and number sets
+        return list(obj)
+    return str(obj)
+
+json_encoder = json.JSONEncoder(default=json_default, ensure_ascii=False, separators=(',', ':'))
+
+def encode_json(body):
+    """
+    Encode a response body as JSON, using orjson when available
+    """
+    if orjson is not None and JSON_BACKEND != 'json':
+        try:
+            return orjson.dumps(body, default=json_default).decode('utf-8')
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which the standard encoder handles
+            pass
+    return json_encoder.encode(body)
+
+class LRUCache:
+    """
+    In-process LRU cache with a per-entry TTL and a bound on the number of entries
+    """
+    
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+    
+    def set(self, key, value, ttl_seconds=None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+    
+    def __len__(self):
+        return len(self.entries)
+
+class RedisCache:
+    """
+    External cache tier storing items as JSON in Redis with an expiry
+    
+    Any client exposing get(key), set(key, value, ex=seconds) and delete(key)
+    works, so a local fake can stand in for ElastiCache.
+    """
+    
+    def __init__(self, client, ttl_seconds, key_prefix=CACHE_KEY_PREFIX):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+    
+    def get(self, key):
+        value = self.client.get(self.key_prefix + key)
+        return None if value is None else json.loads(value, parse_float=Decimal)
+    
+    def set(self, key, value):
+        self.client.set(self.key_prefix + key, encode_json(value), ex=self.ttl_seconds)
+    
+    def delete(self, key):
+        self.client.delete(self.key_prefix + key)
+
+class ItemCache:
+    """
+    Read-through item cache: in-process LRU in front of an optional external tier
+    
+    External cache errors are logged and treated as misses so that an unhealthy
+    cache never fails a request that DynamoDB can still serve.
+    """
+    
+    def __init__(self, local, remote=None):
+        self.local = local
+        self.remote = remote
+        self.hits = 0
+        self.remote_hits = 0
+        self.misses = 0
+    
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        
+        if self.remote:
+            try:
+                value = self.remote.get(key)
+            except Exception as e:
+                print(f"Error reading item {key} from external cache: {str(e)}")
+                value = None
+            if value is not None:
+                self.local.set(key, value)
+                self.hits += 1
+                self.remote_hits += 1
+                return value
+        
+        self.misses += 1
+        return None
+    
+    def set(self, key, value):
+        self.local.set(key, value)
+        if self.remote:
+            try:
+                self.remote.set(key, value)
+            except Exception as e:
+                print(f"Error writing item {key} to external cache: {str(e)}")
+    
+    def invalidate(self, key):
+        self.local.delete(key)
+        if self.remote:
+            try:
+                self.remote.delete(key)
+            except Exception as e:
+                print(f"Error invalidating item {key} in external cache: {str(e)}")
+    
+    def stats(self):
+        """
+        Return hit/miss counters for this container
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'remote_hits': self.remote_hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'entries': len(self.local)
+        }
+
+def get_item_cache():
+    """
+    Return the configured item cache (created once per container), or None if disabled
+    """
+    global item_cache
+    
+    if item_cache is None and CACHE_BACKEND != 'none':
+        remote = None
+        if CACHE_BACKEND == 'redis':
+            if redis is None or not CACHE_REDIS_URL:
+                print("Redis cache backend requires the redis package and CACHE_REDIS_URL; using in-process cache only")
+            else:
+                client = redis.Redis.from_url(
+                    CACHE_REDIS_URL,
+                    socket_timeout=CACHE_REDIS_TIMEOUT_SECONDS,
+                    socket_connect_timeout=CACHE_REDIS_TIMEOUT_SECONDS
+                )
+                remote = RedisCache(client, CACHE_TTL_SECONDS)
+        item_cache = ItemCache(LRUCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS), remote)
+    
+    return item_cache
+
+def invalidate_cached_item(item_id):
+    """
+    Drop an item from the cache after it has been modified or deleted
+    """
+    cache = get_item_cache()
+    if cache:
+        cache.invalidate(item_id)
+
@@ -0,0 +1,1080 @@
+"""
+Local benchmark for lambda_function.py.
+
+Runs the API Lambda in-process against a stub DynamoDB table (and a fake Redis
+client for the external cache tier) so request latency and DynamoDB usage can be
+compared without deploying anything. The stubs add a fixed latency per call to
+approximate network round trips.
+
+Usage:
+    python local_benchmark.py --cache --requests 5000 --latency-ms 5
+    python local_benchmark.py --mutations --requests 2000
+    python local_benchmark.py --batch --items 5000 --request-overhead-ms 15
+    python local_benchmark.py --json
+    python local_benchmark.py --query
+    python local_benchmark.py --startup --repeats 5
+    python local_benchmark.py --suite --scale 2
+
+--suite runs the end-to-end workload used by run_benchmarks.py in the
+repository root and prints one JSON result.
+"""
+
+import argparse
+import copy
+import importlib.util
+import json
+import os
+import random
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import types
+import uuid
+import zlib
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+ASSETS_DIR = os.path.dirname(os.path.abspath(__file__))
+CONDITION_PATTERN = re.compile(r'(#\w+) (?:BETWEEN (:\w+) AND (:\w+)|(=|>=|<=) (:\w+))')
+
+
+class StubTable:
+    """
+    In-memory stand-in for a boto3 DynamoDB Table resource keyed on 'id'.
+
+    Supports the subset of the Table API used by the Lambda and counts every
+    call, plus the read/write capacity units DynamoDB would have charged.
+    """
+
+    def __init__(self, latency_ms=0.0, items=None, indexes=None):
+        self.latency = latency_ms / 1000.0
+        self.items = {item['id']: copy.deepcopy(item) for item in (items or [])}
+        self.indexes = {index['name']: index for index in (indexes or [])}
+        # Parallel scans go through table.meta.client, which here is the stub itself
+        self.meta = types.SimpleNamespace(client=self)
+        self.items_read = 0
+        self.calls = {}
+        self.read_units = 0.0
+        self.write_units = 0.0
+        self.lock = threading.Lock()
+
+    def _call(self, operation):
+        with self.lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def _units(item):
+        # One unit per started 4 KB (reads) or 1 KB (writes) is close enough here
+        return max(1, len(json.dumps(item, default=str)) // 1024 + 1)
+
+    @staticmethod
+    def _split_top_level(expression, separator):
+        parts, depth, current = [], 0, ''
+        for char in expression:
+            depth += char == '('
+            depth -= char == ')'
+            if char == separator and depth == 0:
+                parts.append(current.strip())
+                current = ''
+            else:
+                current += char
+        parts.append(current.strip())
+        return parts
+
+    def _check_condition(self, item, expression, names, values, operation):
+        """
+        Evaluate the ConditionExpression forms the Lambda uses and raise the same
+        ClientError DynamoDB would, including ReturnValuesOnConditionCheckFailure.
+        """
+        if not expression:
+            return
+        satisfied = True
+        for clause in expression.split(' AND '):
+            clause = clause.strip()
+            match = re.match(r'attribute_(not_)?exists\((.+)\)$', clause)
+            if match:
+                exists = item is not None and names.get(match.group(2), match.group(2)) in item
+                satisfied &= exists != bool(match.group(1))
+            else:
+                name, placeholder = [part.strip() for part in clause.split('=')]
+                satisfied &= item is not None and item.get(names.get(name, name)) == values[placeholder]
+        if not satisfied:
+            error = {'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}}
+            if item is not None:
+                serializer = TypeSerializer()
+                error['Item'] = {key: serializer.serialize(value) for key, value in item.items()}
+            raise ClientError(error, operation)
+
+    def get_item(self, Key, **kwargs):
+        self._call('get_item')
+        item = self.items.get(Key['id'])
+        with self.lock:
+            # Eventually consistent reads cost half a unit per 4 KB
+            self.read_units += 0.5 * max(1, self._units(item or {}) // 4 + 1)
+        return {'Item': copy.deepcopy(item)} if item is not None else {}
+
+    def put_item(self, Item, **kwargs):
+        self._call('put_item')
+        self.items[Item['id']] = copy.deepcopy(Item)
+        with self.lock:
+            self.write_units += self._units(Item)
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues, ReturnValues=None,
+                    ConditionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        self._call('update_item')
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues
+        self._check_condition(self.items.get(Key['id']), ConditionExpression, names, values, 'UpdateItem')
+        item = self.items.setdefault(Key['id'], {'id': Key['id']})
+        assignments = re.sub(r'^SET\s+', '', UpdateExpression)
+        for assignment in self._split_top_level(assignments, ','):
+            name, expression = [part.strip() for part in assignment.split('=', 1)]
+            increment = re.match(r'if_not_exists\((\S+),\s*(:\w+)\)\s*\+\s*(:\w+)$', expression)
+            if increment:
+                current = item.get(names.get(increment.group(1), increment.group(1)), values[increment.group(2)])
+                value = current + values[increment.group(3)]
+            else:
+                value = copy.deepcopy(values[expression])
+            item[names.get(name, name)] = Decimal(value) if isinstance(value, int) else value
+        with self.lock:
+            self.write_units += self._units(item)
+        return {'Attributes': copy.deepcopy(item)}
+
+    def batch_writer(self):
+        return StubBatchWriter(self)
+
+    def delete_item(self, Key, ConditionExpression=None, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, **kwargs):
+        self._call('delete_item')
+        self._check_condition(
+            self.items.get(Key['id']), ConditionExpression,
+            ExpressionAttributeNames or {}, ExpressionAttributeValues or {}, 'DeleteItem'
+        )
+        self.items.pop(Key['id'], None)
+        with self.lock:
+            self.write_units += 1
+        return {}
+
+    @staticmethod
+    def _matches(item, expression, names, values):
+        if not expression:
+            return True
+        for name, low, high, operator, operand in CONDITION_PATTERN.findall(expression):
+            value = item.get(names.get(name, name))
+            try:
+                if low:
+                    matched = values[low] <= value <= values[high]
+                elif operator == '=':
+                    matched = value == values[operand]
+                elif operator == '>=':
+                    matched = value >= values[operand]
+                else:
+                    matched = value <= values[operand]
+            except TypeError:
+                # Missing attributes and mismatched types never match
+                matched = False
+            if not matched:
+                return False
+        return True
+
+    @staticmethod
+    def _project(item, expression, names):
+        if not expression:
+            return copy.deepcopy(item)
+        attributes = {names.get(name.strip(), name.strip()) for name in expression.split(',')}
+        return {key: copy.deepcopy(value) for key, value in item.items() if key in attributes}
+
+    def _read_page(self, operation, ordered, Limit, FilterExpression, ProjectionExpression, names, values, last_key):
+        """
+        Evaluate up to Limit items, then filter them, as DynamoDB does; every
+        evaluated item is billed whether or not the filter keeps it.
+        """
+        evaluated = ordered[:Limit] if Limit else ordered
+        with self.lock:
+            self.items_read += len(evaluated)
+            read_bytes = sum(len(json.dumps(item, default=str)) for item in evaluated)
+            self.read_units += 0.5 * max(1, -(-read_bytes // 4096))
+        response = {
+            'Items': [
+                self._project(item, ProjectionExpression, names)
+                for item in evaluated if self._matches(item, FilterExpression, names, values)
+            ],
+            'ScannedCount': len(evaluated),
+        }
+        response['Count'] = len(response['Items'])
+        if Limit and len(ordered) > Limit:
+            response['LastEvaluatedKey'] = last_key(evaluated[-1])
+        return response
+
+    def scan(self, Limit=None, ExclusiveStartKey=None, Segment=0, TotalSegments=1, FilterExpression=None,
+             ProjectionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None, **kwargs):
+        self._call('scan')
+        keys = sorted(
+            key for key in self.items
+            if zlib.crc32(key.encode('utf-8')) % TotalSegments == Segment
+        )
+        if ExclusiveStartKey:
+            keys = [key for key in keys if key > ExclusiveStartKey['id']]
+        return self._read_page(
+            'scan', [self.items[key] for key in keys], Limit, FilterExpression, ProjectionExpression,
+            ExpressionAttributeNames or {}, ExpressionAttributeValues or {}, lambda item: {'id': item['id']}
+        )
+
+    def query(self, IndexName, KeyConditionExpression, Limit=None, ExclusiveStartKey=None, FilterExpression=None,
+              ProjectionExpression=None, ExpressionAttributeNames=None, ExpressionAttributeValues=None, **kwargs):
+        self._call('query')
+        index = self.indexes[IndexName]
+        partition_key, sort_key = index['partition_key'], index.get('sort_key')
+        names = ExpressionAttributeNames or {}
+        values = ExpressionAttributeValues or {}
+
+        def position(item):
+            return (str(item.get(sort_key, '')), item['id'])
+
+        ordered = sorted(
+            (
+                item for item in self.items.values()
+                if partition_key in item and self._matches(item, KeyConditionExpression, names, values)
+            ),
+            key=position
+        )
+        if ExclusiveStartKey:
+            start = position(ExclusiveStartKey)
+            ordered = [item for item in ordered if position(item) > start]
+
+        def last_key(item):
+            return {key: item[key] for key in ('id', partition_key, sort_key) if key and key in item}
+
+        return self._read_page(
+            'query', ordered, Limit, FilterExpression, ProjectionExpression, names, values, last_key
+        )
+
+
+class StubBatchWriter:
+    """
+    Stand-in for Table.batch_writer(): buffers writes and flushes them 25 at a
+    time, one BatchWriteItem call per flush.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.buffer = []
+
+    def put_item(self, Item):
+        self.buffer.append(('put', copy.deepcopy(Item)))
+        self._flush_if_full()
+
+    def delete_item(self, Key):
+        self.buffer.append(('delete', Key))
+        self._flush_if_full()
+
+    def _flush_if_full(self):
+        if len(self.buffer) >= 25:
+            self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        self.table._call('batch_write_item')
+        for operation, value in self.buffer:
+            if operation == 'put':
+                self.table.items[value['id']] = value
+                self.table.write_units += self.table._units(value)
+            else:
+                self.table.items.pop(value['id'], None)
+                self.table.write_units += 1
+        self.buffer = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._flush()
+
+
+class StubDynamoDBResource:
+    """
+    Stand-in for the boto3 DynamoDB service resource (batch_get_item only).
+
+    unprocessed_rate leaves that fraction of keys in UnprocessedKeys on each
+    call, like a throttled table, to exercise the retry path.
+    """
+
+    def __init__(self, table, unprocessed_rate=0.0, seed=5):
+        self.table = table
+        self.unprocessed_rate = unprocessed_rate
+        self.rng = random.Random(seed)
+
+    def batch_get_item(self, RequestItems):
+        (table_name, request), = RequestItems.items()
+        keys = request['Keys']
+        if len(keys) > 100:
+            raise ValueError('Too many items requested for the BatchGetItem call')
+        self.table._call('batch_get_item')
+        names = request.get('ExpressionAttributeNames')
+        found, unprocessed = [], []
+        for key in keys:
+            if self.rng.random() < self.unprocessed_rate:
+                unprocessed.append(key)
+                continue
+            item = self.table.items.get(key['id'])
+            if item is None:
+                continue
+            self.table.read_units += 0.5
+            if names:
+                item = {name: value for name, value in item.items() if name in names.values()}
+            found.append(copy.deepcopy(item))
+        response = {'Responses': {table_name: found}, 'UnprocessedKeys': {}}
+        if unprocessed:
+            response['UnprocessedKeys'][table_name] = dict(request, Keys=unprocessed)
+        return response
+
+
+class FakeRedisClient:
+    """
+    Local fake of the redis-py client calls used by RedisCache.
+    """
+
+    def __init__(self, latency_ms=0.0):
+        self.latency = latency_ms / 1000.0
+        self.values = {}
+        self.calls = 0
+
+    def _call(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get(self, key):
+        self._call()
+        value, expires_at = self.values.get(key, (None, 0))
+        if value is None or expires_at <= time.monotonic():
+            return None
+        return value.encode('utf-8')
+
+    def set(self, key, value, ex=None):
+        self._call()
+        self.values[key] = (value, time.monotonic() + (ex or 1e9))
+        return True
+
+    def delete(self, key):
+        self._call()
+        return 1 if self.values.pop(key, None) else 0
+
+
+class LocalDynamoDBServer:
+    """
+    DynamoDB-compatible HTTP endpoint backed by a StubTable.
+
+    Real boto3 clients and resources can point endpoint_url at it, so client
+    construction, request signing, HTTP and parsing are all exercised, unlike
+    when a stub object replaces the table.
+    """
+
+    OPERATIONS = {
+        'GetItem': 'get_item', 'PutItem': 'put_item', 'UpdateItem': 'update_item',
+        'DeleteItem': 'delete_item', 'Query': 'query', 'Scan': 'scan',
+    }
+
+    def __init__(self, table):
+        self.table = table
+        self.serializer = TypeSerializer()
+        self.deserializer = TypeDeserializer()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers['Content-Length'])), parse_float=Decimal)
+                operation = self.headers['X-Amz-Target'].split('.')[-1]
+                status, body = server.handle(operation, request)
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/x-amz-json-1.0')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.endpoint_url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def serialize(self, item):
+        return {key: self.serializer.serialize(value) for key, value in item.items()}
+
+    def deserialize(self, item):
+        return {key: self.deserializer.deserialize(value) for key, value in item.items()}
+
+    def handle(self, operation, request):
+        try:
+            if operation == 'BatchGetItem':
+                return 200, self.batch_get_item(request)
+            if operation == 'BatchWriteItem':
+                return 200, self.batch_write_item(request)
+            request.pop('TableName', None)
+            for name in ('Key', 'Item', 'ExclusiveStartKey', 'ExpressionAttributeValues'):
+                if name in request:
+                    request[name] = self.deserialize(request[name])
+            response = getattr(self.table, self.OPERATIONS[operation])(**request)
+        except ClientError as e:
+            body = {
+                '__type': f"com.amazonaws.dynamodb.v20120810#{e.response['Error']['Code']}",
+                'message': e.response['Error'].get('Message', ''),
+            }
+            if 'Item' in e.response:
+                body['Item'] = e.response['Item']
+            return 400, body
+        for name in ('Item', 'Attributes', 'LastEvaluatedKey'):
+            if name in response:
+                response[name] = self.serialize(response[name])
+        if 'Items' in response:
+            response['Items'] = [self.serialize(item) for item in response['Items']]
+        return 200, response
+
+    def batch_get_item(self, request):
+        (table_name, keys), = request['RequestItems'].items()
+        self.table._call('batch_get_item')
+        items = [self.table.items.get(self.deserialize(key)['id']) for key in keys['Keys']]
+        return {
+            'Responses': {table_name: [self.serialize(item) for item in items if item is not None]},
+            'UnprocessedKeys': {},
+        }
+
+    def batch_write_item(self, request):
+        (table_name, writes), = request['RequestItems'].items()
+        self.table._call('batch_write_item')
+        for write in writes:
+            if 'PutRequest' in write:
+                item = self.deserialize(write['PutRequest']['Item'])
+                self.table.items[item['id']] = item
+            else:
+                self.table.items.pop(self.deserialize(write['DeleteRequest']['Key'])['id'], None)
+        return {'UnprocessedItems': {}}
+
+
+def load_api_module():
+    """
+    Import lambda_function.py the way the Lambda runtime would.
+    """
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    spec = importlib.util.spec_from_file_location(
+        'lambda_function', os.path.join(ASSETS_DIR, 'lambda_function.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # EMF metric lines would be mixed into the JSON printed on stdout
+    module.METRICS_ENABLED = False
+    return module
+
+
+def generate_items(count, seed=7):
+    """
+    Build items shaped like the ones create_item stores.
+    """
+    rng = random.Random(seed)
+    items = []
+    for index in range(count):
+        timestamp = f'2024-01-{index % 28 + 1:02d}T{index % 24:02d}:00:00'
+        items.append({
+            'id': str(uuid.UUID(int=rng.getrandbits(128))),
+            'name': f'Item {index % 500}',
+            'description': f'Sample item number {index}',
+            'price': Decimal(rng.randint(100, 99999)) / 100,
+            'quantity': Decimal(rng.randint(0, 500)),
+            'created_at': timestamp,
+            'updated_at': timestamp,
+            'version': Decimal(1),
+        })
+    return items
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize_latencies(latencies):
+    return {
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+    }
+
+
+def suite_result(workload, unit, latency_per, latencies, elapsed, baseline_kb, operations=None, **extra):
+    """
+    Standard result record shared by the --suite workloads of every project.
+
+    operations counts units of work (defaults to one per latency sample);
+    throughput is operations per second.
+    """
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    operations = len(latencies) if operations is None else operations
+    return {
+        'workload': workload,
+        'operations': operations,
+        'unit': unit,
+        'seconds': round(elapsed, 3),
+        'throughput_per_second': round(operations / elapsed, 1),
+        'latency_per': latency_per,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p90_ms': round(percentile(latencies, 0.90) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3),
+        'peak_rss_mb': round(peak_kb / 1024, 1),
+        'rss_growth_mb': round((peak_kb - baseline_kb) / 1024, 1),
+        **extra,
+    }
+
+
+
+def build_suite_requests(items, count, seed):
+    """
+    A mixed request stream: reads, listings, creates shaped like the README's
+    test event, updates and deletes.
+    """
+    rng = random.Random(seed)
+    ids = [item['id'] for item in items]
+    events = []
+    for index in range(count):
+        roll = rng.random()
+        item_id = rng.choice(ids)
+        if roll < 0.6:
+            event = {'httpMethod': 'GET', 'resource': '/items/{id}', 'pathParameters': {'id': item_id}}
+        elif roll < 0.7:
+            event = {'httpMethod': 'GET', 'resource': '/items', 'queryStringParameters': {'limit': '50'}}
+        elif roll < 0.85:
+            event = {
+                'httpMethod': 'POST',
+                'resource': '/items',
+                'body': json.dumps({'name': f'Test Item {index}', 'description': 'This is a test item',
+                                    'price': rng.randint(100, 99999) / 100}),
+            }
+        elif roll < 0.95:
+            event = {
+                'httpMethod': 'PUT',
+                'resource': '/items/{id}',
+                'pathParameters': {'id': item_id},
+                'body': json.dumps({'quantity': rng.randint(0, 500)}),
+            }
+        else:
+            event = {'httpMethod': 'DELETE', 'resource': '/items/{id}', 'pathParameters': {'id': item_id}}
+        events.append(event)
+    return events
+
+
+def run_suite(scale, latency_ms, seed=17):
+    """
+    End-to-end workload for run_benchmarks.py: a mixed API request stream
+    through lambda_handler against the stub DynamoDB table, with the module's
+    default settings (item cache included).
+    """
+    module = load_api_module()
+    items = generate_items(1000 * scale)
+    events = build_suite_requests(items, 2000 * scale, seed)
+    table = StubTable(latency_ms, items)
+    module.table = table
+    module.item_cache = None
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    statuses = {}
+    latencies = []
+    started = time.perf_counter()
+    for event in events:
+        request_started = time.perf_counter()
+        response = module.lambda_handler(event, None)
+        latencies.append(time.perf_counter() - request_started)
+        statuses[response['statusCode']] = statuses.get(response['statusCode'], 0) + 1
+    elapsed = time.perf_counter() - started
+
+    return suite_result(
+        'serverless-api', 'requests', 'request', latencies, elapsed, baseline_kb,
+        status_codes={str(code): count for code, count in sorted(statuses.items())},
+        dynamodb_calls=sum(table.calls.values()),
+    )
+
+
+def run_cache_scenario(module, backend, items, requests, latency_ms, write_ratio, seed=11):
+    """
+    Replay a skewed read-heavy workload (a few hot items take most reads).
+    """
+    table = StubTable(latency_ms, items)
+    module.table = table
+    module.item_cache = None
+    module.CACHE_BACKEND = 'none' if backend == 'none' else 'memory'
+    redis_client = None
+    caches = [module.get_item_cache()]
+    if backend == 'redis':
+        # Two warm containers with their own LRU sharing one external tier
+        redis_client = FakeRedisClient(latency_ms / 10)
+        caches = [
+            module.ItemCache(
+                module.LRUCache(module.CACHE_MAX_ENTRIES, module.CACHE_TTL_SECONDS),
+                module.RedisCache(redis_client, module.CACHE_TTL_SECONDS)
+            )
+            for _ in range(2)
+        ]
+
+    rng = random.Random(seed)
+    ids = [item['id'] for item in items]
+    weights = [1.0 / (rank + 1) for rank in range(len(ids))]
+    latencies = []
+    for _ in range(requests):
+        item_id = rng.choices(ids, weights)[0]
+        if rng.random() < write_ratio:
+            event = {
+                'httpMethod': 'PUT',
+                'pathParameters': {'id': item_id},
+                'body': json.dumps({'quantity': rng.randint(0, 500)}),
+            }
+        else:
+            event = {'httpMethod': 'GET', 'pathParameters': {'id': item_id}}
+        module.item_cache = rng.choice(caches)
+        started = time.perf_counter()
+        response = module.lambda_handler(event, None)
+        latencies.append(time.perf_counter() - started)
+        assert response['statusCode'] == 200, response
+
+    result = {
+        'backend': backend,
+        'requests': requests,
+        'dynamodb_calls': dict(table.calls),
+        'read_units': table.read_units,
+        **summarize_latencies(latencies),
+    }
+    if caches[0]:
+        result['cache'] = {
+            key: sum(cache.stats()[key] for cache in caches)
+            for key in ('hits', 'remote_hits', 'misses')
+        }
+    if redis_client:
+        result['redis_calls'] = redis_client.calls
+    return result
+
+
+class ReadBeforeWriteTable(StubTable):
+    """
+    StubTable that repeats the get_item existence check the handler used to make
+    before every update and delete, as a baseline for --mutations.
+    """
+
+    def update_item(self, Key, **kwargs):
+        if 'Item' not in self.get_item(Key=Key):
+            raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem')
+        return super().update_item(Key=Key, **kwargs)
+
+    def delete_item(self, Key, **kwargs):
+        if 'Item' not in self.get_item(Key=Key):
+            raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'DeleteItem')
+        return super().delete_item(Key=Key, **kwargs)
+
+
+def run_mutation_scenario(module, name, table_class, items, requests, latency_ms, seed=13):
+    """
+    Replay updates and deletes, including missing items and stale If-Match versions.
+    """
+    table = table_class(latency_ms, items)
+    module.table = table
+    module.item_cache = None
+    module.CACHE_BACKEND = 'none'
+
+    rng = random.Random(seed)
+    ids = [item['id'] for item in items]
+    statuses = {}
+    latencies = []
+    for _ in range(requests):
+        roll = rng.random()
+        item_id = rng.choice(ids)
+        headers = {}
+        if roll < 0.1:
+            item_id = str(uuid.uuid4())
+        elif roll < 0.2 and item_id in table.items:
+            headers['If-Match'] = '"%d"' % (int(table.items[item_id].get('version', 1)) + 1)
+        elif roll < 0.4 and item_id in table.items:
+            headers['If-Match'] = '"%d"' % int(table.items[item_id].get('version', 1))
+        if roll > 0.9:
+            event = {'httpMethod': 'DELETE', 'pathParameters': {'id': item_id}, 'headers': headers}
+        else:
+            event = {
+                'httpMethod': 'PUT',
+                'pathParameters': {'id': item_id},
+                'headers': headers,
+                'body': json.dumps({'name': f'Renamed {rng.randint(0, 999)}', 'quantity': rng.randint(0, 500)}),
+            }
+        started = time.perf_counter()
+        response = module.lambda_handler(event, None)
+        latencies.append(time.perf_counter() - started)
+        statuses[response['statusCode']] = statuses.get(response['statusCode'], 0) + 1
+
+    total_calls = sum(table.calls.values())
+    return {
+        'scenario': name,
+        'requests': requests,
+        'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+        'dynamodb_calls': dict(table.calls),
+        'calls_per_mutation': round(total_calls / requests, 3),
+        'read_units': table.read_units,
+        **summarize_latencies(latencies),
+    }
+
+
+def run_batch_benchmark(module, items, latency_ms, overhead_ms, batch_size):
+    """
+    Load and read back items one request at a time and through the batch endpoints.
+
+    overhead_ms approximates the API Gateway and Lambda invocation cost that
+    every HTTP request pays on top of its DynamoDB calls.
+    """
+    payloads = [
+        {key: value for key, value in item.items() if key not in ('id', 'created_at', 'updated_at', 'version')}
+        for item in items
+    ]
+    overhead = overhead_ms / 1000.0
+
+    def invoke(event):
+        time.sleep(overhead)
+        response = module.lambda_handler(event, None)
+        assert response['statusCode'] in (200, 201), response
+        return json.loads(response['body'])
+
+    def measure(name, table, run):
+        module.table = table
+        module.dynamodb = StubDynamoDBResource(table, unprocessed_rate=0.05)
+        module.item_cache = None
+        started = time.perf_counter()
+        requests, count = run()
+        elapsed = time.perf_counter() - started
+        return {
+            'scenario': name,
+            'items': count,
+            'http_requests': requests,
+            'dynamodb_calls': dict(table.calls),
+            'seconds': round(elapsed, 3),
+            'items_per_second': round(count / elapsed, 1),
+        }
+
+    module.CACHE_BACKEND = 'none'
+    results = []
+
+    def create_single():
+        return len(payloads), len([invoke({'httpMethod': 'POST', 'path': '/items', 'body': json.dumps(data, default=str)}) for data in payloads])
+
+    def create_batch():
+        created = 0
+        requests = 0
+        for start in range(0, len(payloads), batch_size):
+            body = invoke({
+                'httpMethod': 'POST',
+                'path': '/items:batch',
+                'body': json.dumps({'items': payloads[start:start + batch_size]}, default=str),
+            })
+            created += body['succeeded']
+            requests += 1
+        return requests, created
+
+    results.append(measure('create_single', StubTable(latency_ms), create_single))
+    results.append(measure('create_batch', StubTable(latency_ms), create_batch))
+
+    ids = [item['id'] for item in items]
+
+    def get_single():
+        return len(ids), len([invoke({'httpMethod': 'GET', 'pathParameters': {'id': item_id}}) for item_id in ids])
+
+    def get_batch():
+        found = 0
+        requests = 0
+        for start in range(0, len(ids), batch_size):
+            body = invoke({
+                'httpMethod': 'POST',
+                'path': '/items:batchGet',
+                'body': json.dumps({'ids': ids[start:start + batch_size]}),
+            })
+            assert body['failed'] == 0, body['failed']
+            found += body['succeeded']
+            requests += 1
+        return requests, found
+
+    results.append(measure('get_single', StubTable(latency_ms, items), get_single))
+    results.append(measure('get_batch', StubTable(latency_ms, items), get_batch))
+    return results
+
+
+def legacy_encode(body):
+    """
+    The previous response encoding: copy the tree converting Decimals, then dumps.
+    """
+    def convert_decimals(obj):
+        if isinstance(obj, list):
+            return [convert_decimals(item) for item in obj]
+        elif isinstance(obj, dict):
+            return {key: convert_decimals(value) for key, value in obj.items()}
+        elif isinstance(obj, Decimal):
+            return float(obj)
+        return obj
+    return json.dumps(convert_decimals(body), default=str)
+
+
+def build_scan_body(target_bytes):
+    """
+    Build a GET /items style response body of roughly target_bytes when encoded.
+    """
+    template = generate_items(1)[0]
+    template['tags'] = ['alpha', 'beta', 'gamma']
+    template['dimensions'] = {'width': Decimal('12.5'), 'height': Decimal(40), 'depth': Decimal('3.25')}
+    item_bytes = len(legacy_encode(template))
+    count = max(1, target_bytes // item_bytes)
+    items = generate_items(count)
+    for item in items:
+        item['tags'] = list(template['tags'])
+        item['dimensions'] = dict(template['dimensions'])
+    return {'items': items, 'count': len(items)}
+
+
+def time_encoder(encode, body, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        output = encode(body)
+        timings.append(time.perf_counter() - started)
+    return min(timings), output
+
+
+def run_json_benchmark(module, sizes_mb, repeats):
+    """
+    Compare the legacy encoding with encode_json on scan-sized response bodies.
+    """
+    encoders = [('legacy', legacy_encode)]
+
+    def stdlib_encode(body):
+        module.JSON_BACKEND = 'json'
+        return module.encode_json(body)
+    encoders.append(('stdlib_single_pass', stdlib_encode))
+
+    if module.orjson is not None:
+        def orjson_encode(body):
+            module.JSON_BACKEND = 'auto'
+            return module.encode_json(body)
+        encoders.append(('orjson', orjson_encode))
+
+    results = []
+    for size_mb in sizes_mb:
+        body = build_scan_body(int(size_mb * 1024 * 1024))
+        reference = None
+        for name, encode in encoders:
+            seconds, output = time_encoder(encode, body, repeats)
+            decoded = json.loads(output)
+            # Numbers compare by value, so int 5 == float 5.0 here
+            matches = reference is None or decoded == reference
+            reference = reference or decoded
+            results.append({
+                'size_mb': size_mb,
+                'encoder': name,
+                'items': body['count'],
+                'ms': round(seconds * 1000, 2),
+                'output_bytes': len(output.encode('utf-8')),
+                'matches_legacy': matches,
+            })
+    return results
+
+
+def run_query_benchmark(module, table_sizes, latency_ms):
+    """
+    Compare index queries with the filtered-scan fallback as the table grows.
+
+    Each request pages through every result, so the totals show the work a
+    client pays for the complete answer.
+    """
+    indexes = module.SECONDARY_INDEXES
+    cases = [
+        ('name', {'name': 'Item 42'}),
+        ('created_range', {'created_after': '2024-01-03T00:00:00', 'created_before': '2024-01-03T23:59:59'}),
+        ('name_and_range', {'name': 'Item 42', 'created_after': '2024-01-15T00:00:00'}),
+    ]
+    results = []
+    for size in table_sizes:
+        # item_type is sharded by id, so it comes from the module
+        items = [dict(item, item_type=module.item_type_value(item['id'])) for item in generate_items(size)]
+        for case, filters in cases:
+            for path, declared in (('query', indexes), ('scan', [])):
+                module.SECONDARY_INDEXES = declared
+                table = StubTable(latency_ms, items, indexes)
+                module.table = table
+                parameters = dict(filters, limit='1000')
+                found = 0
+                pages = 0
+                started = time.perf_counter()
+                while True:
+                    response = module.lambda_handler(
+                        {'httpMethod': 'GET', 'queryStringParameters': parameters}, None
+                    )
+                    body = json.loads(response['body'])
+                    assert response['statusCode'] == 200, body
+                    assert body['query_plan']['path'] == path, body['query_plan']
+                    found += body['count']
+                    pages += 1
+                    if 'next_token' not in body:
+                        break
+                    parameters = dict(filters, limit='1000', next_token=body['next_token'])
+                results.append({
+                    'table_items': size,
+                    'filter': case,
+                    'path': path,
+                    'index': body['query_plan']['index'],
+                    'matches': found,
+                    'requests': pages,
+                    'items_read': table.items_read,
+                    'read_units': table.read_units,
+                    'ms': round((time.perf_counter() - started) * 1000, 2),
+                })
+    module.SECONDARY_INDEXES = indexes
+    return results
+
+
+# Runs in a fresh interpreter so that module import and client creation are
+# measured cold, as in a new Lambda execution environment
+STARTUP_CHILD_SCRIPT = """
+import importlib.util, json, sys, time
+started = time.perf_counter()
+path, variant, endpoint, item_id = sys.argv[1:5]
+spec = importlib.util.spec_from_file_location('lambda_function', path)
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+imported = time.perf_counter()
+module.CACHE_BACKEND = 'none'
+module.DYNAMODB_ENDPOINT_URL = endpoint
+module.DYNAMODB_INTERFACE = 'client' if variant == 'lazy_client' else 'resource'
+if variant == 'eager_resource':
+    # The previous behaviour: default config, resource built during init
+    module.BOTO_CONFIG = None
+    module.get_table()
+initialized = time.perf_counter()
+event = {'httpMethod': 'GET', 'pathParameters': {'id': item_id}}
+response = module.lambda_handler(event, None)
+assert response['statusCode'] == 200, response
+first = time.perf_counter()
+module.lambda_handler(event, None)
+warm = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'init_ms': (initialized - started) * 1000,
+    'first_request_ms': (first - initialized) * 1000,
+    'cold_total_ms': (first - started) * 1000,
+    'warm_request_ms': (warm - first) * 1000,
+}))
+"""
+
+
+def run_startup_benchmark(repeats):
+    """
+    Measure init time and first-request latency for each client strategy.
+
+    Every run is a new interpreter talking to LocalDynamoDBServer over HTTP, so
+    the timings include real boto3 client creation and request handling.
+    """
+    items = generate_items(10)
+    environment = dict(
+        os.environ,
+        AWS_ACCESS_KEY_ID='local', AWS_SECRET_ACCESS_KEY='local', AWS_DEFAULT_REGION='us-east-1'
+    )
+    results = []
+    with LocalDynamoDBServer(StubTable(0, items)) as server:
+        for variant in ('eager_resource', 'lazy_resource', 'lazy_client'):
+            runs = []
+            for _ in range(repeats):
+                output = subprocess.run(
+                    [sys.executable, '-c', STARTUP_CHILD_SCRIPT,
+                     os.path.join(ASSETS_DIR, 'lambda_function.py'), variant, server.endpoint_url, items[0]['id']],
+                    env=environment, cwd=ASSETS_DIR, capture_output=True, text=True, check=True
+                ).stdout
+                runs.append(json.loads(output.strip().splitlines()[-1]))
+            result = {'variant': variant, 'runs': repeats}
+            for key in runs[0]:
+                result[key] = round(statistics.median(run[key] for run in runs), 2)
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=2000, help='number of items in the stub table')
+    parser.add_argument('--requests', type=int, default=5000, help='number of API requests to replay')
+    parser.add_argument('--latency-ms', type=float, default=5, help='simulated latency per DynamoDB call')
+    parser.add_argument('--write-ratio', type=float, default=0.02, help='fraction of requests that update an item')
+    parser.add_argument('--cache', action='store_true', help='compare GET /items/{id} with and without the item cache')
+    parser.add_argument('--mutations', action='store_true', help='compare conditional writes with read-before-write')
+    parser.add_argument('--batch', action='store_true', help='compare single-item requests with the batch endpoints')
+    parser.add_argument('--batch-size', type=int, default=1000, help='entries per batch request for --batch')
+    parser.add_argument('--startup', action='store_true', help='measure cold init and first-request latency per client strategy')
+    parser.add_argument('--query', action='store_true', help='compare index queries with filtered scans as the table grows')
+    parser.add_argument('--json', action='store_true', help='compare response encoders on 1 MB and 6 MB bodies')
+    parser.add_argument('--repeats', type=int, default=5, help='timing repeats for --json (best is reported) and --startup (median)')
+    parser.add_argument('--request-overhead-ms', type=float, default=15, help='simulated API Gateway + Lambda cost per request for --batch')
+    parser.add_argument('--suite', action='store_true', help='run the end-to-end workload used by run_benchmarks.py')
+    parser.add_argument('--scale', type=int, default=1, help='workload size multiplier for --suite')
+    args = parser.parse_args()
+
+    if args.suite:
+        print(json.dumps(run_suite(args.scale, args.latency_ms), indent=2))
+        return
+
+    if args.startup:
+        print(json.dumps(run_startup_benchmark(args.repeats), indent=2))
+        return
+
+    module = load_api_module()
+    items = generate_items(args.items)
+
+    if args.cache:
+        results = [
+            run_cache_scenario(module, backend, items, args.requests, args.latency_ms, args.write_ratio)
+            for backend in ('none', 'memory', 'redis')
+        ]
+        print(json.dumps(results, indent=2))
+        return
+
+    if args.query:
+        print(json.dumps(run_query_benchmark(module, [1000, 10000, 50000], args.latency_ms), indent=2))
+        return
+
+    if args.json:
+        print(json.dumps(run_json_benchmark(module, [1, 6], args.repeats), indent=2))
+        return
+
+    if args.batch:
+        results = run_batch_benchmark(module, items, args.latency_ms, args.request_overhead_ms, args.batch_size)
+        print(json.dumps(results, indent=2))
+        return
+
+    if args.mutations:
+        results = [
+            run_mutation_scenario(module, 'read_before_write', ReadBeforeWriteTable, items, args.requests, args.latency_ms),
+            run_mutation_scenario(module, 'conditional_write', StubTable, items, args.requests, args.latency_ms),
+        ]
+        print(json.dumps(results, indent=2))
+        return
+
+    parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
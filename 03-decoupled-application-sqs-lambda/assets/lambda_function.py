@@ -1,9 +1,141 @@
+import os
 import json
+import time
+import boto3
+import sqlite3
 import logging
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from emf_metrics import Metrics, instrument_client
+
+# Logging: the level comes from the LOG_LEVEL environment variable (or the function's
+# log level setting). Per-message lines are DEBUG, and only 1 in LOG_SAMPLE_RATE of the
+# "processed" lines is written; every batch ends with one summary line. LOG_FORMAT
+# 'json' writes one JSON object per line so summary fields can be queried in
+# CloudWatch Logs Insights, 'text' keeps the Lambda runtime's format.
+LOG_LEVEL = os.environ.get('LOG_LEVEL') or os.environ.get('AWS_LAMBDA_LOG_LEVEL') or 'INFO'
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
 
 # Configure logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+
+def read_log_sample_rate(default=100):
+    """
+    Read LOG_SAMPLE_RATE from the environment, falling back to the default if it is not an integer.
+    """
+    
+    value = os.environ.get('LOG_SAMPLE_RATE')
+    if not value:
+        return default
+    try:
+        return max(1, int(value))
+    except ValueError:
+        logger.warning("Invalid LOG_SAMPLE_RATE %r, using %d", value, default)
+        return default
+
+LOG_SAMPLE_RATE = read_log_sample_rate()
+
+# Maximum number of messages processed at the same time within a batch.
+# Set to 1 to process the batch sequentially. Messages of one FIFO message
+# group are always processed in order, whatever this is set to.
+MAX_CONCURRENCY = 8
+
+# SQS message attribute (or top-level JSON field) naming the message type.
+# Messages that carry it are routed with a single dictionary lookup.
+MESSAGE_TYPE_ATTRIBUTE = 'messageType'
+
+# Number of distinct JSON key sets whose route is remembered
+ROUTE_CACHE_SIZE = 256
+
+# Idempotency: SQS delivers at least once, so a message can arrive again after it was
+# processed. Each message's key is claimed before its handler runs and marked completed
+# after it succeeds; a message whose key is already completed is skipped as a duplicate.
+# Store: 'none', 'memory' (warm container only), 'sqlite' (local database file, e.g. in
+# /tmp or on an EFS mount) or 'dynamodb' (durable and shared by all containers)
+IDEMPOTENCY_STORE = 'memory'
+IDEMPOTENCY_SQLITE_PATH = '/tmp/idempotency.db'
+IDEMPOTENCY_TABLE_NAME = 'sqs-consumer-idempotency'
+# 'messageId', or a JSON field such as 'orderId' to also catch the same business
+# event sent twice as separate messages (messages without the field use messageId)
+IDEMPOTENCY_KEY = 'messageId'
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+# How long a claim blocks other deliveries of the same key if the container dies
+# before completing it; keep it at least as long as the function timeout
+IDEMPOTENCY_IN_PROGRESS_SECONDS = 15 * 60
+# Completed keys remembered in memory in front of the store
+IDEMPOTENCY_CACHE_SIZE = 10000
+
+BOTO_CONFIG = Config(
+    connect_timeout=2,
+    read_timeout=5,
+    retries={'max_attempts': 3, 'mode': 'standard'},
+    tcp_keepalive=True,
+    max_pool_connections=MAX_CONCURRENCY
+)
+
+# Metrics are written to the function's log as CloudWatch Embedded Metric
+# Format: one line per batch, turned into metrics by CloudWatch Logs. The
+# recorder comes from emf_metrics.py, which is deployed next to this file
+METRICS_ENABLED = True
+METRICS_NAMESPACE = 'SQSConsumer'
+METRICS_SERVICE = 'sqs-message-processor'
+
+# Message router, idempotency layer and metrics recorder, built on first use by
+# get_router(), get_idempotency() and get_metrics()
+router = None
+idempotency = None
+metrics = None
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formats log records as single-line JSON objects.
+    
+    Fields passed as extra={'fields': {...}} become top-level keys next to the
+    level, message and request ID.
+    """
+    
+    def format(self, record):
+        entry = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'message': record.getMessage()
+        }
+        request_id = getattr(record, 'aws_request_id', None)
+        if request_id:
+            entry['requestId'] = request_id
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class LogSampler:
+    """
+    Returns True for one in every LOG_SAMPLE_RATE calls, starting with the first.
+    """
+    
+    def __init__(self):
+        self.counter = itertools.count()
+    
+    def __call__(self):
+        return next(self.counter) % LOG_SAMPLE_RATE == 0
+
+def configure_logging():
+    """
+    Apply LOG_LEVEL and LOG_FORMAT to the root logger and the handlers the Lambda runtime installed.
+    """
+    
+    level = logging.getLevelName(LOG_LEVEL.upper())
+    logger.setLevel(level if isinstance(level, int) else logging.INFO)
+    if LOG_FORMAT == 'json':
+        for handler in logger.handlers:
+            handler.setFormatter(StructuredFormatter())
+
+configure_logging()
+message_log_sampler = LogSampler()
 
 def lambda_handler(event, context):
     """
@@ -13,89 +145,670 @@ def lambda_handler(event, context):
     In a real-world scenario, this is where you would implement your business logic
     such as processing orders, sending notifications, updating databases, etc.
     
+    Each message is routed to the handler registered for its type in
+    build_router(). Routes with a batch handler receive all of their messages
+    from the batch in one call, so they can use bulk writes. Messages that were
+    already processed are skipped before any handler runs (see IDEMPOTENCY_STORE).
+    
+    Up to MAX_CONCURRENCY messages are processed at the same time, so a batch of
+    I/O-bound messages takes roughly as long as its slowest messages rather than
+    the sum of all of them. Messages of the same FIFO message group are still
+    processed one after another, in order.
+    
+    Failed messages are reported back in the partial batch response format, so
+    SQS only makes those messages visible again and deletes the rest. This needs
+    "Report batch item failures" enabled on the SQS trigger.
+    
     Args:
         event: Contains SQS records with message details
         context: Lambda runtime information
     
     Returns:
-        Dictionary with statusCode and processing results
+        Dictionary with batchItemFailures listing the messageId of every failed message
+    """
+    
+    started = time.perf_counter()
+    results = process_records(event['Records'])
+    counts = {'processed': 0, 'duplicate': 0, 'failed': 0, 'skipped': 0}
+    for result in results:
+        counts[result['status']] += 1
+    failed_messages = [result for result in results if result['status'] in ('failed', 'skipped')]
+    
+    # One summary line per batch instead of several lines per message
+    logger.info(
+        "Processed batch of %s record(s). Successful: %s, Duplicates: %s, Failed: %s, Skipped: %s",
+        len(results), counts['processed'], counts['duplicate'], counts['failed'], counts['skipped'],
+        extra={'fields': {
+            'event': 'batch_processed',
+            'records': len(results),
+            **counts,
+            'durationMs': round((time.perf_counter() - started) * 1000, 2),
+            # Cumulative since the container started
+            'routes': get_router().stats()
+        }}
+    )
+    
+    # Per-route handler timings were recorded by the router; flush them with the batch totals
+    metrics = get_metrics()
+    metrics.record('BatchLatency', (time.perf_counter() - started) * 1000)
+    metrics.count('Messages', len(results))
+    for status, count in counts.items():
+        metrics.count(status.capitalize(), count)
+    metrics.flush()
+    
+    # Only the failed messages are returned to the queue for another attempt
+    return {
+        'batchItemFailures': [
+            {'itemIdentifier': failed['messageId']} for failed in failed_messages
+        ]
+    }
+
+def process_records(records):
     """
+    Process a batch of SQS records, concurrently where ordering allows it.
     
-    # Log the incoming event for debugging
-    logger.info(f"Received event with {len(event['Records'])} record(s)")
+    A record that cannot be routed (no body, or a predicate that raises) fails
+    on its own, so the rest of the batch is still processed. Records are split
+    into tasks that run on a thread pool of at most MAX_CONCURRENCY threads:
+    - all records of one FIFO message group form one task and are processed
+      one by one, in order
+    - on standard queues, all records of a route with a batch handler form one
+      task, and every other record is a task of its own
     
-    processed_messages = []
-    failed_messages = []
+    Args:
+        records: SQS records from the event
     
-    # Process each SQS record in the batch
-    for record in event['Records']:
+    Returns:
+        One result per record, in the order of the batch, with the messageId,
+        a status of 'processed', 'duplicate', 'failed' or 'skipped' and the
+        error if any
+    """
+    message_router = get_router()
+    # Built here so the worker threads never race to create it
+    get_idempotency()
+    lanes = {}
+    route_batches = {}
+    tasks = []
+    results = {}
+    
+    for record in records:
+        group_id = record.get('attributes', {}).get('MessageGroupId')
         try:
-            # Extract message details
-            message_id = record['messageId']
-            receipt_handle = record['receiptHandle']
-            message_body = record['body']
-            
-            # Log message details
-            logger.info(f"Processing message ID: {message_id}")
-            logger.info(f"Message body: {message_body}")
-            
-            # Parse JSON message body (if applicable)
+            route, message = message_router.resolve(record)
+        except Exception as e:
+            # The error takes the message's place; FIFO records still join their
+            # lane so the records after them in the group are skipped
+            route, message = None, f"Could not route message: {str(e)}"
+            if group_id is None:
+                results[record['messageId']] = message_result(record['messageId'], message)
+                continue
+        if group_id is not None:
+            lanes.setdefault(group_id, []).append((record, route, message))
+        elif route.batch_handler is not None:
+            route_batches.setdefault(route.name, []).append((record, route, message))
+        else:
+            tasks.append((process_entries, [(record, route, message)]))
+    
+    tasks.extend((process_lane, entries) for entries in lanes.values())
+    tasks.extend((process_entries, entries) for entries in route_batches.values())
+    
+    if MAX_CONCURRENCY <= 1 or len(tasks) <= 1:
+        task_results = [task(entries) for task, entries in tasks]
+    else:
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENCY, len(tasks))) as executor:
+            task_results = list(executor.map(lambda task: task[0](task[1]), tasks))
+    
+    for task_result in task_results:
+        results.update(task_result)
+    return [results[record['messageId']] for record in records]
+
+def process_entries(entries):
+    """
+    Process records that share a route with one dispatch.
+    
+    A single record goes to the route's handler, several records go to its batch
+    handler together. Each record's idempotency key is claimed first; records
+    already processed are returned as duplicates without reaching the handler.
+    
+    Args:
+        entries: (record, route, message) tuples that share a route
+    
+    Returns:
+        Dictionary of results keyed by messageId
+    """
+    layer = get_idempotency()
+    route = entries[0][1]
+    results = {}
+    pending = []
+    
+    for record, _, message in entries:
+        message_id = record['messageId']
+        key = None
+        if layer is not None:
+            key = idempotency_key(record, message)
             try:
-                parsed_message = json.loads(message_body)
-                logger.info(f"Parsed message: {parsed_message}")
-                
-                # Example business logic - customize this section for your use case
-                if isinstance(parsed_message, dict):
-                    # Process different message types
-                    if 'orderId' in parsed_message:
-                        process_order_message(parsed_message)
-                    elif 'customerId' in parsed_message:
-                        process_customer_message(parsed_message)
-                    else:
-                        process_generic_message(parsed_message)
-                else:
-                    logger.info(f"Processing non-JSON message: {message_body}")
-                    
-            except json.JSONDecodeError:
-                # Handle non-JSON messages
-                logger.info(f"Message is not JSON format, processing as plain text: {message_body}")
-                process_text_message(message_body)
-            
-            # Mark message as successfully processed
-            processed_messages.append({
+                status = layer.claim(key)
+            except Exception as e:
+                results[message_id] = message_result(message_id, f"Idempotency check failed: {str(e)}")
+                continue
+            if status == 'COMPLETED':
+                logger.debug("Skipping message ID %s: %s was already processed", message_id, key)
+                results[message_id] = {
+                    'messageId': message_id,
+                    'status': 'duplicate'
+                }
+                continue
+            if status == 'INPROGRESS':
+                results[message_id] = message_result(message_id, f"{key} is already being processed")
+                continue
+        pending.append((record, message, key))
+    
+    if pending:
+        errors = get_router().dispatch(route, [message for _, message, _ in pending])
+        for (record, _, key), error in zip(pending, errors):
+            message_id = record['messageId']
+            if key is not None:
+                finish_claim(layer, key, error is None)
+            results[message_id] = message_result(message_id, error)
+    
+    return results
+
+def process_lane(entries):
+    """
+    Process the records of one FIFO message group in order, stopping at the first failure.
+    
+    Once a record fails, the records after it are skipped: they must not
+    overtake it, so they are returned unprocessed and retried after it.
+    
+    Args:
+        entries: (record, route, message) tuples that have to be processed in order;
+            route is None for a record that could not be routed, with the error as message
+    
+    Returns:
+        Dictionary of results keyed by messageId
+    """
+    results = {}
+    failed_id = None
+    
+    for record, route, message in entries:
+        message_id = record['messageId']
+        
+        if failed_id is not None:
+            group_id = record['attributes']['MessageGroupId']
+            logger.warning("Skipping message ID %s: earlier message in group %s failed", message_id, group_id)
+            results[message_id] = {
                 'messageId': message_id,
-                'status': 'processed'
-            })
-            
-            logger.info(f"Successfully processed message ID: {message_id}")
-            
-        except Exception as e:
-            # Log error details
-            logger.error(f"Failed to process message ID {record['messageId']}: {str(e)}")
-            
-            # Add to failed messages list
-            failed_messages.append({
-                'messageId': record['messageId'],
-                'error': str(e)
-            })
-    
-    # Log processing summary
-    logger.info(f"Processing complete. Successful: {len(processed_messages)}, Failed: {len(failed_messages)}")
-    
-    # Return processing results
-    return {
-        'statusCode': 200,
-        'body': json.dumps({
-            'message': 'Batch processing completed',
-            'processed': len(processed_messages),
-            'failed': len(failed_messages),
-            'details': {
-                'processed_messages': processed_messages,
-                'failed_messages': failed_messages
+                'status': 'skipped',
+                'error': f'Earlier message {failed_id} in group {group_id} failed'
             }
-        })
+            continue
+        
+        if route is None:
+            results[message_id] = message_result(message_id, message)
+        else:
+            results.update(process_entries([(record, route, message)]))
+        if results[message_id]['status'] == 'failed':
+            failed_id = message_id
+    
+    return results
+
+def idempotency_key(record, message):
+    """
+    Return the idempotency key of a message, as configured by IDEMPOTENCY_KEY.
+    
+    Args:
+        record: SQS record from the event
+        message: Parsed JSON message, or the raw body for text messages
+    
+    Returns:
+        Key string such as 'messageId#<id>' or 'orderId#<id>'
+    """
+    if IDEMPOTENCY_KEY != 'messageId' and isinstance(message, dict) and message.get(IDEMPOTENCY_KEY) is not None:
+        return f"{IDEMPOTENCY_KEY}#{message[IDEMPOTENCY_KEY]}"
+    return f"messageId#{record['messageId']}"
+
+def finish_claim(layer, key, succeeded):
+    """
+    Mark a claimed key completed after success, or release it after failure so a retry can claim it.
+    
+    Args:
+        layer: IdempotencyLayer holding the claim
+        key: Claimed idempotency key
+        succeeded: Whether the message was processed
+    """
+    try:
+        if succeeded:
+            layer.complete(key)
+        else:
+            layer.release(key)
+    except Exception as e:
+        # The message itself was handled; at worst a redelivery is processed again
+        # (completed) or waits for the claim to expire (released)
+        logger.warning("Could not update idempotency record %s: %s", key, e)
+
+def message_result(message_id, error):
+    """
+    Build the result for one message and log its outcome.
+    
+    Args:
+        message_id: SQS messageId
+        error: Error message, or None if the message was processed
+    
+    Returns:
+        Result dictionary for the message
+    """
+    if error is None:
+        if logger.isEnabledFor(logging.DEBUG) and message_log_sampler():
+            logger.debug("Successfully processed message ID: %s", message_id)
+        return {
+            'messageId': message_id,
+            'status': 'processed'
+        }
+    
+    # Log error details
+    logger.error("Failed to process message ID %s: %s", message_id, error)
+    return {
+        'messageId': message_id,
+        'status': 'failed',
+        'error': error
     }
 
+def get_router():
+    """
+    Return the message router, building it on first use.
+    """
+    global router
+    if router is None:
+        router = build_router()
+    return router
+
+def get_idempotency():
+    """
+    Return the configured idempotency layer (created once per container), or None if disabled.
+    """
+    
+    global idempotency
+    
+    if idempotency is None:
+        if IDEMPOTENCY_STORE == 'memory':
+            idempotency = IdempotencyLayer(None)
+        elif IDEMPOTENCY_STORE == 'sqlite':
+            idempotency = IdempotencyLayer(SQLiteIdempotencyStore(IDEMPOTENCY_SQLITE_PATH))
+        elif IDEMPOTENCY_STORE == 'dynamodb':
+            idempotency = IdempotencyLayer(DynamoDBIdempotencyStore(IDEMPOTENCY_TABLE_NAME))
+    
+    return idempotency
+
+def get_metrics():
+    """
+    Return the metrics recorder (created once per container)
+    """
+    global metrics
+    
+    if metrics is None:
+        metrics = Metrics(METRICS_NAMESPACE, {'Service': METRICS_SERVICE}, enabled=METRICS_ENABLED)
+    
+    return metrics
+
+def build_router():
+    """
+    Register a route for every message type this function understands.
+    
+    Add new message types here rather than in the processing loop. Routes are
+    matched by, in order: message type, predicate, required JSON keys (checked
+    in registration order), then the default route. Bodies that are not JSON
+    objects go to the text route.
+    
+    Returns:
+        MessageRouter with all routes registered
+    """
+    message_router = MessageRouter()
+    
+    # Example business logic - customize this section for your use case
+    message_router.register('order', handler=process_order_message, batch_handler=process_order_batch,
+                            message_type='order', keys=('orderId',))
+    message_router.register('customer', handler=process_customer_message,
+                            message_type='customer', keys=('customerId',))
+    message_router.register('generic', handler=process_generic_message, default=True)
+    message_router.register('text', handler=process_text_message, text=True)
+    
+    return message_router
+
+class Route:
+    """
+    A registered message handler and its timing counters
+    """
+    
+    def __init__(self, name, handler=None, batch_handler=None):
+        self.name = name
+        self.handler = handler
+        self.batch_handler = batch_handler
+        self.calls = 0
+        self.messages = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+class MessageRouter:
+    """
+    Routes SQS messages to registered handlers through precomputed lookup tables.
+    
+    Type routes are found with one dictionary lookup. Key routes are resolved
+    once per distinct set of JSON keys and then cached, so messages with the same
+    shape never walk the route list again. Predicates are the only rules
+    evaluated for every message.
+    """
+    
+    def __init__(self):
+        self.routes = {}
+        self.routes_by_type = {}
+        self.key_routes = []
+        self.predicate_routes = []
+        self.routes_by_keys = {}
+        self.default_route = None
+        self.text_route = None
+        self.lock = threading.Lock()
+    
+    def register(self, name, handler=None, batch_handler=None, message_type=None, keys=(),
+                 predicate=None, default=False, text=False):
+        """
+        Register a route.
+        
+        Args:
+            name: Route name, used in the timing counters
+            handler: Function called with one message
+            batch_handler: Function called with a list of messages. Returns a dict
+                mapping the position of each failed message to its error, or None
+                if all of them were processed. Raising fails every message
+            message_type: Value of MESSAGE_TYPE_ATTRIBUTE routed here
+            keys: JSON keys a message must all contain to be routed here
+            predicate: Function called with the parsed message, for anything
+                the other rules cannot express
+            default: Route JSON objects that match no other route here
+            text: Route bodies that are not JSON objects here
+        
+        Returns:
+            The registered Route
+        """
+        if handler is None and batch_handler is None:
+            raise ValueError(f'Route {name} needs a handler or a batch handler')
+        
+        route = Route(name, handler, batch_handler)
+        self.routes[name] = route
+        if message_type is not None:
+            self.routes_by_type[message_type] = route
+        if keys:
+            self.key_routes.append((frozenset(keys), route))
+        if predicate is not None:
+            self.predicate_routes.append((predicate, route))
+        if default:
+            self.default_route = route
+        if text:
+            self.text_route = route
+        self.routes_by_keys.clear()
+        return route
+    
+    def resolve(self, record):
+        """
+        Parse an SQS record and find its route.
+        
+        Args:
+            record: SQS record from the event
+        
+        Returns:
+            Tuple of (route, message) where message is the parsed JSON object,
+            or the raw body for the text route
+        """
+        message_body = record['body']
+        
+        # Parse JSON message body (if applicable)
+        try:
+            message = json.loads(message_body)
+        except json.JSONDecodeError:
+            message = None
+        if not isinstance(message, dict):
+            return self.text_route, message_body
+        
+        message_type = record.get('messageAttributes', {}).get(MESSAGE_TYPE_ATTRIBUTE, {}).get('stringValue')
+        if message_type is None:
+            message_type = message.get(MESSAGE_TYPE_ATTRIBUTE)
+        route = self.routes_by_type.get(message_type) if isinstance(message_type, str) else None
+        if route is not None:
+            return route, message
+        
+        for predicate, route in self.predicate_routes:
+            if predicate(message):
+                return route, message
+        
+        keys = frozenset(message)
+        route = self.routes_by_keys.get(keys)
+        if route is None:
+            route = next((route for required, route in self.key_routes if required <= keys), self.default_route)
+            if len(self.routes_by_keys) < ROUTE_CACHE_SIZE:
+                self.routes_by_keys[keys] = route
+        return route, message
+    
+    def dispatch(self, route, messages):
+        """
+        Run a route's handler on one or more messages and time it.
+        
+        Several messages always go to the batch handler. A single message goes
+        to the handler, or to the batch handler if the route has no handler.
+        
+        Args:
+            route: Route to dispatch to
+            messages: Messages for that route
+        
+        Returns:
+            One entry per message: None if it was processed, otherwise the error
+        """
+        errors = [None] * len(messages)
+        started = time.perf_counter()
+        try:
+            if route.handler is not None and len(messages) == 1:
+                route.handler(messages[0])
+            else:
+                for index, error in (route.batch_handler(messages) or {}).items():
+                    errors[index] = str(error)
+        except Exception as e:
+            errors = [str(e)] * len(messages)
+        elapsed = time.perf_counter() - started
+        get_metrics().record(f"Route.{route.name}", elapsed * 1000)
+        
+        with self.lock:
+            route.calls += 1
+            route.messages += len(messages)
+            route.failures += sum(error is not None for error in errors)
+            route.total_seconds += elapsed
+            route.max_seconds = max(route.max_seconds, elapsed)
+        return errors
+    
+    def stats(self):
+        """
+        Return the timing counters of every route that has been called.
+        """
+        with self.lock:
+            return {
+                route.name: {
+                    'calls': route.calls,
+                    'messages': route.messages,
+                    'failures': route.failures,
+                    'total_ms': round(route.total_seconds * 1000, 3),
+                    'avg_ms_per_message': round(route.total_seconds * 1000 / route.messages, 3),
+                    'max_call_ms': round(route.max_seconds * 1000, 3)
+                }
+                for route in self.routes.values() if route.calls
+            }
+
+class LRUCache:
+    """
+    In-process LRU cache with a per-entry TTL and a bound on the number of entries
+    """
+    
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        with self.lock:
+            return self._get(key)
+    
+    def add(self, key, value, ttl_seconds):
+        """
+        Store value unless the key already holds an unexpired one, which is returned instead.
+        """
+        with self.lock:
+            current = self._get(key)
+            if current is None:
+                self._set(key, value, ttl_seconds)
+            return current
+    
+    def set(self, key, value, ttl_seconds):
+        with self.lock:
+            self._set(key, value, ttl_seconds)
+    
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+    
+    def _get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+    
+    def _set(self, key, value, ttl_seconds):
+        self.entries[key] = (value, time.time() + ttl_seconds)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+class IdempotencyLayer:
+    """
+    Claims idempotency keys in a store, with an in-memory LRU of completed keys in front.
+    
+    A key is 'INPROGRESS' from claim() until complete() marks it 'COMPLETED' for
+    IDEMPOTENCY_TTL_SECONDS, or release() drops it after a failure. Without a
+    store the LRU holds the claims itself, which only dedupes within one container.
+    """
+    
+    def __init__(self, store):
+        self.store = store
+        self.cache = LRUCache(IDEMPOTENCY_CACHE_SIZE)
+    
+    def claim(self, key):
+        """
+        Claim a key for processing.
+        
+        Returns:
+            None if the key was claimed, otherwise its current status
+            ('COMPLETED' or 'INPROGRESS')
+        """
+        if self.store is None:
+            return self.cache.add(key, 'INPROGRESS', IDEMPOTENCY_IN_PROGRESS_SECONDS)
+        
+        if self.cache.get(key) == 'COMPLETED':
+            return 'COMPLETED'
+        now = time.time()
+        status = self.store.claim(key, now, now + IDEMPOTENCY_IN_PROGRESS_SECONDS)
+        if status == 'COMPLETED':
+            self.cache.set(key, 'COMPLETED', IDEMPOTENCY_TTL_SECONDS)
+        return status
+    
+    def complete(self, key):
+        if self.store is not None:
+            self.store.complete(key, time.time() + IDEMPOTENCY_TTL_SECONDS)
+        self.cache.set(key, 'COMPLETED', IDEMPOTENCY_TTL_SECONDS)
+    
+    def release(self, key):
+        if self.store is not None:
+            self.store.release(key)
+        self.cache.delete(key)
+
+class SQLiteIdempotencyStore:
+    """
+    Idempotency records in a local SQLite database file.
+    
+    Claims run in an IMMEDIATE transaction, so they are atomic even when several
+    processes share the file.
+    """
+    
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self.lock = threading.Lock()
+        # WAL without a sync per commit: a record lost in a crash only means a
+        # redelivered message is processed once more
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS idempotency '
+            '(idempotency_key TEXT PRIMARY KEY, status TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        self.connection.execute('DELETE FROM idempotency WHERE expires_at <= ?', (time.time(),))
+    
+    def claim(self, key, now, in_progress_until):
+        with self.lock:
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.connection.execute(
+                    'SELECT status FROM idempotency WHERE idempotency_key = ? AND expires_at > ?', (key, now)
+                ).fetchone()
+                if row is None:
+                    self.connection.execute(
+                        'INSERT OR REPLACE INTO idempotency VALUES (?, ?, ?)', (key, 'INPROGRESS', in_progress_until)
+                    )
+            finally:
+                self.connection.execute('COMMIT')
+        return row[0] if row else None
+    
+    def complete(self, key, expires_at):
+        with self.lock:
+            self.connection.execute('INSERT OR REPLACE INTO idempotency VALUES (?, ?, ?)', (key, 'COMPLETED', expires_at))
+    
+    def release(self, key):
+        with self.lock:
+            self.connection.execute('DELETE FROM idempotency WHERE idempotency_key = ?', (key,))
+
+class DynamoDBIdempotencyStore:
+    """
+    Idempotency records in a DynamoDB table with partition key 'idempotency_key' (String).
+    
+    Items carry an 'expires_at' attribute; enable TTL on it so old records are removed.
+    TTL deletion can lag, so claims also treat expired records as absent.
+    """
+    
+    def __init__(self, table_name):
+        dynamodb = boto3.resource('dynamodb', config=BOTO_CONFIG)
+        instrument_client(dynamodb.meta.client, get_metrics)
+        self.table = dynamodb.Table(table_name)
+    
+    def claim(self, key, now, in_progress_until):
+        try:
+            self.table.put_item(
+                Item={'idempotency_key': key, 'status': 'INPROGRESS', 'expires_at': int(in_progress_until)},
+                ConditionExpression='attribute_not_exists(idempotency_key) OR expires_at <= :now',
+                ExpressionAttributeValues={':now': int(now)},
+                ReturnValuesOnConditionCheckFailure='ALL_OLD'
+            )
+            return None
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            # The existing item comes back in DynamoDB JSON
+            return e.response.get('Item', {}).get('status', {}).get('S', 'INPROGRESS')
+    
+    def complete(self, key, expires_at):
+        self.table.put_item(Item={'idempotency_key': key, 'status': 'COMPLETED', 'expires_at': int(expires_at)})
+    
+    def release(self, key):
+        self.table.delete_item(Key={'idempotency_key': key})
+
 def process_order_message(message):
     """
     Process order-related messages.
@@ -107,7 +820,7 @@ def process_order_message(message):
     customer_id = message.get('customerId', 'unknown')
     total = message.get('total', 0)
     
-    logger.info(f"Processing order {order_id} for customer {customer_id} with total ${total}")
+    logger.debug("Processing order %s for customer %s with total $%s", order_id, customer_id, total)
     
     # Example processing logic:
     # - Validate order details
@@ -115,7 +828,39 @@ def process_order_message(message):
     # - Send confirmation email
     # - Update order status in database
     
-    logger.info(f"Order {order_id} processed successfully")
+    logger.debug("Order %s processed successfully", order_id)
+
+def process_order_batch(messages):
+    """
+    Process all order messages of a batch with a single call.
+    
+    Args:
+        messages: List of parsed JSON messages containing order information
+    
+    Returns:
+        Dictionary mapping the position of each failed order to its error
+    """
+    failed = {}
+    orders = []
+    
+    for index, message in enumerate(messages):
+        order_id = message.get('orderId', 'unknown')
+        customer_id = message.get('customerId', 'unknown')
+        total = message.get('total', 0)
+        
+        logger.debug("Processing order %s for customer %s with total $%s", order_id, customer_id, total)
+        
+        # Example validation: an order that fails it is reported on its own
+        # with failed[index] = 'reason', the rest of the batch still goes through
+        orders.append(message)
+    
+    # Example processing logic, once for all orders:
+    # - Update inventory with one bulk write (e.g. a DynamoDB batch_writer)
+    # - Send confirmation emails in one bulk API call
+    # - Update all order statuses in the database together
+    
+    logger.debug("Batch of %s order(s) processed successfully", len(orders))
+    return failed
 
 def process_customer_message(message):
     """
@@ -126,14 +871,14 @@ def process_customer_message(message):
     """
     customer_id = message.get('customerId', 'unknown')
     
-    logger.info(f"Processing customer message for customer {customer_id}")
+    logger.debug("Processing customer message for customer %s", customer_id)
     
     # Example processing logic:
     # - Update customer profile
     # - Send welcome email
     # - Trigger marketing campaigns
     
-    logger.info(f"Customer message for {customer_id} processed successfully")
+    logger.debug("Customer message for %s processed successfully", customer_id)
 
 def process_generic_message(message):
     """
@@ -142,14 +887,14 @@ def process_generic_message(message):
     Args:
         message: Parsed JSON message
     """
-    logger.info(f"Processing generic JSON message with keys: {list(message.keys())}")
+    logger.debug("Processing generic JSON message with keys: %s", list(message.keys()))
     
     # Example processing logic for generic messages
     # - Log message details
     # - Route to appropriate service
     # - Store in database
     
-    logger.info("Generic message processed successfully")
+    logger.debug("Generic message processed successfully")
 
 def process_text_message(message):
     """
@@ -158,11 +903,11 @@ def process_text_message(message):
     Args:
         message: Plain text message string
     """
-    logger.info(f"Processing text message: {message[:100]}...")  # Log first 100 characters
+    logger.debug("Processing text message: %.100s...", message)  # Log first 100 characters
     
     # Example processing logic for text messages
     # - Parse text content
     # - Extract relevant information
     # - Perform text analysis
     
-    logger.info("Text message processed successfully")
+    logger.debug("Text message processed successfully")
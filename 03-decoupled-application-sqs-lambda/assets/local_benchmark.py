@@ -0,0 +1,261 @@
+"""
+Local throughput benchmark for lambda_function.py.
+
+Every message handler is wrapped to sleep for a simulated I/O latency (a
+database write, an email API call, ...), then batches are pushed through
+lambda_handler at increasing MAX_CONCURRENCY settings. Prints messages per
+second, per-batch latency and the router's per-route timings for each level
+as JSON.
+
+With --fifo the messages are spread over a number of message groups. Messages
+of one group are processed in order, so concurrency within a batch is limited
+by the number of groups it contains.
+
+--logging instead measures the per-message cost of logging at each log level,
+sample rate and format, with no simulated latency.
+
+--suite runs the end-to-end workload used by run_benchmarks.py in the
+repository root and prints one JSON result.
+
+Usage:
+    python local_benchmark.py --messages 500 --batch-size 10 --latency-ms 20
+    python local_benchmark.py --concurrency 1 2 4 8 16 --fifo --groups 3
+    python local_benchmark.py --logging --messages 20000
+    python local_benchmark.py --suite --scale 2
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import time
+
+from local_harness import FailureInjector, SimulatedQueue, build_event, generate_messages, load_consumer_module
+
+HANDLERS = ('process_order_message', 'process_customer_message',
+            'process_generic_message', 'process_text_message')
+# Batch handlers make one bulk call for all their messages, so they pay the
+# simulated latency once per call
+BATCH_HANDLERS = ('process_order_batch',)
+
+
+def with_latency(handler, latency_ms, jitter, seed):
+    """
+    Wrap a handler so each call first sleeps like a blocking I/O call would.
+    """
+    rng = random.Random(seed)
+
+    def wrapped(message):
+        time.sleep(latency_ms * rng.uniform(1 - jitter, 1 + jitter) / 1000)
+        return handler(message)
+    return wrapped
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_level(module, batches, concurrency):
+    """
+    Push every batch through lambda_handler with the given concurrency limit.
+    """
+    module.MAX_CONCURRENCY = concurrency
+    module.router = None
+    module.idempotency = None
+    latencies = []
+    failures = 0
+    started = time.perf_counter()
+    for event in batches:
+        batch_started = time.perf_counter()
+        response = module.lambda_handler(event, None)
+        latencies.append(time.perf_counter() - batch_started)
+        failures += len(response['batchItemFailures'])
+    elapsed = time.perf_counter() - started
+
+    messages = sum(len(event['Records']) for event in batches)
+    return {
+        'concurrency': concurrency,
+        'messages_per_second': round(messages / elapsed, 1),
+        'batch_p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'batch_p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'failures': failures,
+        'routes': module.get_router().stats(),
+    }
+
+
+def suite_result(workload, unit, latency_per, latencies, elapsed, baseline_kb, operations=None, **extra):
+    """
+    Standard result record shared by the --suite workloads of every project.
+
+    operations counts units of work (defaults to one per latency sample);
+    throughput is operations per second.
+    """
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    operations = len(latencies) if operations is None else operations
+    return {
+        'workload': workload,
+        'operations': operations,
+        'unit': unit,
+        'seconds': round(elapsed, 3),
+        'throughput_per_second': round(operations / elapsed, 1),
+        'latency_per': latency_per,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p90_ms': round(percentile(latencies, 0.90) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3),
+        'peak_rss_mb': round(peak_kb / 1024, 1),
+        'rss_growth_mb': round((peak_kb - baseline_kb) / 1024, 1),
+        **extra,
+    }
+
+
+def run_suite(scale, latency_ms, batch_size=10, failure_rate=0.01, seed=5):
+    """
+    End-to-end workload for run_benchmarks.py: drain a simulated SQS queue
+    through lambda_handler with the module's default settings.
+
+    Handlers pay latency_ms of simulated I/O per call, 1% of the messages fail
+    on their first delivery, and failed messages are redelivered as SQS would
+    with batchItemFailures.
+    """
+    module = load_consumer_module()
+    logging.getLogger().setLevel(logging.CRITICAL)
+    for index, name in enumerate(HANDLERS + BATCH_HANDLERS):
+        setattr(module, name, with_latency(getattr(module, name), latency_ms, 0.5, index))
+
+    messages = generate_messages(1000 * scale)
+    rng = random.Random(seed)
+    failing_keys = {message['key'] for message in messages if rng.random() < failure_rate}
+    queue = SimulatedQueue(messages, max_receive_count=3)
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    latencies = []
+    deliveries = 0
+    started = time.perf_counter()
+    with FailureInjector(module, failing_keys) as injector:
+        while queue.pending:
+            batch = queue.receive(batch_size)
+            deliveries += len(batch)
+            batch_started = time.perf_counter()
+            response = module.lambda_handler(build_event(batch), None)
+            latencies.append(time.perf_counter() - batch_started)
+            queue.complete(batch, {failure['itemIdentifier'] for failure in response['batchItemFailures']})
+    elapsed = time.perf_counter() - started
+
+    return suite_result(
+        'sqs-consumer', 'messages', 'batch', latencies, elapsed, baseline_kb, operations=len(messages),
+        deliveries=deliveries,
+        succeeded=len(injector.successes),
+        dead_lettered=len(queue.dead_letters),
+    )
+
+
+LOGGING_CONFIGS = [
+    # (name, level, sample rate, format)
+    ('off', 'CRITICAL', 100, 'json'),
+    ('info', 'INFO', 100, 'json'),
+    ('info-text', 'INFO', 100, 'text'),
+    ('debug-sampled', 'DEBUG', 100, 'json'),
+    ('debug-every-message', 'DEBUG', 1, 'json'),
+    ('debug-every-message-text', 'DEBUG', 1, 'text'),
+]
+
+
+def run_logging_benchmark(module, batches, repeats=3):
+    """
+    Per-message cost of logging, at each level, sample rate and format.
+
+    Log lines are formatted and written to os.devnull, so the cost includes everything
+    up to the write CloudWatch would ingest. Messages run sequentially and the
+    idempotency layer is off, so the handlers and logging dominate.
+    """
+    module.MAX_CONCURRENCY = 1
+    module.IDEMPOTENCY_STORE = 'none'
+    messages = sum(len(event['Records']) for event in batches)
+    root = logging.getLogger()
+    handler = logging.StreamHandler(open(os.devnull, 'w'))
+    root.addHandler(handler)
+    results = []
+    try:
+        for name, level, sample_rate, log_format in LOGGING_CONFIGS:
+            module.LOG_LEVEL, module.LOG_SAMPLE_RATE, module.LOG_FORMAT = level, sample_rate, log_format
+            handler.setFormatter(logging.Formatter('[%(levelname)s]\t%(asctime)s\t%(message)s'))
+            module.configure_logging()
+            best = None
+            for _ in range(repeats):
+                module.router = None
+                started = time.perf_counter()
+                for event in batches:
+                    module.lambda_handler(event, None)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            results.append({'config': name, 'seconds': round(best, 3),
+                            'us_per_message': round(best / messages * 1e6, 2)})
+    finally:
+        root.removeHandler(handler)
+        handler.stream.close()
+
+    baseline = results[0]['us_per_message']
+    for result in results:
+        result['logging_us_per_message'] = round(result['us_per_message'] - baseline, 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=500, help='number of messages to process')
+    parser.add_argument('--batch-size', type=int, default=10, help='messages per Lambda invocation')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='simulated I/O latency per message')
+    parser.add_argument('--jitter', type=float, default=0.5, help='relative spread of the simulated latency')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16],
+                        help='MAX_CONCURRENCY levels to measure')
+    parser.add_argument('--fifo', action='store_true', help='spread messages over FIFO message groups')
+    parser.add_argument('--groups', type=int, default=4, help='message groups for --fifo')
+    parser.add_argument('--logging', action='store_true', help='measure per-message logging overhead instead')
+    parser.add_argument('--suite', action='store_true', help='run the end-to-end workload used by run_benchmarks.py')
+    parser.add_argument('--scale', type=int, default=1, help='workload size multiplier for --suite')
+    args = parser.parse_args()
+
+    if args.suite:
+        print(json.dumps(run_suite(args.scale, args.latency_ms), indent=2))
+        return
+
+    module = load_consumer_module()
+    logging.getLogger().setLevel(logging.WARNING)
+    if args.logging:
+        messages = generate_messages(args.messages)
+        batches = [
+            build_event(messages[start:start + args.batch_size])
+            for start in range(0, len(messages), args.batch_size)
+        ]
+        print(json.dumps(run_logging_benchmark(module, batches), indent=2))
+        return
+
+    for index, name in enumerate(HANDLERS + BATCH_HANDLERS):
+        setattr(module, name, with_latency(getattr(module, name), args.latency_ms, args.jitter, index))
+
+    messages = generate_messages(args.messages, args.groups if args.fifo else 0)
+    batches = [
+        build_event(messages[start:start + args.batch_size], args.fifo)
+        for start in range(0, len(messages), args.batch_size)
+    ]
+
+    results = [run_level(module, batches, concurrency) for concurrency in args.concurrency]
+    baseline = results[0]['messages_per_second']
+    for result in results:
+        result['speedup'] = round(result['messages_per_second'] / baseline, 2)
+
+    print(json.dumps({
+        'messages': args.messages,
+        'batch_size': args.batch_size,
+        'latency_ms': args.latency_ms,
+        'fifo_groups': args.groups if args.fifo else None,
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+"""
+Local replay harness for lambda_function.py.
+
+Feeds the SQS consumer batches from a simulated queue, injects failures into the
+message handlers and applies the consumer's response the way the SQS trigger
+would: failed messages become visible again (up to maxReceiveCount, then go to a
+dead-letter queue) and the rest are deleted. Comparing delivery modes shows how
+many successful messages get processed again and how many failures are lost.
+
+--duplicate-rate makes the queue deliver a share of the deleted messages a
+second time, as SQS occasionally does; the consumer's idempotency layer
+(--idempotency) should keep them from reaching the handlers again.
+
+The idempotency layer also skips the successful messages of a redelivered
+batch, which hides the cost of whole-batch retries. Unless --idempotency is
+given, whole-batch is therefore replayed twice: with the configured store and
+with none, so the redelivery amplification itself stays visible.
+
+Delivery modes:
+    partial      - batchItemFailures honoured (ReportBatchItemFailures enabled)
+    whole-batch  - any failure makes the whole batch visible again
+    ignore       - every message is deleted, failures included
+
+Usage:
+    python local_harness.py --messages 1000 --batch-size 10 --failure-rate 0.05
+    python local_harness.py --fifo --groups 20
+    python local_harness.py --duplicate-rate 0.1 --idempotency none
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import random
+import tempfile
+from collections import deque
+
+ASSETS_DIR = os.path.dirname(os.path.abspath(__file__))
+MODES = ('partial', 'whole-batch', 'ignore')
+
+
+class InjectedFailure(Exception):
+    """
+    Raised by a wrapped handler for a message chosen to fail.
+    """
+
+
+def load_consumer_module():
+    """
+    Import lambda_function.py the way the Lambda runtime would.
+    """
+    spec = importlib.util.spec_from_file_location(
+        'lambda_function', os.path.join(ASSETS_DIR, 'lambda_function.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # EMF metric lines would be mixed into the JSON printed on stdout
+    module.METRICS_ENABLED = False
+    return module
+
+
+def generate_messages(count, groups=0, seed=3):
+    """
+    Build SQS messages of every type the consumer understands.
+
+    Each body carries a 'key' so injected failures and processing counts can be
+    tracked per message. Plain-text bodies start with the key instead.
+    """
+    rng = random.Random(seed)
+    messages = []
+    for index in range(count):
+        key = f'msg-{index:06d}'
+        kind = rng.random()
+        if kind < 0.5:
+            body = json.dumps({'key': key, 'orderId': f'order-{index}', 'customerId': f'customer-{index % 97}',
+                               'items': ['item1', 'item2'], 'total': round(rng.uniform(5, 500), 2)})
+        elif kind < 0.75:
+            body = json.dumps({'key': key, 'customerId': f'customer-{index % 97}', 'event': 'profile-updated'})
+        elif kind < 0.9:
+            body = json.dumps({'key': key, 'notification': 'generic', 'priority': rng.randint(1, 5)})
+        else:
+            body = f'{key} plain text message number {index}'
+        message = {'key': key, 'messageId': f'{index:08d}-0000-4000-8000-000000000000', 'body': body}
+        if groups:
+            message['group'] = f'group-{index % groups}'
+            message['sequence'] = index
+        messages.append(message)
+    return messages
+
+
+def message_key(message):
+    """
+    Recover the tracking key from whatever a handler was given.
+    """
+    if isinstance(message, dict):
+        return message.get('key')
+    return str(message).split(' ', 1)[0]
+
+
+class FailureInjector:
+    """
+    Wraps the consumer's process_* handlers to count calls and raise on demand.
+
+    A message picked to fail does so on its first failing_attempts deliveries
+    (transient) or on every delivery when failing_attempts is None (poison).
+    Batch handlers report such messages as failed and get the rest. The router
+    and idempotency layer are rebuilt on entry and exit so they pick up the
+    wrapped handlers and start empty.
+    """
+
+    HANDLERS = ('process_order_message', 'process_customer_message',
+                'process_generic_message', 'process_text_message')
+    BATCH_HANDLERS = ('process_order_batch',)
+
+    def __init__(self, module, failing_keys, failing_attempts=1):
+        self.module = module
+        self.failing_keys = failing_keys
+        self.failing_attempts = failing_attempts
+        self.calls = {}
+        self.successes = {}
+        self.success_order = []
+        self.originals = {name: getattr(module, name) for name in self.HANDLERS + self.BATCH_HANDLERS}
+
+    def __enter__(self):
+        for name, original in self.originals.items():
+            wrap = self.wrap_batch if name in self.BATCH_HANDLERS else self.wrap
+            setattr(self.module, name, wrap(original))
+        self.module.router = None
+        self.module.idempotency = None
+        return self
+
+    def __exit__(self, *exc_info):
+        for name, original in self.originals.items():
+            setattr(self.module, name, original)
+        self.module.router = None
+        self.module.idempotency = None
+
+    def attempt(self, key):
+        attempt = self.calls.get(key, 0) + 1
+        self.calls[key] = attempt
+        return key in self.failing_keys and (self.failing_attempts is None or attempt <= self.failing_attempts)
+
+    def succeeded(self, key):
+        self.successes.setdefault(key, []).append(self.calls[key])
+        self.success_order.append(key)
+
+    def wrap(self, handler):
+        def wrapped(message):
+            key = message_key(message)
+            if self.attempt(key):
+                raise InjectedFailure(f'injected failure for {key} (attempt {self.calls[key]})')
+            result = handler(message)
+            self.succeeded(key)
+            return result
+        return wrapped
+
+    def wrap_batch(self, handler):
+        def wrapped(messages):
+            failed = {}
+            passed = []
+            for index, message in enumerate(messages):
+                key = message_key(message)
+                if self.attempt(key):
+                    failed[index] = f'injected failure for {key} (attempt {self.calls[key]})'
+                else:
+                    passed.append(index)
+            for position, error in (handler([messages[index] for index in passed]) or {}).items():
+                failed[passed[position]] = error
+            for index in passed:
+                if index not in failed:
+                    self.succeeded(message_key(messages[index]))
+            return failed
+        return wrapped
+
+
+class SimulatedQueue:
+    """
+    Minimal SQS stand-in: receive batches, delete, make visible again, dead-letter.
+
+    Batches are processed one at a time. On a FIFO queue, retried messages go back
+    to the head of the queue so no later message of their group overtakes them.
+    A deleted message is delivered once more with probability duplicate_rate.
+    """
+
+    def __init__(self, messages, max_receive_count, fifo=False, duplicate_rate=0.0, seed=9):
+        self.pending = deque(messages)
+        self.max_receive_count = max_receive_count
+        self.fifo = fifo
+        self.duplicate_rate = duplicate_rate
+        self.rng = random.Random(seed)
+        self.receive_counts = {}
+        self.dead_letters = []
+        self.deleted = []
+        self.duplicates = 0
+
+    def receive(self, batch_size):
+        batch = [self.pending.popleft() for _ in range(min(batch_size, len(self.pending)))]
+        for message in batch:
+            self.receive_counts[message['key']] = self.receive_counts.get(message['key'], 0) + 1
+        return batch
+
+    def complete(self, batch, failed_ids):
+        retry = []
+        for message in batch:
+            if message['messageId'] not in failed_ids:
+                self.deleted.append(message)
+                if self.rng.random() < self.duplicate_rate:
+                    self.duplicates += 1
+                    self.pending.append(message)
+            elif self.receive_counts[message['key']] >= self.max_receive_count:
+                self.dead_letters.append(message)
+            else:
+                retry.append(message)
+        if self.fifo:
+            self.pending.extendleft(reversed(retry))
+        else:
+            self.pending.extend(retry)
+
+
+def build_event(batch, fifo=False):
+    records = []
+    for message in batch:
+        record = {
+            'messageId': message['messageId'],
+            'receiptHandle': f"handle-{message['messageId']}",
+            'body': message['body'],
+            'attributes': {'ApproximateReceiveCount': '1', 'SentTimestamp': '0'},
+            'eventSource': 'aws:sqs',
+        }
+        if fifo:
+            record['attributes']['MessageGroupId'] = message['group']
+            record['attributes']['SequenceNumber'] = str(message['sequence'])
+        records.append(record)
+    return {'Records': records}
+
+
+def replay(module, messages, mode, batch_size, failing_keys, failing_attempts, max_receive_count, fifo=False,
+           duplicate_rate=0.0):
+    """
+    Drain the simulated queue through lambda_handler and report what happened.
+    """
+    queue = SimulatedQueue(messages, max_receive_count, fifo, duplicate_rate)
+    invocations = 0
+    with FailureInjector(module, failing_keys, failing_attempts) as injector:
+        while queue.pending:
+            batch = queue.receive(batch_size)
+            response = module.lambda_handler(build_event(batch, fifo), None)
+            invocations += 1
+            failed_ids = {failure['itemIdentifier'] for failure in response.get('batchItemFailures', [])}
+            if mode == 'whole-batch' and failed_ids:
+                failed_ids = {message['messageId'] for message in batch}
+            elif mode == 'ignore':
+                failed_ids = set()
+            queue.complete(batch, failed_ids)
+
+    succeeded = set(injector.successes)
+    deleted_keys = {message['key'] for message in queue.deleted}
+    result = {
+        'mode': mode,
+        'idempotency_store': module.IDEMPOTENCY_STORE,
+        'messages': len(messages),
+        'invocations': invocations,
+        'handler_calls': sum(injector.calls.values()),
+        'succeeded': len(succeeded),
+        'reprocessed_successes': sum(len(attempts) - 1 for attempts in injector.successes.values()),
+        'lost_failures': len(deleted_keys - succeeded),
+        'dead_lettered': len(queue.dead_letters),
+        'duplicate_deliveries': queue.duplicates,
+    }
+    if fifo:
+        result['fifo_order_violations'] = count_order_violations(messages, injector)
+    return result
+
+
+def count_order_violations(messages, injector):
+    """
+    Count messages that first succeeded before an earlier message of their group.
+    """
+    by_key = {message['key']: message for message in messages}
+    last_sequence = {}
+    violations = 0
+    for key in injector.success_order:
+        message = by_key[key]
+        if last_sequence.get(message['group'], -1) > message['sequence']:
+            violations += 1
+        last_sequence[message['group']] = max(last_sequence.get(message['group'], -1), message['sequence'])
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=1000, help='number of messages to replay')
+    parser.add_argument('--batch-size', type=int, default=10, help='messages per Lambda invocation')
+    parser.add_argument('--failure-rate', type=float, default=0.05, help='fraction of messages that fail')
+    parser.add_argument('--failing-attempts', type=int, default=1,
+                        help='deliveries on which a failing message fails (0 = always, a poison message)')
+    parser.add_argument('--max-receive-count', type=int, default=3, help='deliveries before a message is dead-lettered')
+    parser.add_argument('--fifo', action='store_true', help='simulate a FIFO queue with message groups')
+    parser.add_argument('--groups', type=int, default=10, help='message groups for --fifo')
+    parser.add_argument('--duplicate-rate', type=float, default=0.0,
+                        help='share of processed messages the queue delivers a second time')
+    parser.add_argument('--idempotency', choices=('none', 'memory', 'sqlite'),
+                        help="consumer's IDEMPOTENCY_STORE (default: as configured in lambda_function.py)")
+    parser.add_argument('--mode', choices=MODES, action='append', help='delivery mode(s) to replay (default: all)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    module = load_consumer_module()
+    configured_store = args.idempotency or module.IDEMPOTENCY_STORE
+    # Injected failures would otherwise log an error line each
+    logging.getLogger().setLevel(logging.CRITICAL)
+    messages = generate_messages(args.messages, args.groups if args.fifo else 0)
+    rng = random.Random(args.seed)
+    failing_keys = {message['key'] for message in messages if rng.random() < args.failure_rate}
+    failing_attempts = args.failing_attempts or None
+
+    runs = []
+    for mode in (args.mode or MODES):
+        runs.append((mode, configured_store))
+        if mode == 'whole-batch' and not args.idempotency and configured_store != 'none':
+            runs.append((mode, 'none'))
+
+    results = []
+    for mode, store in runs:
+        module.IDEMPOTENCY_STORE = store
+        # Every replay starts with an empty idempotency database
+        module.IDEMPOTENCY_SQLITE_PATH = os.path.join(tempfile.mkdtemp(), 'idempotency.db')
+        results.append(replay(module, messages, mode, args.batch_size, failing_keys, failing_attempts,
+                              args.max_receive_count, args.fifo, args.duplicate_rate))
+    print(json.dumps({'failing_messages': len(failing_keys), 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""
+Timers, counters and value series written as CloudWatch Embedded Metric Format (EMF).
+
+CloudWatch turns the EMF log lines into metrics (including p50/p99 from the raw
+values), so nothing calls PutMetricData while requests or messages are processed.
+Each line also carries a count/p50/p99/max summary of every timer.
+
+This file is the single source of the module. sync_shared_modules.py in the
+repository root copies it next to every function and app that uses it; edit it
+here and run that script rather than changing a copy.
+"""
+
+import json
+import math
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# EMF accepts at most this many values per metric in one log line
+EMF_MAX_VALUES = 100
+
+
+class Metrics:
+    """
+    Timers and counters for one set of dimensions, written as EMF on flush.
+    """
+
+    def __init__(self, namespace, dimensions, enabled=True, stream=None):
+        self.namespace = namespace
+        self.dimensions = dimensions
+        self.enabled = enabled
+        self.stream = stream
+        self.counters = {}
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record(self, name, milliseconds):
+        with self.lock:
+            self.series.setdefault(name, []).append(milliseconds)
+
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000)
+
+    def flush(self, dimensions=None):
+        """
+        Write everything recorded since the last flush as EMF and start over.
+
+        Args:
+            dimensions: Extra dimensions for this flush, e.g. {'Route': 'GET /items'}
+
+        Returns:
+            Count, p50, p99 and max of every timer
+        """
+        with self.lock:
+            counters, series = self.counters, self.series
+            self.counters, self.series = {}, {}
+        summary = {name: summarize_timings(values) for name, values in series.items()}
+        if self.enabled and (counters or series):
+            stream = self.stream or sys.stdout
+            for document in build_emf_documents(self.namespace, self.dimensions, dimensions or {},
+                                                counters, series, summary):
+                stream.write(json.dumps(document, separators=(',', ':')) + '\n')
+            stream.flush()
+        return summary
+
+
+def summarize_timings(values):
+    """
+    Count, p50, p99 and max of a list of timings, in milliseconds.
+    """
+    ordered = sorted(values)
+
+    def percentile(fraction):
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 3)
+    return {'count': len(ordered), 'p50': percentile(0.50), 'p99': percentile(0.99), 'max': round(ordered[-1], 3)}
+
+
+def build_emf_documents(namespace, dimensions, extra_dimensions, counters, series, summary):
+    """
+    Build the EMF documents for one flush.
+
+    Long series are spread over several documents of at most EMF_MAX_VALUES
+    values per metric; counters and the summary go in the first one.
+    """
+    all_dimensions = {**dimensions, **extra_dimensions}
+    dimension_sets = [list(dimensions)]
+    if extra_dimensions:
+        dimension_sets.append(list(all_dimensions))
+    chunks = max([1] + [math.ceil(len(values) / EMF_MAX_VALUES) for values in series.values()])
+
+    documents = []
+    for index in range(chunks):
+        start = index * EMF_MAX_VALUES
+        values = {
+            name: [round(value, 3) for value in series_values[start:start + EMF_MAX_VALUES]]
+            for name, series_values in series.items() if len(series_values) > start
+        }
+        definitions = [{'Name': name, 'Unit': 'Milliseconds'} for name in values]
+        document = {**all_dimensions, **values}
+        if index == 0:
+            definitions += [{'Name': name, 'Unit': 'Count'} for name in counters]
+            document.update(counters)
+            document['Summary'] = summary
+        document['_aws'] = {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{'Namespace': namespace, 'Dimensions': dimension_sets, 'Metrics': definitions}]
+        }
+        documents.append(document)
+    return documents
+
+
+def instrument_client(client, get_metrics):
+    """
+    Time every API call a boto3 client makes, retries included, as '<Service>.<Operation>'.
+
+    Uses botocore's before-call/after-call events, so every call site is covered
+    without wrapping them one by one.
+
+    Args:
+        client: boto3 client to instrument
+        get_metrics: Function returning the Metrics recorder to record into,
+            called after every API call
+
+    Returns:
+        The same client
+    """
+    service = client.meta.service_model.service_id.replace(' ', '')
+
+    def before_call(model, context, **kwargs):
+        context['metrics_started'] = time.perf_counter()
+        context['metrics_name'] = f"{service}.{model.name}"
+
+    def after_call(context, **kwargs):
+        started = context.get('metrics_started')
+        if started is not None:
+            get_metrics().record(context['metrics_name'], (time.perf_counter() - started) * 1000)
+
+    client.meta.events.register('before-call', before_call)
+    client.meta.events.register('after-call', after_call)
+    client.meta.events.register('after-call-error', after_call)
+    return client
@@ -0,0 +1,914 @@
+"""
+Local benchmark for transform-lambda.py.
+
+Runs the transform Lambda in-process against stub S3 and Firehose clients so the
+cost of different delivery strategies can be compared without deploying anything.
+The stubs add a fixed latency per API call to approximate network round trips.
+
+Usage:
+    python local_benchmark.py --rows 20000 --latency-ms 5
+    python local_benchmark.py --memory --size-mb 500
+    python local_benchmark.py --transform --rows 200000
+    python local_benchmark.py --formats --rows 200000
+    python local_benchmark.py --checkpoint --rows 50000
+    python local_benchmark.py --logging --rows 50000
+    python local_benchmark.py --suite --scale 2
+
+--suite runs the end-to-end workload used by run_benchmarks.py in the
+repository root and prints one JSON result.
+"""
+
+import argparse
+import base64
+import csv
+import hashlib
+import importlib.util
+import io
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import threading
+import time
+import uuid
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+from botocore.exceptions import ClientError
+
+ASSETS_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_DATA_FILE = os.path.join(ASSETS_DIR, 'sample-data.csv')
+
+
+class StubStreamingBody:
+    """
+    Minimal stand-in for botocore's StreamingBody backed by bytes in memory.
+    """
+
+    def __init__(self, data):
+        self._stream = io.BytesIO(data)
+
+    def read(self, amt=None):
+        return self._stream.read(amt)
+
+    def iter_chunks(self, chunk_size=1024):
+        while True:
+            chunk = self._stream.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def close(self):
+        self._stream.close()
+
+
+class GeneratedStreamingBody:
+    """
+    StreamingBody stand-in that generates a synthetic CSV on the fly.
+
+    Lets the benchmark stream files far larger than the memory it measures;
+    read() without a size materializes the whole object, just like botocore.
+    """
+
+    def __init__(self, size_bytes):
+        self.size_bytes = size_bytes
+        self._chunks = iter_csv_chunks(size_bytes)
+        self._buffer = b''
+
+    def read(self, amt=None):
+        if amt is None:
+            data = self._buffer + b''.join(self._chunks)
+            self._buffer = b''
+            return data
+        while len(self._buffer) < amt:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        return data
+
+    def iter_chunks(self, chunk_size=1024):
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def close(self):
+        pass
+
+
+class StubS3Client:
+    """
+    In-memory S3 client supporting the head_object and (ranged) get_object calls made by the Lambda.
+    """
+
+    def __init__(self, latency_ms=0):
+        self.latency = latency_ms / 1000
+        self.objects = {}
+        self.calls = 0
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[(Bucket, Key)] = Body if isinstance(Body, bytes) else Body.encode('utf-8')
+
+    def put_generated_object(self, Bucket, Key, size_bytes):
+        """
+        Register an object whose content is generated lazily on every read.
+        """
+        self.objects[(Bucket, Key)] = size_bytes
+
+    def head_object(self, Bucket, Key):
+        self.calls += 1
+        time.sleep(self.latency)
+        data = self.objects[(Bucket, Key)]
+        if isinstance(data, int):
+            return {'ContentLength': data, 'ETag': f'"generated-{data}"'}
+        return {'ContentLength': len(data), 'ETag': f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.calls += 1
+        time.sleep(self.latency)
+        data = self.objects[(Bucket, Key)]
+        if isinstance(data, int):
+            if Range:
+                raise NotImplementedError('Ranged reads are not supported on generated objects')
+            return {'Body': GeneratedStreamingBody(data), 'ContentLength': data}
+        if Range:
+            # Only the 'bytes=start-' and 'bytes=start-end' forms used by the Lambda
+            first, _, last = Range[len('bytes='):].partition('-')
+            if data and int(first) >= len(data):
+                # Like S3, a range starting at or past the end of the object is an error
+                raise ClientError({
+                    'Error': {'Code': 'InvalidRange', 'Message': f'The requested range is not satisfiable: {Range}'},
+                    'ResponseMetadata': {'HTTPStatusCode': 416}
+                }, 'GetObject')
+            data = data[int(first):int(last) + 1 if last else len(data)]
+        return {'Body': StubStreamingBody(data), 'ContentLength': len(data)}
+
+
+class SimulatedTimeout(BaseException):
+    """
+    Raised by the stub Firehose to stop an invocation abruptly, like a Lambda timeout.
+
+    Derives from BaseException so the Lambda's own error handling cannot swallow it.
+    """
+
+
+class InterruptingCheckpointStore:
+    """
+    Wraps a checkpoint store so its first delete raises SimulatedTimeout.
+
+    That is an invocation timing out after its last Firehose batch was delivered
+    and checkpointed, but before the checkpoints were cleared.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.interrupted = False
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def put(self, key, value):
+        self.store.put(key, value)
+
+    def delete(self, key):
+        if not self.interrupted:
+            self.interrupted = True
+            raise SimulatedTimeout()
+        self.store.delete(key)
+
+
+class StubFirehoseClient:
+    """
+    In-memory Firehose client with per-call latency and optional failure injection.
+
+    failure_rate is the probability that an individual record in a PutRecordBatch
+    call is rejected with a ServiceUnavailableException entry.
+    """
+
+    def __init__(self, latency_ms=0, failure_rate=0.0, seed=42, keep_records=True, timeout_after_calls=None):
+        self.latency = latency_ms / 1000
+        self.failure_rate = failure_rate
+        self.timeout_after_calls = timeout_after_calls
+        self.random = random.Random(seed)
+        self.keep_records = keep_records
+        self.records = []
+        self.records_received = 0
+        self.calls = 0
+
+    def _store(self, data):
+        self.records_received += 1
+        if self.keep_records:
+            self.records.append(data)
+
+    def put_record(self, DeliveryStreamName, Record):
+        self.calls += 1
+        time.sleep(self.latency)
+        self._store(Record['Data'])
+        return {'RecordId': str(uuid.uuid4())}
+
+    def put_record_batch(self, DeliveryStreamName, Records):
+        if self.timeout_after_calls is not None and self.calls >= self.timeout_after_calls:
+            raise SimulatedTimeout()
+        self.calls += 1
+        time.sleep(self.latency)
+        responses = []
+        failed = 0
+        for record in Records:
+            if self.random.random() < self.failure_rate:
+                failed += 1
+                responses.append({
+                    'ErrorCode': 'ServiceUnavailableException',
+                    'ErrorMessage': 'Slow down.'
+                })
+            else:
+                self._store(record['Data'])
+                responses.append({'RecordId': str(uuid.uuid4())})
+        return {'FailedPutCount': failed, 'RequestResponses': responses}
+
+
+class LocalS3FirehoseServer:
+    """
+    S3- and Firehose-compatible HTTP endpoint backed by StubS3Client and StubFirehoseClient.
+
+    Real boto3 clients can point at it (endpoint_url, or the AWS_ENDPOINT_URL_S3
+    and AWS_ENDPOINT_URL_FIREHOSE environment variables), so client creation,
+    request signing, HTTP and response parsing are all exercised. S3 requests
+    use path-style URLs; Firehose requests are told apart by their X-Amz-Target header.
+    """
+
+    def __init__(self, s3, firehose):
+        self.s3 = s3
+        self.firehose = firehose
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive, so warm clients reuse their connections as they would against AWS
+            protocol_version = 'HTTP/1.1'
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (ConnectionResetError, BrokenPipeError):
+                    # The client dropped a kept-alive connection or stopped reading a range early
+                    pass
+
+            def do_HEAD(self):
+                server.handle_s3(self, send_body=False)
+
+            def do_GET(self):
+                server.handle_s3(self, send_body=True)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                operation = self.headers['X-Amz-Target'].split('.')[-1]
+                payload = json.dumps(server.handle_firehose(operation, request)).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/x-amz-json-1.1')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.endpoint_url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def handle_s3(self, handler, send_body):
+        bucket, _, key = unquote(handler.path.split('?', 1)[0]).lstrip('/').partition('/')
+        data = self.s3.objects.get((bucket, key))
+        if not isinstance(data, bytes):
+            handler.send_response(404)
+            handler.send_header('Content-Length', '0')
+            handler.end_headers()
+            return
+
+        head = self.s3.head_object(Bucket=bucket, Key=key)
+        headers = {'ETag': head['ETag'], 'Last-Modified': formatdate(usegmt=True), 'Accept-Ranges': 'bytes'}
+        status, length = 200, head['ContentLength']
+        range_header = handler.headers.get('Range')
+        if send_body:
+            try:
+                response = self.s3.get_object(Bucket=bucket, Key=key, Range=range_header)
+            except ClientError:
+                handler.send_response(416)
+                handler.send_header('Content-Range', f"bytes */{len(data)}")
+                handler.send_header('Content-Length', '0')
+                handler.end_headers()
+                return
+            body = response['Body'].read()
+            length = len(body)
+            if range_header:
+                first = int(range_header[len('bytes='):].partition('-')[0])
+                status = 206
+                headers['Content-Range'] = f"bytes {first}-{first + length - 1}/{len(data)}"
+        handler.send_response(status)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.send_header('Content-Type', 'text/csv')
+        handler.send_header('Content-Length', str(length))
+        handler.end_headers()
+        if send_body:
+            handler.wfile.write(body)
+
+    def handle_firehose(self, operation, request):
+        if operation == 'PutRecord':
+            record = {'Data': base64.b64decode(request['Record']['Data'])}
+            response = self.firehose.put_record(DeliveryStreamName=request['DeliveryStreamName'], Record=record)
+            return {'RecordId': response['RecordId'], 'Encrypted': False}
+        records = [{'Data': base64.b64decode(record['Data'])} for record in request['Records']]
+        response = self.firehose.put_record_batch(DeliveryStreamName=request['DeliveryStreamName'], Records=records)
+        return {**response, 'Encrypted': False}
+
+
+def load_transform_module():
+    """
+    Import transform-lambda.py (not a valid module name) the way the Lambda runtime would.
+    """
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    spec = importlib.util.spec_from_file_location(
+        'transform_lambda', os.path.join(ASSETS_DIR, 'transform-lambda.py')
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # EMF metric lines would be mixed into the JSON printed on stdout
+    module.METRICS_ENABLED = False
+    return module
+
+
+def load_sample_rows():
+    with open(SAMPLE_DATA_FILE, newline='') as f:
+        reader = csv.DictReader(f)
+        return reader.fieldnames, list(reader)
+
+
+def generate_csv(rows, first_id=1):
+    """
+    Build a synthetic CSV by cycling through the rows of sample-data.csv.
+    """
+    fieldnames, sample_rows = load_sample_rows()
+
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=fieldnames)
+    writer.writeheader()
+    for i in range(rows):
+        row = dict(sample_rows[i % len(sample_rows)])
+        row['ProductId'] = f"P{first_id + i:07d}"
+        writer.writerow(row)
+    return output.getvalue().encode('utf-8')
+
+
+def iter_csv_chunks(size_bytes, rows_per_chunk=1000):
+    """
+    Yield a synthetic CSV of roughly size_bytes in encoded chunks, without holding it all.
+    """
+    fieldnames, sample_rows = load_sample_rows()
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=fieldnames)
+    writer.writeheader()
+
+    produced = 0
+    row_number = 0
+    while produced < size_bytes:
+        for _ in range(rows_per_chunk):
+            row = dict(sample_rows[row_number % len(sample_rows)])
+            row['ProductId'] = f"P{row_number + 1:09d}"
+            writer.writerow(row)
+            row_number += 1
+        chunk = output.getvalue().encode('utf-8')
+        output.seek(0)
+        output.truncate()
+        produced += len(chunk)
+        yield chunk
+
+
+def send_per_record(module, object_key):
+    """
+    Baseline: the original one put_record call per row.
+    """
+    response = module.s3_client.get_object(Bucket='benchmark-bucket', Key=object_key)
+    reader = csv.DictReader(io.StringIO(response['Body'].read().decode('utf-8')))
+    for row in reader:
+        record = module.transform_row_to_json(row, object_key)
+        module.firehose_client.put_record(
+            DeliveryStreamName=module.FIREHOSE_STREAM_NAME,
+            Record={'Data': json.dumps(record) + '\n'}
+        )
+
+
+def send_batched(module, object_key):
+    module.process_csv_file('benchmark-bucket', object_key, streaming=False, parallel=False)
+
+
+def send_streaming(module, object_key):
+    module.process_csv_file('benchmark-bucket', object_key, streaming=True, parallel=False)
+
+
+def send_parallel(module, object_key):
+    module.process_csv_file('benchmark-bucket', object_key, parallel=True)
+
+
+SCENARIOS = {
+    'per-record': send_per_record,
+    'batched': send_batched,
+    'streaming': send_streaming,
+    'parallel': send_parallel,
+}
+
+MEMORY_SCENARIOS = ['batched', 'streaming']
+# Streaming keeps peak memory flat: with an object ten times larger, its RSS
+# growth may exceed that of the smaller object by at most this much
+STREAMING_MEMORY_SLACK_MB = 16
+
+
+def run_scenario(module, name, data, latency_ms, failure_rate):
+    object_key = 'benchmark/input.csv'
+    module.s3_client = StubS3Client(latency_ms)
+    module.s3_client.put_object(Bucket='benchmark-bucket', Key=object_key, Body=data)
+    module.firehose_client = StubFirehoseClient(latency_ms, failure_rate)
+
+    start_time = time.perf_counter()
+    SCENARIOS[name](module, object_key)
+    elapsed = time.perf_counter() - start_time
+
+    rows = module.firehose_client.records_received
+    return {
+        'scenario': name,
+        'rows_delivered': rows,
+        'firehose_calls': module.firehose_client.calls,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(rows / elapsed, 1) if elapsed else None,
+        'ms_per_1000_rows': round(elapsed * 1000 / rows * 1000, 2) if rows else None,
+        'output_sha256': output_digest(module.firehose_client.records),
+    }
+
+
+def output_digest(records):
+    """
+    Order-independent digest of the delivered records, to check scenarios produce the same output.
+    """
+    digest = hashlib.sha256()
+    for record in sorted(record if isinstance(record, bytes) else record.encode('utf-8') for record in records):
+        digest.update(record)
+    return digest.hexdigest()[:16]
+
+
+def transform_with_row_engine(module, data, object_key):
+    reader = csv.DictReader(io.StringIO(data.decode('utf-8')))
+    return [json.dumps(module.transform_row_to_json(row, object_key)) + '\n' for row in reader]
+
+
+def transform_with_columnar_engine(module, data, object_key):
+    reader = csv.DictReader(io.StringIO(data.decode('utf-8')))
+    fieldnames = reader.fieldnames  # consumes the header row before raw rows are read
+    metadata_json = json.dumps(module.build_record_metadata(object_key))
+    lines = []
+    while True:
+        block = [row for _, row in zip(range(module.COLUMNAR_BLOCK_ROWS), reader.reader)]
+        if not block:
+            break
+        lines.extend(module.transform_block_to_ndjson(fieldnames, block, metadata_json))
+    return lines
+
+
+def run_transform_benchmark(module, data):
+    """
+    Micro-benchmark of the CSV-to-NDJSON transform alone (parsing included, no I/O).
+    """
+    object_key = 'benchmark/input.csv'
+    results = []
+    outputs = {}
+    for name, transform in (('row', transform_with_row_engine), ('columnar', transform_with_columnar_engine)):
+        start_time = time.perf_counter()
+        outputs[name] = transform(module, data, object_key)
+        elapsed = time.perf_counter() - start_time
+        results.append({
+            'engine': name,
+            'rows': len(outputs[name]),
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(len(outputs[name]) / elapsed, 1) if elapsed else None,
+        })
+    identical = outputs['row'] == outputs['columnar']
+    for result in results:
+        result['byte_identical'] = identical
+    return results
+
+
+def typed_edge_case_csv(regular_rows=150):
+    """
+    CSV whose column types are inferred from ordinary rows, followed by rows with
+    values that overflow them: floats beyond float range and a 400-digit decimal.
+    """
+    lines = ['ProductId,Score,Price']
+    # Exponent notation makes Score a float column; Price is a decimal with scale 2
+    lines += [f"P{i:05d},{i + 1}.25e-3,{i % 90 + 0.99:.2f}" for i in range(regular_rows)]
+    edge_values = [('1e999', '19.99'), ('-1e999', '5.00'), ('1.8e308', '9' * 400), ('1e-400', '0.01'),
+                   ('not a number', '12.50')]
+    lines += [f"E{i:05d},{score},{price}" for i, (score, price) in enumerate(edge_values)]
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def check_typed_engine_equivalence(module):
+    """
+    Both transform engines must produce byte-identical, strictly valid NDJSON for
+    typed columns, including values that do not fit the inferred type.
+    """
+    object_key = 'benchmark/typed.csv'
+    reader = csv.DictReader(io.StringIO(typed_edge_case_csv().decode('utf-8')))
+    fieldnames = reader.fieldnames
+    rows = list(reader.reader)
+    types = module.infer_column_schema(fieldnames, rows[:module.SCHEMA_SAMPLE_ROWS])
+    converters = module.compile_column_converters(types)
+
+    row_lines = [
+        json.dumps(module.transform_row_for_output(dict(zip(fieldnames, row)), object_key, 'json', converters)) + '\n'
+        for row in rows
+    ]
+    metadata_json = json.dumps(module.build_record_metadata(object_key))
+    columnar_lines = module.transform_block_to_ndjson(fieldnames, rows, metadata_json, converters=converters)
+
+    def reject_constant(name):
+        raise ValueError(f"{name} is not valid JSON")
+
+    valid = True
+    for line in row_lines + columnar_lines:
+        try:
+            json.loads(line, parse_constant=reject_constant)
+        except ValueError:
+            valid = False
+            break
+    identical = row_lines == columnar_lines
+    return {
+        'check': 'typed columns: engines byte-identical, output strict JSON',
+        'typed_columns': sorted(converters),
+        'rows': len(rows),
+        'byte_identical': identical,
+        'valid_json': valid,
+        'passed': identical and valid,
+    }
+
+
+def run_format_benchmark(module, data):
+    """
+    Compare output size and throughput of each OUTPUT_FORMAT on the same input.
+
+    The parquet format is skipped when pyarrow is not installed.
+    """
+    object_key = 'benchmark/input.csv'
+    formats = ['json', 'ndjson-header']
+    if module.pyarrow is not None:
+        formats.append('parquet')
+
+    results = []
+    for output_format in formats:
+        module.OUTPUT_FORMAT = output_format
+        module.s3_client = StubS3Client()
+        module.s3_client.put_object(Bucket='benchmark-bucket', Key=object_key, Body=data)
+        module.firehose_client = StubFirehoseClient(keep_records=False)
+
+        start_time = time.perf_counter()
+        stats = module.process_csv_file('benchmark-bucket', object_key, parallel=False)
+        elapsed = time.perf_counter() - start_time
+
+        results.append({
+            'format': output_format,
+            'rows': stats['total_rows'],
+            'output_bytes': stats['bytes'],
+            'bytes_per_row': round(stats['bytes'] / stats['total_rows'], 1) if stats['total_rows'] else None,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(stats['total_rows'] / elapsed, 1) if elapsed else None,
+        })
+
+    for result in results:
+        result['size_vs_json'] = round(result['output_bytes'] / results[0]['output_bytes'], 3)
+    return results
+
+
+def run_checkpoint_benchmark(module, data):
+    """
+    Interrupt an invocation, retry it, then re-upload the same file.
+
+    The invocation is stopped either halfway through the file's Firehose batches
+    or after its last batch, before its checkpoints are cleared; the retry then
+    starts at the end of the file (or of every range) and must not read past it.
+    Reports how many rows the retry had to send again (duplicates) and whether the
+    identical re-upload was skipped, for the sequential and parallel paths.
+    """
+    object_key = 'benchmark/input.csv'
+    module.CHECKPOINT_STORE = 'memory'
+    total_batches = max(2, data.count(b'\n') // module.FIREHOSE_MAX_BATCH_RECORDS)
+    results = []
+    for interrupt in ('halfway', 'after_last_batch'):
+        for name, parallel in (('sequential', False), ('parallel', True)):
+            results.append(run_checkpoint_case(module, data, object_key, interrupt, name, parallel, total_batches))
+    return results
+
+
+def run_checkpoint_case(module, data, object_key, interrupt, name, parallel, total_batches):
+    """
+    One interrupted invocation, its retry and a re-upload, for run_checkpoint_benchmark.
+    """
+    if interrupt == 'halfway':
+        module.checkpoint_store = None
+        module.firehose_client = StubFirehoseClient(timeout_after_calls=total_batches // 2)
+    else:
+        module.checkpoint_store = InterruptingCheckpointStore(module.MemoryCheckpointStore())
+        module.firehose_client = StubFirehoseClient()
+    module.s3_client = StubS3Client()
+    module.s3_client.put_object(Bucket='benchmark-bucket', Key=object_key, Body=data)
+    delivered = []
+
+    try:
+        module.process_csv_file('benchmark-bucket', object_key, parallel=parallel)
+        interrupted = False
+    except SimulatedTimeout:
+        interrupted = True
+    delivered.extend(module.firehose_client.records)
+    first_attempt = len(module.firehose_client.records)
+
+    start_time = time.perf_counter()
+    module.firehose_client = StubFirehoseClient()
+    retry_stats = module.process_csv_file('benchmark-bucket', object_key, parallel=parallel)
+    retry_seconds = time.perf_counter() - start_time
+    delivered.extend(module.firehose_client.records)
+
+    reupload_stats = module.process_csv_file('benchmark-bucket', object_key, parallel=parallel)
+
+    return {
+        'interrupt': interrupt,
+        'path': name,
+        'interrupted': interrupted,
+        'rows_sent_before_interrupt': first_attempt,
+        'rows_sent_on_retry': len(module.firehose_client.records),
+        'resumed_after_rows': retry_stats.get('resumed_rows', 0),
+        'retry_seconds': round(retry_seconds, 3),
+        'unique_rows_delivered': len(set(delivered)),
+        'duplicate_rows': len(delivered) - len(set(delivered)),
+        'reupload_skipped': reupload_stats.get('skipped', False),
+    }
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def suite_result(workload, unit, latency_per, latencies, elapsed, baseline_kb, operations=None, **extra):
+    """
+    Standard result record shared by the --suite workloads of every project.
+
+    operations counts units of work (defaults to one per latency sample);
+    throughput is operations per second.
+    """
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    operations = len(latencies) if operations is None else operations
+    return {
+        'workload': workload,
+        'operations': operations,
+        'unit': unit,
+        'seconds': round(elapsed, 3),
+        'throughput_per_second': round(operations / elapsed, 1),
+        'latency_per': latency_per,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p90_ms': round(percentile(latencies, 0.90) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3),
+        'peak_rss_mb': round(peak_kb / 1024, 1),
+        'rss_growth_mb': round((peak_kb - baseline_kb) / 1024, 1),
+        **extra,
+    }
+
+
+def run_suite(scale, latency_ms, files=20, rows_per_file=5000):
+    """
+    End-to-end workload for run_benchmarks.py: S3 events for files * scale
+    CSV uploads built from sample-data.csv, each processed by lambda_handler
+    against the stub S3 and Firehose clients with the module's default settings.
+    """
+    module = load_transform_module()
+    module.logger.setLevel('WARNING')
+    module.s3_client = StubS3Client(latency_ms)
+    module.firehose_client = StubFirehoseClient(latency_ms, keep_records=False)
+    events = []
+    for index in range(files * scale):
+        # Distinct content per file, so checkpointing does not skip repeats
+        object_key = f'uploads/products-{index:04d}.csv'
+        module.s3_client.put_object(Bucket='benchmark-bucket', Key=object_key,
+                                    Body=generate_csv(rows_per_file, index * rows_per_file + 1))
+        events.append({'Records': [{'s3': {'bucket': {'name': 'benchmark-bucket'}, 'object': {'key': object_key}}}]})
+
+    module.s3_client.calls = 0
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    latencies = []
+    started = time.perf_counter()
+    for event in events:
+        file_started = time.perf_counter()
+        module.lambda_handler(event, None)
+        latencies.append(time.perf_counter() - file_started)
+    elapsed = time.perf_counter() - started
+
+    return suite_result(
+        'csv-pipeline', 'rows', 'file', latencies, elapsed, baseline_kb, operations=len(events) * rows_per_file,
+        rows_delivered=module.firehose_client.records_received,
+        s3_calls=module.s3_client.calls,
+        firehose_calls=module.firehose_client.calls,
+    )
+
+
+LOGGING_CONFIGS = [
+    # (name, level, sample rate, format)
+    ('off', 'CRITICAL', 100, 'json'),
+    ('info', 'INFO', 100, 'json'),
+    ('info-text', 'INFO', 100, 'text'),
+    ('debug-sampled', 'DEBUG', 100, 'json'),
+    ('debug-every-row', 'DEBUG', 1, 'json'),
+    ('debug-every-row-text', 'DEBUG', 1, 'text'),
+]
+
+
+def run_logging_benchmark(module, data, repeats=3):
+    """
+    Per-row cost of logging with the row engine, at each level, sample rate and format.
+
+    Log lines are formatted and written to os.devnull, so the cost includes everything
+    up to the write CloudWatch would ingest. 'debug-every-row' matches the original
+    one INFO line per row.
+    """
+    object_key = 'benchmark/input.csv'
+    module.TRANSFORM_ENGINE = 'row'
+    rows = data.count(b'\n') - 1
+    root = logging.getLogger()
+    handler = logging.StreamHandler(open(os.devnull, 'w'))
+    root.addHandler(handler)
+    results = []
+    try:
+        for name, level, sample_rate, log_format in LOGGING_CONFIGS:
+            module.LOG_LEVEL, module.LOG_SAMPLE_RATE, module.LOG_FORMAT = level, sample_rate, log_format
+            handler.setFormatter(logging.Formatter('[%(levelname)s]\t%(asctime)s\t%(message)s'))
+            module.configure_logging()
+            best = None
+            for _ in range(repeats):
+                module.s3_client = StubS3Client()
+                module.s3_client.put_object(Bucket='benchmark-bucket', Key=object_key, Body=data)
+                module.firehose_client = StubFirehoseClient()
+                start_time = time.perf_counter()
+                module.process_csv_file('benchmark-bucket', object_key, streaming=True, parallel=False)
+                elapsed = time.perf_counter() - start_time
+                best = elapsed if best is None else min(best, elapsed)
+            results.append({'config': name, 'seconds': round(best, 3), 'us_per_row': round(best / rows * 1e6, 2)})
+    finally:
+        root.removeHandler(handler)
+        handler.stream.close()
+        module.logger.setLevel('WARNING')
+
+    baseline = results[0]['us_per_row']
+    for result in results:
+        result['logging_us_per_row'] = round(result['us_per_row'] - baseline, 2)
+    return results
+
+
+def measure_peak_memory(name, size_mb, results):
+    """
+    Run one scenario over a generated object of size_mb and report peak RSS.
+
+    Executed in a fresh process so ru_maxrss only reflects this scenario.
+    """
+    module = load_transform_module()
+    module.logger.setLevel('WARNING')
+    module.CHECKPOINT_STORE = 'none'
+    object_key = 'benchmark/large.csv'
+    module.s3_client = StubS3Client()
+    module.s3_client.put_generated_object(Bucket='benchmark-bucket', Key=object_key, size_bytes=size_mb * 1024 * 1024)
+    module.firehose_client = StubFirehoseClient(keep_records=False)
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start_time = time.perf_counter()
+    SCENARIOS[name](module, object_key)
+    elapsed = time.perf_counter() - start_time
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    results.put({
+        'scenario': name,
+        'object_mb': size_mb,
+        'rows_delivered': module.firehose_client.records_received,
+        'seconds': round(elapsed, 3),
+        'peak_rss_mb': round(peak_kb / 1024, 1),
+        'peak_rss_growth_mb': round((peak_kb - baseline_kb) / 1024, 1),
+    })
+
+
+def run_memory_benchmark(size_mb, scenarios):
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    output = []
+    for name in scenarios:
+        process = context.Process(target=measure_peak_memory, args=(name, size_mb, results))
+        process.start()
+        output.append(results.get())
+        process.join()
+    return output
+
+
+def check_streaming_memory(size_mb, large):
+    """
+    Fail if the streaming scenario's peak memory grows with the object size.
+
+    Runs streaming again over an object a tenth of size_mb and compares its RSS
+    growth with the size_mb run, so the bound does not depend on the file size.
+    """
+    small = run_memory_benchmark(max(1, size_mb // 10), ['streaming'])[0]
+    check = {
+        'check': 'streaming peak memory independent of object size',
+        'small_object_mb': small['object_mb'],
+        'small_growth_mb': small['peak_rss_growth_mb'],
+        'large_object_mb': large['object_mb'],
+        'large_growth_mb': large['peak_rss_growth_mb'],
+        'allowed_extra_mb': STREAMING_MEMORY_SLACK_MB,
+    }
+    check['passed'] = large['peak_rss_growth_mb'] <= small['peak_rss_growth_mb'] + STREAMING_MEMORY_SLACK_MB
+    return check
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=20000, help='number of synthetic CSV rows')
+    parser.add_argument('--latency-ms', type=float, default=5, help='simulated latency per AWS API call')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of batch records rejected by the stub Firehose')
+    parser.add_argument('--transform', action='store_true', help='micro-benchmark the row and columnar transform engines')
+    parser.add_argument('--checkpoint', action='store_true', help='interrupt and resume a file to check checkpointing')
+    parser.add_argument('--formats', action='store_true', help='compare output size and throughput of each output format')
+    parser.add_argument('--logging', action='store_true', help='measure per-row logging overhead at each log level')
+    parser.add_argument('--chunk-kb', type=int, help='byte-range size for the parallel scenario (default: the Lambda setting)')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), action='append', help='scenario(s) to run (default: all)')
+    parser.add_argument('--memory', action='store_true', help='measure peak RSS on a large generated object instead')
+    parser.add_argument('--size-mb', type=int, default=300, help='size of the generated object for --memory')
+    parser.add_argument('--suite', action='store_true', help='run the end-to-end workload used by run_benchmarks.py')
+    parser.add_argument('--scale', type=int, default=1, help='workload size multiplier for --suite')
+    args = parser.parse_args()
+
+    if args.suite:
+        print(json.dumps(run_suite(args.scale, args.latency_ms), indent=2))
+        return
+
+    if args.memory:
+        results = run_memory_benchmark(args.size_mb, args.scenario or MEMORY_SCENARIOS)
+        streaming = [result for result in results if result['scenario'] == 'streaming']
+        check = check_streaming_memory(args.size_mb, streaming[0]) if streaming else None
+        print(json.dumps(results + ([check] if check else []), indent=2))
+        if check and not check['passed']:
+            raise SystemExit(f"Streaming peak memory grew by {check['large_growth_mb']} MB for a "
+                             f"{check['large_object_mb']} MB object, more than {STREAMING_MEMORY_SLACK_MB} MB "
+                             f"above the {check['small_growth_mb']} MB for {check['small_object_mb']} MB")
+        return
+
+    module = load_transform_module()
+    module.logger.setLevel('WARNING')
+    # Scenarios re-process the same content, which checkpointing would skip
+    module.CHECKPOINT_STORE = 'none'
+    if args.chunk_kb:
+        module.PARALLEL_CHUNK_BYTES = args.chunk_kb * 1024
+    data = generate_csv(args.rows)
+
+    if args.checkpoint:
+        print(json.dumps(run_checkpoint_benchmark(module, data), indent=2))
+        return
+
+    if args.formats:
+        print(json.dumps(run_format_benchmark(module, data), indent=2))
+        return
+
+    if args.logging:
+        print(json.dumps(run_logging_benchmark(module, data), indent=2))
+        return
+
+    if args.transform:
+        check = check_typed_engine_equivalence(module)
+        print(json.dumps(run_transform_benchmark(module, data) + [check], indent=2))
+        if not check['passed']:
+            raise SystemExit('The row and columnar engines disagree on typed columns, or wrote invalid JSON')
+        return
+
+    results = [
+        run_scenario(module, name, data, args.latency_ms, args.failure_rate)
+        for name in (args.scenario or SCENARIOS)
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
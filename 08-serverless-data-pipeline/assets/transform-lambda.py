@@ -1,21 +1,191 @@
+import re
 import json
 import csv
+import os
+import math
+import time
 import boto3
+import hashlib
 import logging
+import itertools
+import threading
+from collections import deque
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from json.encoder import encode_basestring_ascii
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import unquote_plus
 from io import StringIO
+from botocore.config import Config
+from emf_metrics import Metrics, instrument_client
+
+# pyarrow is only needed for OUTPUT_FORMAT = 'parquet' (e.g. from the AWS SDK for pandas layer)
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Logging: the level comes from the LOG_LEVEL environment variable (or the function's
+# log level setting). Per-row lines are DEBUG, and only 1 in LOG_SAMPLE_RATE of them
+# (and of row errors) is written; each file ends with one summary line. LOG_FORMAT
+# 'json' writes one JSON object per line so summary fields can be queried in
+# CloudWatch Logs Insights, 'text' keeps the Lambda runtime's format.
+LOG_LEVEL = os.environ.get('LOG_LEVEL') or os.environ.get('AWS_LAMBDA_LOG_LEVEL') or 'INFO'
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
 
 # Configure logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-s3_client = boto3.client('s3')
-firehose_client = boto3.client('firehose')
+def read_log_sample_rate(default=100):
+    """
+    Read LOG_SAMPLE_RATE from the environment, falling back to the default if it is not an integer.
+    """
+    
+    value = os.environ.get('LOG_SAMPLE_RATE')
+    if not value:
+        return default
+    try:
+        return max(1, int(value))
+    except ValueError:
+        logger.warning("Invalid LOG_SAMPLE_RATE %r, using %d", value, default)
+        return default
+
+LOG_SAMPLE_RATE = read_log_sample_rate()
 
 # Configuration - Update this with your actual Firehose stream name
 FIREHOSE_STREAM_NAME = 'data-transformation-stream'
 
+# Firehose PutRecordBatch limits (per call) and retry settings
+FIREHOSE_MAX_BATCH_RECORDS = 500
+FIREHOSE_MAX_BATCH_BYTES = 4 * 1024 * 1024
+FIREHOSE_MAX_RECORD_BYTES = 1000 * 1024
+FIREHOSE_MAX_RETRIES = 3
+FIREHOSE_RETRY_BASE_DELAY = 0.1  # seconds, doubled on each retry
+
+# Stream the S3 object instead of loading the whole file into memory
+STREAM_CSV_INPUT = True
+S3_READ_CHUNK_SIZE = 64 * 1024  # bytes
+
+# Split large objects into byte ranges processed on a thread pool.
+# Lambda allocates more vCPUs at higher memory settings, so the pool scales with them.
+PARALLEL_CSV_INPUT = True
+PARALLEL_MIN_OBJECT_BYTES = 64 * 1024 * 1024
+PARALLEL_CHUNK_BYTES = 16 * 1024 * 1024
+PARALLEL_MAX_WORKERS = (os.cpu_count() or 1) * 2
+
+# Transform engine: 'row' transforms one dict per row, 'columnar' cleans and
+# serializes blocks of rows column by column (byte-identical output, less CPU)
+TRANSFORM_ENGINE = 'columnar'
+COLUMNAR_BLOCK_ROWS = 1000
+
+# Output format:
+#   'json'          - one JSON record per row, each with its own metadata block
+#   'ndjson-header' - one header record per file with the metadata, rows reference it by file_id
+#   'parquet'       - Parquet files (dictionary-encoded string columns) written straight to S3,
+#                     since Firehose would concatenate Parquet files into an unreadable object
+OUTPUT_FORMAT = 'json'
+PARQUET_OUTPUT_BUCKET = 'your-processed-data-bucket'
+PARQUET_OUTPUT_PREFIX = 'parquet/'
+PARQUET_ROWS_PER_FILE = 500000
+
+# Column type inference: the first SCHEMA_SAMPLE_ROWS rows decide whether each column
+# is an int, float, decimal, date or string. Compiled converters are cached per
+# S3 prefix and header, so later files with the same layout skip inference.
+INFER_COLUMN_TYPES = True
+SCHEMA_SAMPLE_ROWS = 100
+SCHEMA_CACHE_MAX_ENTRIES = 128
+DATE_FORMATS = ('%Y-%m-%d', '%Y/%m/%d', '%m/%d/%Y')
+
+INT_PATTERN = re.compile(r'-?(?:0|[1-9][0-9]{0,17})\Z')  # no leading zeros (IDs, zip codes), fits int64
+DECIMAL_PATTERN = re.compile(r'-?[0-9]+(?:\.([0-9]+))?\Z')
+FLOAT_PATTERN = re.compile(r'-?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?\Z')
+
+# Column schemas kept across warm invocations, keyed by (S3 prefix, header signature)
+schema_cache = {}
+
+# Checkpointing: after every Firehose batch the byte offset and row count reached are
+# saved, so a retried invocation resumes where the failed one stopped, and a file whose
+# content (ETag) was already fully processed is skipped. Store: 'none' (off),
+# 'memory' (warm container only), 'file' (local JSON file) or 'dynamodb' (durable, recommended)
+CHECKPOINT_STORE = 'none'
+CHECKPOINT_FILE_PATH = '/tmp/csv-checkpoints.json'
+CHECKPOINT_TABLE_NAME = 'csv-pipeline-checkpoints'
+CHECKPOINT_TTL_SECONDS = 7 * 24 * 60 * 60
+
+checkpoint_store = None
+
+# AWS clients are created on first use (not at import time) and reused across warm
+# invocations. The connection pool must hold one connection per parallel range reader.
+BOTO_CONFIG = Config(
+    connect_timeout=5,
+    read_timeout=60,
+    retries={'max_attempts': 5, 'mode': 'standard'},
+    tcp_keepalive=True,
+    max_pool_connections=max(10, PARALLEL_MAX_WORKERS)
+)
+
+# Metrics are written to the function's log as CloudWatch Embedded Metric
+# Format: one line per invocation, turned into metrics by CloudWatch Logs. The
+# recorder comes from emf_metrics.py, which is deployed next to this file
+METRICS_ENABLED = True
+METRICS_NAMESPACE = 'CSVPipeline'
+METRICS_SERVICE = 'csv-transform'
+metrics = None
+
+s3_client = None
+firehose_client = None
+client_lock = threading.Lock()  # range reader threads may ask for a client concurrently
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formats log records as single-line JSON objects.
+    
+    Fields passed as extra={'fields': {...}} become top-level keys next to the
+    level, message and request ID.
+    """
+    
+    def format(self, record):
+        entry = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'message': record.getMessage()
+        }
+        request_id = getattr(record, 'aws_request_id', None)
+        if request_id:
+            entry['requestId'] = request_id
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class LogSampler:
+    """
+    Returns True for one in every LOG_SAMPLE_RATE calls, starting with the first.
+    """
+    
+    def __init__(self):
+        self.counter = itertools.count()
+    
+    def __call__(self):
+        return next(self.counter) % LOG_SAMPLE_RATE == 0
+
+def configure_logging():
+    """
+    Apply LOG_LEVEL and LOG_FORMAT to the root logger and the handlers the Lambda runtime installed.
+    """
+    
+    level = logging.getLevelName(LOG_LEVEL.upper())
+    logger.setLevel(level if isinstance(level, int) else logging.INFO)
+    if LOG_FORMAT == 'json':
+        for handler in logger.handlers:
+            handler.setFormatter(StructuredFormatter())
+
+configure_logging()
+row_log_sampler = LogSampler()
+row_error_sampler = LogSampler()
+
 def lambda_handler(event, context):
     """
     Lambda function to process CSV files from S3 and send transformed JSON to Kinesis Data Firehose.
@@ -25,7 +195,9 @@ def lambda_handler(event, context):
     """
     
     try:
-        logger.info(f"Received event: {json.dumps(event)}")
+        logger.info("Received event with %s record(s)", len(event['Records']))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Received event: %s", json.dumps(event))
         
         # Process each record in the event (S3 can send multiple records)
         for record in event['Records']:
@@ -33,11 +205,11 @@ def lambda_handler(event, context):
             bucket_name = record['s3']['bucket']['name']
             object_key = unquote_plus(record['s3']['object']['key'])
             
-            logger.info(f"Processing file: {object_key} from bucket: {bucket_name}")
+            logger.info("Processing file: %s from bucket: %s", object_key, bucket_name)
             
             # Validate file extension
             if not object_key.lower().endswith('.csv'):
-                logger.warning(f"Skipping non-CSV file: {object_key}")
+                logger.warning("Skipping non-CSV file: %s", object_key)
                 continue
             
             # Download and process the CSV file
@@ -52,62 +224,717 @@ def lambda_handler(event, context):
         }
         
     except Exception as e:
-        logger.error(f"Error processing event: {str(e)}")
+        logger.error("Error processing event: %s", e)
         raise e
+    
+    finally:
+        # One EMF line with every timing recorded during this invocation
+        get_metrics().flush()
 
-def process_csv_file(bucket_name, object_key):
+def process_csv_file(bucket_name, object_key, streaming=None, parallel=None):
     """
     Download CSV file from S3, transform to JSON, and send to Firehose.
     
+    In streaming mode the object is decoded chunk by chunk and rows flow through
+    read -> transform -> batch -> send one at a time, so peak memory stays flat
+    regardless of file size. Objects of at least PARALLEL_MIN_OBJECT_BYTES are
+    split into byte ranges and processed on a thread pool instead. With a
+    checkpoint store configured, a retried invocation resumes from the last
+    flushed batch and already processed content is skipped.
+    
     Args:
         bucket_name (str): S3 bucket name
         object_key (str): S3 object key (file path)
+        streaming (bool): Stream the object instead of reading it whole
+                          (defaults to STREAM_CSV_INPUT)
+        parallel (bool): Force (True) or disable (False) byte-range processing;
+                         None decides based on PARALLEL_CSV_INPUT and object size
+                         
+    Returns:
+        dict: Processing statistics for the file
     """
     
+    if streaming is None:
+        streaming = STREAM_CSV_INPUT
+    
     try:
+        store = get_checkpoint_store()
+        head = None
+        if store is not None or (parallel is None and PARALLEL_CSV_INPUT):
+            head = get_s3_client().head_object(Bucket=bucket_name, Key=object_key)
+        object_size = head['ContentLength'] if head else None
+        
+        progress_key = None
+        if store is not None:
+            # The ETag identifies the object's content (and version) without reading it
+            etag = head['ETag'].strip('"')
+            content_key = f"content#{etag}#{object_size}"
+            processed = store.get(content_key)
+            if processed:
+                logger.info("Skipping %s: identical content already processed from %s",
+                            object_key, processed['source'])
+                return {'total_rows': 0, 'successful': 0, 'failed': 0, 'batches': 0, 'retries': 0,
+                        'bytes': 0, 'skipped': True}
+            progress_key = f"progress#{bucket_name}/{object_key}#{etag}"
+        
+        if parallel is None:
+            parallel = PARALLEL_CSV_INPUT and object_size >= PARALLEL_MIN_OBJECT_BYTES
+        
+        metrics = get_metrics()
+        with metrics.timer('ProcessFile'):
+            if parallel:
+                stats = process_csv_file_parallel(bucket_name, object_key, object_size, store, progress_key)
+            else:
+                stats = process_csv_file_sequential(bucket_name, object_key, streaming, store, progress_key,
+                                                    object_size)
+        metrics.count('Files')
+        metrics.count('Rows', stats['total_rows'])
+        metrics.count('FailedRows', stats['failed'])
+        
+        # Only a file whose every row was delivered counts as processed; otherwise an
+        # upload of the same content must run again instead of being skipped
+        if store is not None and stats['failed'] == 0:
+            store.put(content_key, {'source': f"{bucket_name}/{object_key}", 'rows': stats['total_rows']})
+        
+        return stats
+        
+    except Exception as e:
+        logger.error("Error processing CSV file %s: %s", object_key, e)
+        raise e
+
+def process_csv_file_sequential(bucket_name, object_key, streaming, store=None, progress_key=None,
+                                object_size=None):
+    """
+    Process a CSV object on a single thread, resuming from a saved checkpoint if there is one.
+    
+    Args:
+        bucket_name (str): S3 bucket name
+        object_key (str): S3 object key (file path)
+        streaming (bool): Stream the object instead of reading it whole
+        store: Checkpoint store, or None to disable checkpointing
+        progress_key (str): Checkpoint key for this object version
+        object_size (int): Object size in bytes; a checkpoint at the end of the
+                           object resumes without reading anything
+        
+    Returns:
+        dict: Processing statistics for the file
+    """
+    
+    # Checkpoints need byte offsets, which only the streaming reader tracks
+    checkpoint = None
+    if store is not None and streaming:
+        saved = store.get(progress_key) or {}
+        checkpoint = FileCheckpoint(store, progress_key, saved.get('offset', 0), saved.get('rows', 0))
+    
+    column_schema = None
+    if checkpoint and checkpoint.offset:
+        # Resume at the record boundary after the last delivered batch
+        logger.info("Resuming %s at byte %s after %s rows", object_key, checkpoint.offset, checkpoint.rows)
+        fieldnames, _ = read_csv_header(bucket_name, object_key)
+        if INFER_COLUMN_TYPES:
+            column_schema = load_column_schema(bucket_name, object_key, fieldnames)
+        end = object_size if object_size is not None else float('inf')
+        lines = iter_range_lines(bucket_name, object_key, checkpoint.offset, end,
+                                 in_quotes=False, skip_partial=False, progress=checkpoint)
+        csv_reader = csv.DictReader(lines, fieldnames=fieldnames)
+    else:
         # Download CSV file from S3
-        logger.info(f"Downloading file {object_key} from bucket {bucket_name}")
-        response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
-        csv_content = response['Body'].read().decode('utf-8')
+        logger.info("Downloading file %s from bucket %s", object_key, bucket_name)
+        response = get_s3_client().get_object(Bucket=bucket_name, Key=object_key)
         
         # Parse CSV content
-        csv_reader = csv.DictReader(StringIO(csv_content))
+        if streaming:
+            csv_reader = csv.DictReader(iter_s3_lines(response['Body'], progress=checkpoint))
+        else:
+            csv_content = response['Body'].read().decode('utf-8')
+            csv_reader = csv.DictReader(StringIO(csv_content))
+    
+    stats = transform_and_send(csv_reader, object_key, column_schema=column_schema, checkpoint=checkpoint)
+    
+    if checkpoint:
+        stats['resumed_rows'] = checkpoint.start_rows
+        stats['total_rows'] += checkpoint.start_rows
+        checkpoint.complete()
+    
+    log_processing_summary(object_key, stats)
+    
+    return stats
+
+def transform_and_send(csv_reader, object_key, engine=None, output_format=None, chunk_index=None,
+                       column_schema=None, checkpoint=None):
+    """
+    Transform every row produced by a CSV reader and deliver it in the configured output format.
+    
+    Args:
+        csv_reader (csv.DictReader): Reader yielding CSV rows as dictionaries
+        object_key (str): S3 object key, used as the record source file
+        engine (str): 'row' or 'columnar' (defaults to TRANSFORM_ENGINE)
+        output_format (str): 'json', 'ndjson-header' or 'parquet' (defaults to OUTPUT_FORMAT)
+        chunk_index (int): Byte-range index when called for part of a file, None for a whole file
+        column_schema (dict): Schema from get_column_schema; inferred from the reader
+                              when INFER_COLUMN_TYPES is set and this is a whole file
+        checkpoint (FileCheckpoint): Progress tracker saved after every Firehose batch
         
-        # Track processing statistics
-        total_rows = 0
-        successful_records = 0
-        failed_records = 0
+    Returns:
+        dict: Row and delivery statistics
+    """
+    
+    if engine is None:
+        engine = TRANSFORM_ENGINE
+    if output_format is None:
+        output_format = OUTPUT_FORMAT
+    if column_schema is None and INFER_COLUMN_TYPES and chunk_index is None:
+        column_schema = get_column_schema(csv_reader, object_key, checkpoint)
+    
+    converters = column_schema['converters'] if column_schema else None
+    
+    if output_format == 'parquet':
+        return write_parquet(csv_reader, object_key, chunk_index, column_schema)
+    
+    # Records are buffered and sent with PutRecordBatch instead of one call per row
+    sender = FirehoseBatchSender(get_firehose_client(), FIREHOSE_STREAM_NAME,
+                                 on_flush=checkpoint.save if checkpoint else None)
+    
+    if output_format == 'ndjson-header' and not chunk_index and not (checkpoint and checkpoint.rows):
+        # The per-file metadata is sent once, ahead of the rows that reference it
+        sender.add(build_header_record(csv_reader.fieldnames, object_key, column_schema))
+    
+    if engine == 'columnar':
+        total_rows, failed_records = send_rows_columnar(csv_reader, object_key, sender, output_format,
+                                                        converters, checkpoint)
+    else:
+        total_rows, failed_records = send_rows(csv_reader, object_key, sender, output_format,
+                                               converters, checkpoint)
+    
+    # Send whatever is left in the buffer
+    sender.flush()
+    
+    return {
+        'total_rows': total_rows,
+        'successful': sender.stats['records_sent'],
+        'failed': failed_records + sender.stats['records_failed'],
+        'batches': sender.stats['batches'],
+        'retries': sender.stats['retries'],
+        'bytes': sender.stats['bytes_sent']
+    }
+
+def send_rows(csv_reader, object_key, sender, output_format='json', converters=None, checkpoint=None):
+    """
+    Transform CSV rows one at a time with transform_row_to_json and queue them for Firehose.
+    
+    With a checkpoint, every record is queued with the input position after its row
+    (byte offset, row count) so each flushed batch can be checkpointed.
+    
+    Returns:
+        tuple: (total rows read, rows that failed to transform)
+    """
+    
+    # Track processing statistics
+    total_rows = 0
+    failed_records = 0
+    log_rows = logger.isEnabledFor(logging.DEBUG)
+    
+    # Process each row in the CSV
+    for row in csv_reader:
+        total_rows += 1
         
-        # Process each row in the CSV
-        for row in csv_reader:
-            total_rows += 1
+        try:
+            # Transform CSV row to JSON and queue it for Firehose
+            json_record = transform_row_for_output(row, object_key, output_format, converters)
+            position = None
+            if checkpoint:
+                position = (reader_offset(csv_reader, checkpoint), checkpoint.rows + total_rows)
+            sender.add(json_record, position)
+            
+            if log_rows and row_log_sampler():
+                logger.debug("Transformed row %s: %s", total_rows, json_record)
+            
+        except FirehoseDeliveryError:
+            # Not a problem with this row: fail the invocation so it is retried
+            raise
+        except Exception as row_error:
+            failed_records += 1
+            if row_error_sampler():
+                logger.error("Failed to process row %s: %s", total_rows, row_error)
+            # Continue processing other rows even if one fails
+            continue
+    
+    return total_rows, failed_records
+
+def send_rows_columnar(csv_reader, object_key, sender, output_format='json', converters=None,
+                       checkpoint=None):
+    """
+    Transform CSV rows in blocks of COLUMNAR_BLOCK_ROWS and queue them for Firehose.
+    
+    Rows are read from the reader's underlying csv.reader as lists and handed to
+    transform_block_to_ndjson. Rows whose length does not match the header are
+    routed through transform_row_to_json so the output stays identical to the
+    row engine.
+    
+    Returns:
+        tuple: (total rows read, rows that failed to transform)
+    """
+    
+    fieldnames = csv_reader.fieldnames
+    if not fieldnames or len(set(fieldnames)) != len(fieldnames):
+        # Duplicate column names collapse into one dict key; leave that to the row engine
+        return send_rows(csv_reader, object_key, sender, output_format, converters, checkpoint)
+    
+    if output_format == 'ndjson-header':
+        metadata_key, metadata_json = 'file_id', json.dumps(build_file_id(object_key))
+    else:
+        metadata_key, metadata_json = 'metadata', json.dumps(build_record_metadata(object_key))
+    field_count = len(fieldnames)
+    total_rows = 0
+    failed_records = 0
+    
+    metrics = get_metrics()
+    raw_rows = csv_reader.reader
+    while True:
+        # Reading a block includes decoding the S3 stream and CSV parsing
+        parse_started = time.perf_counter()
+        if checkpoint:
+            # Remember where each row ends so queued records carry their input position
+            block, offsets = [], []
+            for row in islice(raw_rows, COLUMNAR_BLOCK_ROWS):
+                block.append(row)
+                offsets.append(reader_offset(csv_reader, checkpoint))
+        else:
+            block = list(islice(raw_rows, COLUMNAR_BLOCK_ROWS))
+            offsets = [None] * len(block)
+        metrics.record('CSVParseBlock', (time.perf_counter() - parse_started) * 1000)
+        if not block:
+            break
+        
+        regular_rows, regular_offsets = [], []
+        for row, offset in zip(block, offsets):
+            if len(row) == field_count:
+                regular_rows.append(row)
+                regular_offsets.append(offset)
+                continue
+            if not row:
+                # csv.DictReader skips blank lines
+                continue
+            
+            # Ragged row: send the pending block first to preserve row order
+            with metrics.timer('TransformBlock'):
+                lines = transform_block_to_ndjson(fieldnames, regular_rows, metadata_json, metadata_key, converters)
+            failed_records += queue_ndjson_lines(sender, lines, total_rows, regular_offsets, checkpoint)
+            total_rows += len(regular_rows) + 1
+            regular_rows, regular_offsets = [], []
             
             try:
-                # Transform CSV row to JSON and send to Firehose
-                json_record = transform_row_to_json(row, object_key)
-                send_to_firehose(json_record)
-                successful_records += 1
-                
-                logger.info(f"Successfully processed row {total_rows}: {json_record}")
-                
+                position = (offset, checkpoint.rows + total_rows) if checkpoint else None
+                sender.add(transform_row_for_output(dict_row(csv_reader, row), object_key, output_format, converters),
+                           position)
+            except FirehoseDeliveryError:
+                raise
             except Exception as row_error:
                 failed_records += 1
-                logger.error(f"Failed to process row {total_rows}: {str(row_error)}")
-                # Continue processing other rows even if one fails
-                continue
+                if row_error_sampler():
+                    logger.error("Failed to process row %s: %s", total_rows, row_error)
+        
+        with metrics.timer('TransformBlock'):
+            lines = transform_block_to_ndjson(fieldnames, regular_rows, metadata_json, metadata_key, converters)
+        failed_records += queue_ndjson_lines(sender, lines, total_rows, regular_offsets, checkpoint)
+        total_rows += len(regular_rows)
+    
+    return total_rows, failed_records
+
+def queue_ndjson_lines(sender, lines, rows_before, offsets=None, checkpoint=None):
+    """
+    Queue serialized NDJSON lines for Firehose, counting the ones that are rejected.
+    
+    Args:
+        sender (FirehoseBatchSender): Sender to queue the records on
+        lines (list): NDJSON lines produced by transform_block_to_ndjson
+        rows_before (int): Number of rows read before this block, for error messages
+        offsets (list): Byte offset after each row, when checkpointing
+        checkpoint (FileCheckpoint): Progress tracker, if checkpointing
+        
+    Returns:
+        int: Number of lines that could not be queued
+    """
+    
+    failed = 0
+    for index, line in enumerate(lines):
+        row_number = rows_before + index + 1
+        position = (offsets[index], checkpoint.rows + row_number) if checkpoint else None
+        try:
+            sender.add_encoded(line.encode('utf-8'), position)
+        except FirehoseDeliveryError:
+            raise
+        except Exception as row_error:
+            failed += 1
+            if row_error_sampler():
+                logger.error("Failed to process row %s: %s", row_number, row_error)
+    return failed
+
+def encode_typed_value(converter, value):
+    """
+    JSON-encode a cleaned value with a column converter, keeping it a string if it does not parse.
+    """
+    
+    parse, _, to_json_text = converter
+    try:
+        return to_json_text(parse(value))
+    except ValueError:
+        return encode_basestring_ascii(value)
+
+def dict_row(csv_reader, row):
+    """
+    Build the dictionary csv.DictReader would return for a raw row.
+    """
+    
+    fieldnames = csv_reader.fieldnames
+    row_dict = dict(zip(fieldnames, row))
+    if len(fieldnames) < len(row):
+        row_dict[csv_reader.restkey] = row[len(fieldnames):]
+    else:
+        for key in fieldnames[len(row):]:
+            row_dict[key] = csv_reader.restval
+    return row_dict
+
+def transform_block_to_ndjson(fieldnames, rows, metadata_json, metadata_key='metadata', converters=None):
+    """
+    Columnar equivalent of transform_row_to_json for a block of rows.
+    
+    The block is transposed into columns, whitespace stripping, empty-value
+    removal and JSON string encoding are done per column, and each row is then
+    assembled into the exact NDJSON line json.dumps would produce for the
+    record returned by transform_row_to_json.
+    
+    Args:
+        fieldnames (list): Column names, all distinct
+        rows (list): Rows as lists of strings, each with one value per column
+        metadata_json (str): JSON-encoded metadata shared by every record
+        metadata_key (str): Key the metadata is stored under ('metadata', or 'file_id'
+                            for the ndjson-header format)
+        converters (dict): Typed column converters from compile_column_converters
+        
+    Returns:
+        list: NDJSON lines (str), one per row, each ending with a newline
+    """
+    
+    if not rows:
+        return []
+    
+    encoded_columns = []
+    for fieldname, column in zip(fieldnames, zip(*rows)):
+        key_prefix = encode_basestring_ascii(fieldname) + ': '
+        converter = converters.get(fieldname) if converters else None
+        if converter is None:
+            encoded_columns.append([
+                key_prefix + encode_basestring_ascii(value) if value else None
+                for value in (value.strip() for value in column)
+            ])
+        else:
+            encoded_columns.append([
+                key_prefix + encode_typed_value(converter, value) if value else None
+                for value in (value.strip() for value in column)
+            ])
+    
+    prefix = '{"data": {'
+    suffix = '}, ' + encode_basestring_ascii(metadata_key) + ': ' + metadata_json + '}\n'
+    return [
+        prefix + ', '.join(filter(None, cells)) + suffix
+        for cells in zip(*encoded_columns)
+    ]
+
+def log_processing_summary(object_key, stats):
+    """
+    Log the processing summary for a file.
+    
+    Args:
+        object_key (str): S3 object key (file path)
+        stats (dict): Statistics returned by transform_and_send
+    """
+    
+    logger.info(
+        "Processing complete for %s: %s rows, %s successful, %s failed, %s Firehose batches (%s retries)",
+        object_key, stats['total_rows'], stats['successful'], stats['failed'], stats['batches'], stats['retries'],
+        extra={'fields': {
+            'event': 'file_processed',
+            'objectKey': object_key,
+            'totalRows': stats['total_rows'],
+            'successful': stats['successful'],
+            'failed': stats['failed'],
+            'firehoseBatches': stats['batches'],
+            'firehoseRetries': stats['retries']
+        }}
+    )
+    
+    if stats['total_rows'] == 0:
+        logger.warning("No data rows found in %s", object_key)
+
+def process_csv_file_parallel(bucket_name, object_key, object_size=None, store=None, progress_key=None):
+    """
+    Process a large CSV object as byte ranges on a thread pool.
+    
+    The object is split into PARALLEL_CHUNK_BYTES ranges fetched with ranged
+    get_object calls. A first pass counts the quote characters in each range so
+    every range knows whether it starts inside a quoted field; each worker then
+    owns exactly the records that start within its range, which keeps quoted
+    newlines intact and yields the same records as the sequential path.
+    
+    Args:
+        bucket_name (str): S3 bucket name
+        object_key (str): S3 object key (file path)
+        object_size (int): Object size in bytes, looked up with head_object if not given
+        store: Checkpoint store, or None to disable checkpointing
+        progress_key (str): Checkpoint key for this object version; each range
+                            is checkpointed separately under it
         
-        # Log processing summary
-        logger.info(f"Processing complete for {object_key}:")
-        logger.info(f"  Total rows: {total_rows}")
-        logger.info(f"  Successful: {successful_records}")
-        logger.info(f"  Failed: {failed_records}")
+    Returns:
+        dict: Processing statistics for the file, including per-chunk ordering metadata
+    """
+    
+    if object_size is None:
+        object_size = get_s3_client().head_object(Bucket=bucket_name, Key=object_key)['ContentLength']
+    fieldnames, header_size = read_csv_header(bucket_name, object_key)
+    column_schema = load_column_schema(bucket_name, object_key, fieldnames) if INFER_COLUMN_TYPES else None
+    
+    # Nominal byte ranges, covering everything after the header row
+    boundaries = list(range(header_size, object_size, PARALLEL_CHUNK_BYTES)) + [object_size]
+    ranges = list(zip(boundaries[:-1], boundaries[1:]))
+    
+    logger.info("Processing %s (%s bytes) as %s ranges on %s threads",
+                object_key, object_size, len(ranges), PARALLEL_MAX_WORKERS)
+    
+    with ThreadPoolExecutor(max_workers=PARALLEL_MAX_WORKERS) as executor:
+        # Pass 1: quote parity of each range, so ranges can be snapped to record boundaries
+        quote_counts = list(executor.map(
+            lambda byte_range: count_range_quotes(bucket_name, object_key, *byte_range), ranges
+        ))
         
-        if total_rows == 0:
-            logger.warning(f"No data rows found in {object_key}")
+        chunks = []
+        in_quotes = False
+        for index, (start, end) in enumerate(ranges):
+            chunks.append({'index': index, 'start': start, 'end': end, 'in_quotes': in_quotes})
+            in_quotes ^= bool(quote_counts[index] % 2)
         
-    except Exception as e:
-        logger.error(f"Error processing CSV file {object_key}: {str(e)}")
-        raise e
+        # Pass 2: transform and send the records owned by each range
+        chunk_stats = list(executor.map(
+            lambda chunk: process_csv_chunk(bucket_name, object_key, fieldnames, chunk, column_schema,
+                                            store, progress_key), chunks
+        ))
+    
+    if store is not None:
+        for chunk in chunks:
+            store.delete(chunk_checkpoint_key(progress_key, chunk))
+    
+    # Row ordering metadata: each chunk's position in the sequential row order
+    first_row = 1
+    for chunk in chunk_stats:
+        chunk['first_row'] = first_row
+        first_row += chunk['total_rows']
+    
+    stats = {
+        'total_rows': sum(chunk['total_rows'] for chunk in chunk_stats),
+        'successful': sum(chunk['successful'] for chunk in chunk_stats),
+        'failed': sum(chunk['failed'] for chunk in chunk_stats),
+        'batches': sum(chunk['batches'] for chunk in chunk_stats),
+        'retries': sum(chunk['retries'] for chunk in chunk_stats),
+        'bytes': sum(chunk['bytes'] for chunk in chunk_stats),
+        'resumed_rows': sum(chunk.get('resumed_rows', 0) for chunk in chunk_stats),
+        'chunks': chunk_stats
+    }
+    log_processing_summary(object_key, stats)
+    
+    return stats
+
+def process_csv_chunk(bucket_name, object_key, fieldnames, chunk, column_schema=None, store=None,
+                      progress_key=None):
+    """
+    Transform and send the CSV records that start within one byte range.
+    
+    Args:
+        bucket_name (str): S3 bucket name
+        object_key (str): S3 object key (file path)
+        fieldnames (list): Column names read from the header row
+        chunk (dict): Range description with index, start, end and in_quotes
+        column_schema (dict): Column schema shared by all chunks, if types are inferred
+        store: Checkpoint store, or None to disable checkpointing
+        progress_key (str): Checkpoint key for the whole object
+        
+    Returns:
+        dict: Statistics for the chunk, tagged with its index and byte range
+    """
+    
+    checkpoint = None
+    if store is not None:
+        key = chunk_checkpoint_key(progress_key, chunk)
+        saved = store.get(key) or {}
+        checkpoint = FileCheckpoint(store, key, saved.get('offset', 0), saved.get('rows', 0))
+    
+    if checkpoint and checkpoint.offset:
+        # Resume at the record boundary after the chunk's last delivered batch
+        lines = iter_range_lines(bucket_name, object_key, checkpoint.offset, chunk['end'],
+                                 in_quotes=False, skip_partial=False, progress=checkpoint)
+    else:
+        lines = iter_range_lines(bucket_name, object_key, chunk['start'], chunk['end'],
+                                 chunk['in_quotes'], skip_partial=chunk['index'] > 0, progress=checkpoint)
+    stats = transform_and_send(csv.DictReader(lines, fieldnames=fieldnames), object_key,
+                               chunk_index=chunk['index'], column_schema=column_schema,
+                               checkpoint=checkpoint)
+    if checkpoint:
+        stats['resumed_rows'] = checkpoint.start_rows
+        stats['total_rows'] += checkpoint.start_rows
+    stats.update({'index': chunk['index'], 'start': chunk['start'], 'end': chunk['end']})
+    
+    logger.info("Chunk %s (bytes %s-%s): %s rows", chunk['index'], chunk['start'], chunk['end'], stats['total_rows'])
+    
+    return stats
+
+def chunk_checkpoint_key(progress_key, chunk):
+    """
+    Checkpoint key for one byte range; the range bounds are part of the key so a
+    changed PARALLEL_CHUNK_BYTES never resumes from an incompatible checkpoint.
+    """
+    
+    return f"{progress_key}#{chunk['start']}-{chunk['end']}"
+
+def read_csv_header(bucket_name, object_key):
+    """
+    Read and parse the header row of a CSV object.
+    
+    Returns:
+        tuple: (list of column names, size of the header row in bytes)
+    """
+    
+    response = get_s3_client().get_object(Bucket=bucket_name, Key=object_key, Range='bytes=0-')
+    body = response['Body']
+    header_lines = []
+    in_quotes = False
+    
+    try:
+        # The header ends at the first newline outside a quoted field
+        for line in iter_s3_byte_lines(body):
+            header_lines.append(line)
+            in_quotes ^= bool(line.count(b'"') % 2)
+            if not in_quotes:
+                break
+    finally:
+        body.close()
+    
+    header = b''.join(header_lines)
+    fieldnames = next(csv.reader(StringIO(header.decode('utf-8'))), [])
+    
+    return fieldnames, len(header)
+
+def count_range_quotes(bucket_name, object_key, start, end):
+    """
+    Count the double-quote characters in bytes [start, end) of an object.
+    """
+    
+    response = get_s3_client().get_object(Bucket=bucket_name, Key=object_key, Range=f"bytes={start}-{end - 1}")
+    return sum(chunk.count(b'"') for chunk in response['Body'].iter_chunks(S3_READ_CHUNK_SIZE))
+
+def iter_range_lines(bucket_name, object_key, start, end, in_quotes, skip_partial, progress=None):
+    """
+    Yield the lines of every CSV record that starts within bytes [start, end).
+    
+    Reading begins one byte early so a range starting exactly on a line boundary
+    is detected, and continues past end until the last owned record is complete.
+    An empty range (start at or past end, e.g. a checkpoint saved after the last
+    record) yields nothing without a request, since S3 rejects a range that
+    starts at the end of the object with 416 InvalidRange.
+    
+    Args:
+        bucket_name (str): S3 bucket name
+        object_key (str): S3 object key (file path)
+        start (int): First byte of the range
+        end (int): Byte after the last byte of the range
+        in_quotes (bool): Whether start falls inside a quoted field
+        skip_partial (bool): Skip the line in progress at start (owned by the previous range)
+        progress (FileCheckpoint): If given, its offset is kept at the end of the last line read
+        
+    Yields:
+        str: Decoded lines, including their trailing newlines
+    """
+    
+    if start >= end:
+        return
+    
+    read_from = start - 1 if skip_partial else start
+    response = get_s3_client().get_object(Bucket=bucket_name, Key=object_key, Range=f"bytes={read_from}-")
+    body = response['Body']
+    lines = iter_s3_byte_lines(body)
+    offset = read_from
+    started = False
+    
+    try:
+        if skip_partial:
+            partial = next(lines, b'')
+            offset += len(partial)
+            # The extra leading byte was already counted by the previous range
+            in_quotes ^= bool(partial[1:].count(b'"') % 2)
+        
+        for line in lines:
+            if not in_quotes:
+                # Record boundary: stop once records start in the next range
+                if offset >= end:
+                    break
+                started = True
+            
+            offset += len(line)
+            in_quotes ^= bool(line.count(b'"') % 2)
+            
+            # Lines before the first record boundary belong to the previous range
+            if started:
+                if progress is not None:
+                    progress.offset = offset
+                yield line.decode('utf-8')
+    finally:
+        body.close()
+
+def iter_s3_byte_lines(body, chunk_size=S3_READ_CHUNK_SIZE):
+    """
+    Split an S3 StreamingBody into raw byte lines as it is read.
+    
+    Splitting happens on bytes, which is safe for UTF-8 because a newline byte
+    never occurs inside a multi-byte character. Only one chunk plus one partial
+    line is held in memory at a time.
+    
+    Args:
+        body: botocore StreamingBody returned by get_object
+        chunk_size (int): Number of bytes to read per chunk
+        
+    Yields:
+        bytes: One line of the file, including its trailing newline
+    """
+    
+    pending = b''
+    
+    for chunk in body.iter_chunks(chunk_size):
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + b'\n'
+    
+    if pending:
+        yield pending
+
+def iter_s3_lines(body, chunk_size=S3_READ_CHUNK_SIZE, progress=None):
+    """
+    Incrementally decode an S3 StreamingBody and yield it line by line.
+    
+    Lines keep their line endings so csv.DictReader can handle quoted fields
+    that span several lines.
+    
+    Args:
+        body: botocore StreamingBody returned by get_object
+        chunk_size (int): Number of bytes to read per chunk
+        progress (FileCheckpoint): If given, its offset is advanced past every line read
+        
+    Yields:
+        str: One line of the file, including its trailing newline
+    """
+    
+    for line in iter_s3_byte_lines(body, chunk_size):
+        if progress is not None:
+            progress.offset += len(line)
+        yield line.decode('utf-8')
 
 def transform_row_to_json(csv_row, source_file):
     """
@@ -125,11 +952,7 @@ def transform_row_to_json(csv_row, source_file):
         # Create JSON record with original data plus metadata
         json_record = {
             'data': csv_row,
-            'metadata': {
-                'source_file': source_file,
-                'processed_timestamp': context.aws_request_id if 'context' in globals() else 'unknown',
-                'transformation_type': 'csv_to_json'
-            }
+            'metadata': build_record_metadata(source_file)
         }
         
         # Clean up empty values and strip whitespace
@@ -145,34 +968,751 @@ def transform_row_to_json(csv_row, source_file):
         return json_record
         
     except Exception as e:
-        logger.error(f"Error transforming CSV row to JSON: {str(e)}")
+        logger.error("Error transforming CSV row to JSON: %s", e)
         raise e
 
-def send_to_firehose(json_record):
+def build_record_metadata(source_file):
     """
-    Send a JSON record to Kinesis Data Firehose.
+    Build the metadata block attached to every transformed record.
     
     Args:
-        json_record (dict): JSON record to send to Firehose
+        source_file (str): Source file name for metadata
+        
+    Returns:
+        dict: Record metadata
     """
     
-    try:
-        # Convert JSON to string and add newline for proper formatting
-        record_data = json.dumps(json_record) + '\n'
+    return {
+        'source_file': source_file,
+        'processed_timestamp': context.aws_request_id if 'context' in globals() else 'unknown',
+        'transformation_type': 'csv_to_json'
+    }
+
+def build_file_id(source_file):
+    """
+    Short, stable identifier linking ndjson-header rows to their file's header record.
+    """
+    
+    return hashlib.sha1(source_file.encode('utf-8')).hexdigest()[:12]
+
+def build_header_record(fieldnames, source_file, column_schema=None):
+    """
+    Build the once-per-file header record used by the ndjson-header output format.
+    
+    Args:
+        fieldnames (list): Column names from the CSV header
+        source_file (str): Source file name for metadata
+        column_schema (dict): Inferred column schema, if any
+        
+    Returns:
+        dict: Header record carrying the file metadata, column list and column types
+    """
+    
+    header = {'file_id': build_file_id(source_file)}
+    header.update(build_record_metadata(source_file))
+    header['columns'] = fieldnames
+    if column_schema:
+        header['types'] = column_schema['types']
+    
+    return {'header': header}
+
+def transform_row_for_output(csv_row, source_file, output_format, converters=None):
+    """
+    Transform a CSV row with transform_row_to_json and shape it for the output format.
+    
+    Returns:
+        dict: JSON record to send to Firehose
+    """
+    
+    json_record = transform_row_to_json(csv_row, source_file)
+    
+    if converters:
+        data = json_record['data']
+        for key, (parse, to_json_value, _) in converters.items():
+            if key in data:
+                try:
+                    data[key] = to_json_value(parse(data[key]))
+                except ValueError:
+                    # Values that don't match the inferred type stay strings
+                    pass
+    
+    if output_format == 'ndjson-header':
+        # Metadata lives in the header record; rows only carry a reference to it
+        return {'data': json_record['data'], 'file_id': build_file_id(source_file)}
+    
+    return json_record
+
+def write_parquet(csv_reader, object_key, chunk_index=None, column_schema=None):
+    """
+    Write CSV rows to S3 as Parquet files with dictionary-encoded string columns.
+    
+    Values are cleaned the same way as transform_row_to_json (whitespace stripped,
+    empty values stored as nulls) and typed with the column schema; values that do
+    not match their column type are stored as nulls. The file metadata is stored once in the Parquet
+    schema metadata instead of on every row. A new part file is started every
+    PARQUET_ROWS_PER_FILE rows so memory stays bounded.
+    
+    Args:
+        csv_reader (csv.DictReader): Reader yielding CSV rows as dictionaries
+        object_key (str): S3 object key, used as the source file and output name
+        chunk_index (int): Byte-range index when called for part of a file
+        column_schema (dict): Inferred column schema; all columns are strings without one
+        
+    Returns:
+        dict: Row and delivery statistics
+    """
+    
+    if pyarrow is None:
+        raise RuntimeError("OUTPUT_FORMAT 'parquet' requires pyarrow (add the AWS SDK for pandas Lambda layer)")
+    
+    fieldnames = csv_reader.fieldnames or []
+    field_count = len(fieldnames)
+    types = column_schema['types'] if column_schema else {}
+    converters = column_schema['converters'] if column_schema else {}
+    schema = pyarrow.schema(
+        [(fieldname, arrow_type(types.get(fieldname))) for fieldname in fieldnames],
+        metadata={key: str(value) for key, value in build_record_metadata(object_key).items()}
+    )
+    parsers = [converters[fieldname][0] if fieldname in converters else None for fieldname in fieldnames]
+    base_key = PARQUET_OUTPUT_PREFIX + object_key.rsplit('.', 1)[0]
+    part_prefix = f"part-{chunk_index:05d}-" if chunk_index is not None else 'part-'
+    
+    stats = {'total_rows': 0, 'successful': 0, 'failed': 0, 'batches': 0, 'retries': 0, 'bytes': 0}
+    raw_rows = csv_reader.reader
+    
+    def upload(sink, rows):
+        data = sink.getvalue().to_pybytes()
+        output_key = f"{base_key}/{part_prefix}{stats['batches']:05d}.parquet"
+        get_s3_client().put_object(Bucket=PARQUET_OUTPUT_BUCKET, Key=output_key, Body=data)
+        stats['batches'] += 1
+        stats['successful'] += rows
+        stats['bytes'] += len(data)
+        logger.info("Wrote %s rows (%s bytes) to s3://%s/%s", rows, len(data), PARQUET_OUTPUT_BUCKET, output_key)
+    
+    sink, writer, rows_in_file = None, None, 0
+    while True:
+        block = [row for row in islice(raw_rows, COLUMNAR_BLOCK_ROWS) if row]
+        if not block:
+            break
         
-        # Send record to Firehose
-        response = firehose_client.put_record(
-            DeliveryStreamName=FIREHOSE_STREAM_NAME,
-            Record={
-                'Data': record_data
-            }
-        )
+        # Pad short rows and drop extra fields so every row has one value per column
+        rows = [row if len(row) == field_count else (row + [''] * field_count)[:field_count] for row in block]
+        columns = [
+            pyarrow.array(parse_column(parse, column), type=field.type)
+            for parse, field, column in zip(parsers, schema, zip(*rows))
+        ]
         
-        logger.info(f"Successfully sent record to Firehose. Record ID: {response['RecordId']}")
+        if writer is None:
+            sink = pyarrow.BufferOutputStream()
+            writer = pyarrow.parquet.ParquetWriter(sink, schema, use_dictionary=True, compression='snappy')
+        writer.write_table(pyarrow.Table.from_arrays(columns, schema=schema))
+        rows_in_file += len(rows)
+        stats['total_rows'] += len(rows)
         
-    except Exception as e:
-        logger.error(f"Error sending record to Firehose: {str(e)}")
-        raise e
+        if rows_in_file >= PARQUET_ROWS_PER_FILE:
+            writer.close()
+            upload(sink, rows_in_file)
+            sink, writer, rows_in_file = None, None, 0
+    
+    if writer is not None:
+        writer.close()
+        upload(sink, rows_in_file)
+    
+    return stats
+
+def parse_column(parse, column):
+    """
+    Clean a column of raw CSV values and convert it with the column's parser for Parquet.
+    """
+    
+    values = [value.strip() or None for value in column]
+    if parse is None:
+        return values
+    
+    parsed = []
+    for value in values:
+        try:
+            parsed.append(parse(value) if value is not None else None)
+        except ValueError:
+            parsed.append(None)
+    return parsed
+
+def arrow_type(column_type):
+    """
+    Map an inferred column type to the pyarrow type used in Parquet output.
+    """
+    
+    if not column_type:
+        return pyarrow.string()
+    if column_type['type'] == 'int':
+        return pyarrow.int64()
+    if column_type['type'] == 'float':
+        return pyarrow.float64()
+    if column_type['type'] == 'decimal':
+        return pyarrow.decimal128(38, column_type['scale'])
+    if column_type['type'] == 'date':
+        return pyarrow.date32()
+    return pyarrow.string()
+
+def get_column_schema(csv_reader, object_key, checkpoint=None):
+    """
+    Return the column schema for a file, inferring it from the first rows on a cache miss.
+    
+    Sampled rows are pushed back onto the reader so they are still transformed.
+    
+    Args:
+        csv_reader (csv.DictReader): Reader positioned at the start of the file
+        object_key (str): S3 object key, whose prefix is part of the cache key
+        checkpoint (FileCheckpoint): Progress tracker; the byte offset after each sampled
+                                     row is kept so replayed rows report the right position
+        
+    Returns:
+        dict: Column schema with 'types' and compiled 'converters'
+    """
+    
+    fieldnames = csv_reader.fieldnames or []
+    cache_key = schema_cache_key(object_key, fieldnames)
+    
+    if cache_key not in schema_cache:
+        sample, offsets = [], []
+        for row in islice(csv_reader.reader, SCHEMA_SAMPLE_ROWS):
+            sample.append(row)
+            offsets.append(checkpoint.offset if checkpoint else None)
+        csv_reader.reader = ReplayReader(csv_reader.reader, sample, offsets)
+        cache_column_schema(cache_key, infer_column_schema(fieldnames, sample))
+    
+    return schema_cache[cache_key]
+
+def load_column_schema(bucket_name, object_key, fieldnames):
+    """
+    Return the column schema for an object, reading its first rows from S3 on a cache miss.
+    
+    Used by the parallel path, where no single reader sees the start of the file.
+    """
+    
+    cache_key = schema_cache_key(object_key, fieldnames)
+    
+    if cache_key not in schema_cache:
+        response = get_s3_client().get_object(Bucket=bucket_name, Key=object_key, Range='bytes=0-')
+        body = response['Body']
+        try:
+            csv_reader = csv.reader(iter_s3_lines(body))
+            next(csv_reader, None)  # header row
+            sample = list(islice(csv_reader, SCHEMA_SAMPLE_ROWS))
+        finally:
+            body.close()
+        cache_column_schema(cache_key, infer_column_schema(fieldnames, sample))
+    
+    return schema_cache[cache_key]
+
+def schema_cache_key(object_key, fieldnames):
+    """
+    Cache key for a column schema: the object's S3 prefix plus a signature of its header.
+    """
+    
+    prefix = object_key.rsplit('/', 1)[0] if '/' in object_key else ''
+    signature = hashlib.sha1('\x1f'.join(fieldnames).encode('utf-8')).hexdigest()
+    return prefix, signature
+
+def cache_column_schema(cache_key, types):
+    """
+    Compile converters for an inferred schema and store both in the schema cache.
+    """
+    
+    if len(schema_cache) >= SCHEMA_CACHE_MAX_ENTRIES:
+        # Evict the oldest entry (dicts keep insertion order)
+        del schema_cache[next(iter(schema_cache))]
+    
+    schema_cache[cache_key] = {
+        'types': types,
+        'converters': compile_column_converters(types)
+    }
+    logger.info("Inferred column types for prefix '%s': %s", cache_key[0], types)
+
+def infer_column_schema(fieldnames, rows):
+    """
+    Infer a type for every column from a sample of raw CSV rows.
+    
+    Args:
+        fieldnames (list): Column names from the CSV header
+        rows (list): Sampled rows as lists of strings
+        
+    Returns:
+        dict: Column name -> type description, e.g. {'type': 'decimal', 'scale': 2}
+    """
+    
+    types = {}
+    for index, fieldname in enumerate(fieldnames):
+        values = [row[index].strip() for row in rows if index < len(row)]
+        types[fieldname] = infer_column_type([value for value in values if value])
+    return types
+
+def infer_column_type(values):
+    """
+    Pick the narrowest type that every sampled (non-empty) value of a column parses as.
+    """
+    
+    if not values:
+        return {'type': 'string'}
+    
+    if all(INT_PATTERN.match(value) for value in values):
+        return {'type': 'int'}
+    
+    # Fixed-point numbers (prices, amounts) stay exact as decimals
+    matches = [DECIMAL_PATTERN.match(value) for value in values]
+    if all(matches):
+        scale = max(len(match.group(1) or '') for match in matches)
+        if all(len(value.lstrip('-').replace('.', '')) <= 38 for value in values):
+            return {'type': 'decimal', 'scale': scale}
+    
+    if all(FLOAT_PATTERN.match(value) for value in values):
+        return {'type': 'float'}
+    
+    for date_format in DATE_FORMATS:
+        try:
+            for value in values:
+                datetime.strptime(value, date_format)
+            return {'type': 'date', 'format': date_format}
+        except ValueError:
+            continue
+    
+    return {'type': 'string'}
+
+def compile_column_converters(types):
+    """
+    Build a converter for every typed column of a schema.
+    
+    Each converter is a (parse, to_json_value, to_json_text) tuple: parse turns a
+    cleaned string into a Python value (raising ValueError if it does not match the
+    column type), to_json_value makes that value JSON-serializable, and
+    to_json_text encodes it exactly as json.dumps would.
+    
+    Returns:
+        dict: Column name -> converter, for columns that are not strings
+    """
+    
+    converters = {}
+    for fieldname, column_type in types.items():
+        kind = column_type['type']
+        if kind == 'int':
+            converters[fieldname] = (parse_int, int, int.__repr__)
+        elif kind == 'float':
+            converters[fieldname] = (parse_float, float, float.__repr__)
+        elif kind == 'decimal':
+            converters[fieldname] = (
+                make_decimal_parser(column_type['scale']),
+                float,
+                lambda value: float.__repr__(float(value))
+            )
+        elif kind == 'date':
+            converters[fieldname] = (
+                make_date_parser(column_type['format']),
+                lambda value: value.isoformat(),
+                lambda value: '"' + value.isoformat() + '"'
+            )
+    return converters
+
+def parse_int(value):
+    if not INT_PATTERN.match(value):
+        raise ValueError(f"Not an integer: {value}")
+    return int(value)
+
+def parse_float(value):
+    if not FLOAT_PATTERN.match(value):
+        raise ValueError(f"Not a float: {value}")
+    number = float(value)
+    # Values beyond float range become inf, which JSON cannot represent
+    if not math.isfinite(number):
+        raise ValueError(f"Float out of range: {value}")
+    return number
+
+def make_decimal_parser(scale):
+    quantum = Decimal(1).scaleb(-scale)
+    
+    def parse_decimal(value):
+        match = DECIMAL_PATTERN.match(value)
+        if not match or len(match.group(1) or '') > scale:
+            raise ValueError(f"Not a decimal with scale {scale}: {value}")
+        try:
+            return Decimal(value).quantize(quantum)
+        except InvalidOperation:
+            # More digits than the decimal context holds
+            raise ValueError(f"Decimal out of range: {value}") from None
+    
+    return parse_decimal
+
+def make_date_parser(date_format):
+    def parse_date(value):
+        return datetime.strptime(value, date_format).date()
+    
+    return parse_date
+
+class ReplayReader:
+    """
+    csv.reader wrapper that returns pushed-back rows before reading further.
+    
+    last_offset is the input byte offset recorded for the replayed row most
+    recently returned, or None once rows come from the underlying reader again.
+    """
+    
+    def __init__(self, reader, rows, offsets=None):
+        self.reader = reader
+        self.rows = deque(zip(rows, offsets or [None] * len(rows)))
+        self.last_offset = None
+    
+    @property
+    def line_num(self):
+        return self.reader.line_num
+    
+    def __iter__(self):
+        return self
+    
+    def __next__(self):
+        if self.rows:
+            row, self.last_offset = self.rows.popleft()
+            return row
+        self.last_offset = None
+        return next(self.reader)
+
+def reader_offset(csv_reader, checkpoint):
+    """
+    Byte offset just past the last row returned by a CSV reader.
+    """
+    
+    replayed_offset = getattr(csv_reader.reader, 'last_offset', None)
+    return replayed_offset if replayed_offset is not None else checkpoint.offset
+
+class FileCheckpoint:
+    """
+    Progress of one file (or byte range): the byte offset and row count reached.
+    
+    Line readers keep offset at the end of the last line read; save() is called by
+    FirehoseBatchSender with the position of the last record in each flushed batch.
+    """
+    
+    def __init__(self, store, key, offset=0, rows=0):
+        self.store = store
+        self.key = key
+        self.offset = offset
+        self.rows = rows
+        self.start_rows = rows
+    
+    def save(self, position):
+        offset, rows = position
+        self.store.put(self.key, {'offset': offset, 'rows': rows})
+    
+    def complete(self):
+        self.store.delete(self.key)
+
+class MemoryCheckpointStore:
+    """
+    Checkpoints in a dictionary; survives only as long as the warm Lambda container.
+    """
+    
+    def __init__(self):
+        self.items = {}
+    
+    def get(self, key):
+        return self.items.get(key)
+    
+    def put(self, key, value):
+        self.items[key] = value
+    
+    def delete(self, key):
+        self.items.pop(key, None)
+
+class FileCheckpointStore:
+    """
+    Checkpoints in a local JSON file (e.g. in /tmp, or on an EFS mount to share them).
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+    
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+    
+    def _save(self, items):
+        # Write to a temporary file first so a crash never leaves a truncated file
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(items, f)
+        os.replace(temp_path, self.path)
+    
+    def get(self, key):
+        with self.lock:
+            return self._load().get(key)
+    
+    def put(self, key, value):
+        with self.lock:
+            items = self._load()
+            items[key] = value
+            self._save(items)
+    
+    def delete(self, key):
+        with self.lock:
+            items = self._load()
+            if items.pop(key, None) is not None:
+                self._save(items)
+
+class DynamoDBCheckpointStore:
+    """
+    Checkpoints in a DynamoDB table with partition key 'checkpoint_key' (String).
+    
+    Items carry an 'expires_at' attribute; enable TTL on it so stale entries expire.
+    """
+    
+    def __init__(self, table_name, ttl_seconds=CHECKPOINT_TTL_SECONDS):
+        dynamodb = boto3.resource('dynamodb', config=BOTO_CONFIG)
+        instrument_client(dynamodb.meta.client, get_metrics)
+        self.table = dynamodb.Table(table_name)
+        self.ttl_seconds = ttl_seconds
+    
+    def get(self, key):
+        item = self.table.get_item(Key={'checkpoint_key': key}, ConsistentRead=True).get('Item')
+        return json.loads(item['checkpoint']) if item else None
+    
+    def put(self, key, value):
+        self.table.put_item(Item={
+            'checkpoint_key': key,
+            'checkpoint': json.dumps(value),
+            'expires_at': int(time.time()) + self.ttl_seconds
+        })
+    
+    def delete(self, key):
+        self.table.delete_item(Key={'checkpoint_key': key})
+
+def get_checkpoint_store():
+    """
+    Return the configured checkpoint store (created once per container), or None if disabled.
+    """
+    
+    global checkpoint_store
+    
+    if checkpoint_store is None:
+        if CHECKPOINT_STORE == 'memory':
+            checkpoint_store = MemoryCheckpointStore()
+        elif CHECKPOINT_STORE == 'file':
+            checkpoint_store = FileCheckpointStore(CHECKPOINT_FILE_PATH)
+        elif CHECKPOINT_STORE == 'dynamodb':
+            checkpoint_store = DynamoDBCheckpointStore(CHECKPOINT_TABLE_NAME)
+    
+    return checkpoint_store
+
+def get_metrics():
+    """
+    Return the metrics recorder (created once per container)
+    """
+    global metrics
+    
+    if metrics is None:
+        metrics = Metrics(METRICS_NAMESPACE, {'Service': METRICS_SERVICE}, enabled=METRICS_ENABLED)
+    
+    return metrics
+
+def get_s3_client():
+    """
+    Return the S3 client (created on first use, reused across warm invocations).
+    """
+    
+    global s3_client
+    
+    if s3_client is None:
+        # boto3's default session is not thread-safe, so build clients under a lock
+        with client_lock:
+            if s3_client is None:
+                s3_client = instrument_client(boto3.client('s3', config=BOTO_CONFIG), get_metrics)
+    
+    return s3_client
+
+def get_firehose_client():
+    """
+    Return the Firehose client (created on first use, reused across warm invocations).
+    """
+    
+    global firehose_client
+    
+    if firehose_client is None:
+        # boto3's default session is not thread-safe, so build clients under a lock
+        with client_lock:
+            if firehose_client is None:
+                firehose_client = instrument_client(boto3.client('firehose', config=BOTO_CONFIG), get_metrics)
+    
+    return firehose_client
+
+class FirehoseDeliveryError(Exception):
+    """
+    Raised when records are still undelivered after every Firehose retry.
+    
+    Row processing lets it through, so the invocation fails and S3 retries it
+    (resuming from the last checkpoint) instead of the rows being dropped.
+    """
+
+class FirehoseBatchSender:
+    """
+    Buffer JSON records and deliver them to Kinesis Data Firehose with PutRecordBatch.
+    
+    A batch is sent as soon as adding another record would exceed the 500 record or
+    4 MiB PutRecordBatch limits. Records that Firehose reports as failed in
+    RequestResponses are retried on their own with exponential backoff; if some
+    are still failing after max_retries, flush raises FirehoseDeliveryError.
+    """
+    
+    def __init__(self, client, stream_name, max_records=FIREHOSE_MAX_BATCH_RECORDS,
+                 max_bytes=FIREHOSE_MAX_BATCH_BYTES, max_retries=FIREHOSE_MAX_RETRIES,
+                 retry_base_delay=FIREHOSE_RETRY_BASE_DELAY, on_flush=None):
+        self.client = client
+        self.stream_name = stream_name
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        
+        # Called with the position of the last record of every flushed batch
+        self.on_flush = on_flush
+        
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._buffer_position = None
+        
+        # Aggregate statistics across all batches sent by this sender
+        self.stats = {
+            'batches': 0,
+            'records_sent': 0,
+            'records_failed': 0,
+            'retries': 0,
+            'bytes_sent': 0
+        }
+        self.batch_stats = []
+    
+    def add(self, json_record, position=None):
+        """
+        Queue a JSON record, sending the current batch first if the record would not fit.
+        
+        Args:
+            json_record (dict): JSON record to send to Firehose
+            position: Input position of the record, passed to on_flush once delivered
+        """
+        
+        # Newline-delimited JSON, encoded up front so batch sizes are measured in bytes
+        self.add_encoded((json.dumps(json_record) + '\n').encode('utf-8'), position)
+    
+    def add_encoded(self, record_data, position=None):
+        """
+        Queue an already serialized record (bytes, including its trailing newline).
+        
+        Args:
+            record_data (bytes): Encoded record to send to Firehose
+            position: Input position of the record, passed to on_flush once delivered
+        """
+        
+        if len(record_data) > FIREHOSE_MAX_RECORD_BYTES:
+            raise ValueError(f"Record of {len(record_data)} bytes exceeds the Firehose record size limit")
+        
+        if self._buffer and (len(self._buffer) >= self.max_records or
+                             self._buffer_bytes + len(record_data) > self.max_bytes):
+            self.flush()
+        
+        self._buffer.append(record_data)
+        self._buffer_bytes += len(record_data)
+        if position is not None:
+            self._buffer_position = position
+    
+    def flush(self):
+        """
+        Send all buffered records to Firehose in a single PutRecordBatch call.
+        
+        Returns:
+            dict: Statistics for the batch that was sent, or None if the buffer was empty
+            
+        Raises:
+            FirehoseDeliveryError: If records are still failing after max_retries
+        """
+        
+        if not self._buffer:
+            return None
+        
+        records, batch_bytes, position = self._buffer, self._buffer_bytes, self._buffer_position
+        self._buffer, self._buffer_bytes, self._buffer_position = [], 0, None
+        
+        start_time = time.perf_counter()
+        pending = records
+        attempts = 0
+        last_error = None
+        
+        while True:
+            try:
+                response = self.client.put_record_batch(
+                    DeliveryStreamName=self.stream_name,
+                    Records=[{'Data': data} for data in pending]
+                )
+            except Exception as e:
+                # The whole call failed (after botocore's own retries); retry every record
+                logger.warning("PutRecordBatch call failed: %s", e)
+                last_error = e
+                response = None
+            
+            if response is not None:
+                last_error = None
+                if response.get('FailedPutCount', 0) == 0:
+                    pending = []
+                    break
+                
+                # Keep only the records Firehose rejected; responses are in request order
+                pending = [
+                    data for data, result in zip(pending, response['RequestResponses'])
+                    if 'ErrorCode' in result
+                ]
+            
+            if attempts >= self.max_retries:
+                break
+            
+            attempts += 1
+            time.sleep(self.retry_base_delay * (2 ** (attempts - 1)))
+        
+        batch = {
+            'records': len(records),
+            'bytes': batch_bytes,
+            'failed': len(pending),
+            'retries': attempts,
+            'duration_ms': round((time.perf_counter() - start_time) * 1000, 2)
+        }
+        self.batch_stats.append(batch)
+        
+        self.stats['batches'] += 1
+        self.stats['records_sent'] += batch['records'] - batch['failed']
+        self.stats['records_failed'] += batch['failed']
+        self.stats['retries'] += attempts
+        self.stats['bytes_sent'] += batch_bytes
+        
+        # Includes retries and backoff; single calls are timed as Firehose.PutRecordBatch
+        metrics = get_metrics()
+        metrics.record('FirehoseBatch', batch['duration_ms'])
+        metrics.count('FirehoseRetries', attempts)
+        metrics.count('FirehoseFailedRecords', batch['failed'])
+        
+        if pending:
+            logger.error("Firehose batch %s: %s of %s records failed after %s retries",
+                         self.stats['batches'], len(pending), len(records), attempts)
+            # The checkpoint is not advanced past this batch, so a retried invocation sends it again
+            raise FirehoseDeliveryError(
+                f"{len(pending)} of {len(records)} records not delivered to {self.stream_name} "
+                f"after {attempts} retries: {last_error or 'rejected by Firehose'}"
+            ) from last_error
+        else:
+            # Totals for the file are in the processing summary
+            logger.debug("Firehose batch %s: sent %s records (%s bytes) in %s ms",
+                         self.stats['batches'], len(records), batch_bytes, batch['duration_ms'])
+        
+        if self.on_flush and position is not None:
+            self.on_flush(position)
+        
+        return batch
 
 def validate_environment():
     """
@@ -183,7 +1723,7 @@ def validate_environment():
     if not FIREHOSE_STREAM_NAME:
         raise ValueError("FIREHOSE_STREAM_NAME must be configured")
     
-    logger.info(f"Lambda function configured with Firehose stream: {FIREHOSE_STREAM_NAME}")
+    logger.info("Lambda function configured with Firehose stream: %s", FIREHOSE_STREAM_NAME)
 
 # Optional: Validate environment on import
 # validate_environment()
@@ -0,0 +1,87 @@
+# Gunicorn configuration for the Flask application
+# Gunicorn reads this file at startup (gunicorn --config gunicorn.conf.py main:app).
+# Every setting can be changed through a container environment variable in the
+# ECS task definition, without rebuilding the image.
+
+import math
+import os
+
+# Serving mode (SERVING_MODE):
+# - 'gthread' (default): each worker process runs a pool of threads, so a slow
+#   request only ties up one thread instead of a whole worker
+# - 'gevent': async workers; blocking I/O yields to other requests, so one
+#   worker can hold hundreds of slow requests at once (needs the gevent package)
+# - 'sync': one request per worker process at a time (gunicorn's default)
+SERVING_MODE = os.environ.get('SERVING_MODE', 'gthread')
+
+# Load balancer idle timeout in seconds (60 is the ALB default). Gunicorn must
+# keep idle connections open longer than the ALB does; otherwise the ALB can send
+# a request on a connection the worker is just closing, and the client gets a 502.
+ALB_IDLE_TIMEOUT = int(os.environ.get('ALB_IDLE_TIMEOUT', 60))
+
+
+def container_cpus():
+    """
+    Return the number of CPUs the container may use, from its cgroup CPU quota.
+
+    os.cpu_count() reports the host's CPUs, which on Fargate is usually more
+    than the task's vCPU allocation. Falls back to os.cpu_count() when no quota is set.
+    """
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: quota is -1 when unlimited
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+                quota = int(f.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+                period = int(f.read())
+            if quota > 0:
+                return quota / period
+        except (OSError, ValueError):
+            pass
+    return float(os.cpu_count() or 1)
+
+
+# WEB_CPUS overrides the detected value, e.g. when the quota is only set on the task
+cpus = float(os.environ.get('WEB_CPUS') or container_cpus())
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 8080)}"
+
+if SERVING_MODE == 'gevent':
+    worker_class = 'gevent'
+    # One process per vCPU; each handles many connections concurrently
+    workers = int(os.environ.get('WEB_WORKERS', max(1, math.ceil(cpus))))
+    worker_connections = int(os.environ.get('WEB_WORKER_CONNECTIONS', 1000))
+    capacity = worker_connections
+elif SERVING_MODE == 'gthread':
+    worker_class = 'gthread'
+    # Two processes even on a fractional vCPU, so one can restart while the other serves
+    workers = int(os.environ.get('WEB_WORKERS', max(2, math.ceil(cpus))))
+    threads = int(os.environ.get('WEB_THREADS', 8))
+    capacity = threads
+elif SERVING_MODE == 'sync':
+    worker_class = 'sync'
+    workers = int(os.environ.get('WEB_WORKERS', max(2, 2 * math.ceil(cpus) + 1)))
+    capacity = 1
+else:
+    raise ValueError(f"Unknown SERVING_MODE: {SERVING_MODE} (expected gthread, gevent or sync)")
+
+# capacity (requests one worker handles at once) is passed to the app so its
+# readiness check can tell when every thread or connection slot is busy
+raw_env = [f"WEB_WORKER_CAPACITY={capacity}"]
+
+# Seconds an idle keep-alive connection stays open (sync workers close every connection)
+keepalive = int(os.environ.get('WEB_KEEPALIVE', ALB_IDLE_TIMEOUT + 5))
+
+# A worker silent for this long is killed and replaced
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+
+# On SIGTERM, workers finish in-flight requests for up to this long before
+# exiting. Keep it below the ECS container stopTimeout (30 seconds by default),
+# after which ECS kills the container.
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 25))
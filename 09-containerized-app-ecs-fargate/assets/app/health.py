@@ -0,0 +1,167 @@
+"""
+Liveness and readiness state for the Flask application.
+
+Liveness only says the worker can answer requests. Readiness also depends on
+the application's dependencies and on how busy the worker is:
+
+- Dependency probes (a TCP connect to a database, an HTTP GET to a downstream
+  service) run on a background thread every interval seconds. Readiness checks
+  only read their cached results, so a load balancer probe never waits on a
+  dependency. A result older than ttl seconds counts as failed, which also
+  catches a probe thread that hangs.
+- The number of requests the worker is currently handling. Once it reaches
+  max_in_flight the worker reports itself not ready, so the load balancer sends
+  new requests to other targets until it catches up.
+
+Every gunicorn worker process keeps its own state.
+"""
+
+import socket
+import threading
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+from flask import g
+
+
+class TCPProbe:
+    """
+    Succeeds if a TCP connection to host:port can be opened (e.g. a database).
+    """
+
+    def __init__(self, endpoint, timeout):
+        host, port = endpoint.rsplit(':', 1)
+        self.name = f"tcp:{endpoint}"
+        self.address = (host, int(port))
+        self.timeout = timeout
+
+    def __call__(self):
+        socket.create_connection(self.address, timeout=self.timeout).close()
+
+
+class HTTPProbe:
+    """
+    Succeeds if a GET request to the URL returns a 2xx or 3xx status.
+    """
+
+    def __init__(self, url, timeout):
+        self.name = f"http:{urlsplit(url).netloc}{urlsplit(url).path}"
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self):
+        # urlopen raises HTTPError for 4xx and 5xx responses
+        with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+            response.read(1024)
+
+
+class Readiness:
+    """
+    Cached dependency probe results plus the worker's in-flight request count.
+
+    Args:
+        app: Flask app whose requests are counted
+        probes: Callables that raise when their dependency is unavailable
+        interval: Seconds between probe rounds
+        ttl: Seconds after which a probe result no longer counts as passing
+        max_in_flight: In-flight requests at which the worker reports not ready (None for no limit)
+    """
+
+    def __init__(self, app, probes, interval=10, ttl=30, max_in_flight=None):
+        self.probes = probes
+        self.interval = interval
+        self.ttl = ttl
+        self.max_in_flight = max_in_flight
+        self.results = {}
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.thread = None
+
+        app.before_request(self.request_started)
+        app.teardown_request(self.request_finished)
+
+    def request_started(self):
+        with self.lock:
+            self.in_flight += 1
+        g.readiness_counted = True
+
+    def request_finished(self, exc):
+        # Teardown also runs for requests that failed before request_started
+        if g.pop('readiness_counted', False):
+            with self.lock:
+                self.in_flight -= 1
+
+    def start(self):
+        """
+        Start probing on a background thread; the worker is not ready until the first round has passed.
+        """
+        if not self.probes or self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self.probe_loop, name='readiness-probes', daemon=True)
+        self.thread.start()
+
+    def probe_loop(self):
+        while True:
+            self.run_probes()
+            time.sleep(self.interval)
+
+    def run_probes(self):
+        for probe in self.probes:
+            started = time.monotonic()
+            try:
+                probe()
+                error = None
+            except Exception as e:
+                error = str(e) or type(e).__name__
+            # Replacing the whole entry keeps readers from seeing a half-updated result
+            self.results[probe.name] = {
+                'ok': error is None,
+                'error': error,
+                'latency_ms': round((time.monotonic() - started) * 1000, 1),
+                'checked_at': time.monotonic()
+            }
+
+    def status(self):
+        """
+        Return (ready, report) from the cached probe results and the in-flight count; does no I/O.
+        """
+        now = time.monotonic()
+        checks = {}
+        ready = True
+        for probe in self.probes:
+            result = self.results.get(probe.name)
+            if result is None:
+                checks[probe.name] = {'ok': False, 'error': 'not checked yet'}
+                ready = False
+                continue
+            age = now - result['checked_at']
+            ok = result['ok'] and age <= self.ttl
+            checks[probe.name] = {
+                'ok': ok,
+                'error': result['error'] or (None if ok else 'result expired'),
+                'latency_ms': result['latency_ms'],
+                'age_seconds': round(age, 1)
+            }
+            ready = ready and ok
+
+        # The readiness request itself is one of the in-flight requests
+        in_flight = max(0, self.in_flight - 1)
+        saturated = self.max_in_flight is not None and in_flight >= self.max_in_flight
+        report = {
+            'status': 'ready' if ready and not saturated else 'not ready',
+            'checks': checks,
+            'in_flight': in_flight,
+            'max_in_flight': self.max_in_flight,
+            'saturated': saturated
+        }
+        return ready and not saturated, report
+
+
+def probes_from_settings(tcp_endpoints, http_urls, timeout):
+    """
+    Build probes from comma-separated host:port endpoints and URLs.
+    """
+    probes = [TCPProbe(endpoint.strip(), timeout) for endpoint in tcp_endpoints.split(',') if endpoint.strip()]
+    probes += [HTTPProbe(url.strip(), timeout) for url in http_urls.split(',') if url.strip()]
+    return probes
@@ -0,0 +1,410 @@
+"""
+Local load test for the Flask application under gunicorn.
+
+Starts gunicorn with gunicorn.conf.py once per serving mode (SERVING_MODE) and
+drives it with keep-alive HTTP clients for a fixed duration. Every request first
+waits for a simulated I/O latency (a database or downstream API call), added by
+a WSGI wrapper around main.app, so the test shows how many slow requests one
+task can hold at once. Prints requests per second, p50/p99 latency and the
+number of TCP connections the clients had to open for each mode as JSON.
+
+Worker and thread counts come from gunicorn.conf.py, i.e. from this machine's
+CPU quota; --cpus sizes them as if the container had that many vCPUs (WEB_CPUS).
+
+--responses instead calls the routes in-process and compares bytes sent and
+CPU time per request for the precomputed responses (identity, gzip, brotli and
+304 revalidation) against the routes as they were before: the page returned
+as a string, gzip applied per request, and the health dict encoded per request.
+
+--suite runs the end-to-end workload used by run_benchmarks.py in the
+repository root (a mix of page, revalidation and health check requests through
+main.app) and prints one JSON result.
+
+Usage:
+    pip install -r requirements.txt
+    python local_benchmark.py --latency-ms 50 --connections 64 --duration 10
+    python local_benchmark.py --mode sync --mode gthread --cpus 0.5
+    python local_benchmark.py --responses --requests 20000
+    python local_benchmark.py --suite --scale 2
+"""
+
+import argparse
+import gzip
+import http.client
+import json
+import os
+import random
+import resource
+import runpy
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+MODES = ('sync', 'gthread', 'gevent')
+
+main_app = None
+
+
+def slow_app(environ, start_response):
+    """
+    WSGI entry point for the load test: main.app behind a simulated I/O wait.
+
+    time.sleep stands in for blocking I/O; under the gevent worker it is
+    monkey-patched and yields to other requests, as a socket read would.
+    """
+    global main_app
+    if main_app is None:
+        from main import app
+        main_app = app
+    time.sleep(float(os.environ.get('BENCHMARK_LATENCY_MS', 0)) / 1000)
+    return main_app(environ, start_response)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_settings(environment):
+    """
+    Evaluate gunicorn.conf.py with the given environment and return the worker settings.
+    """
+    saved = dict(os.environ)
+    os.environ.update(environment)
+    try:
+        config = runpy.run_path(os.path.join(APP_DIR, 'gunicorn.conf.py'))
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+    return {key: config[key] for key in ('worker_class', 'workers', 'threads', 'worker_connections', 'keepalive')
+            if key in config}
+
+
+class GunicornServer:
+    """
+    Runs gunicorn on a free local port for the duration of a with block.
+    """
+
+    def __init__(self, environment):
+        self.port = free_port()
+        self.environment = dict(os.environ, **environment, PORT=str(self.port), METRICS_ENABLED='false')
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'local_benchmark:slow_app'],
+            cwd=APP_DIR, env=self.environment, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        deadline = time.monotonic() + 15
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"gunicorn exited: {self.process.stderr.read().decode()[-2000:]}")
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=1)
+                connection.request('GET', '/health')
+                connection.getresponse().read()
+                connection.close()
+                return self
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError('gunicorn did not start within 15 seconds')
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class CountingConnection(http.client.HTTPConnection):
+    """
+    HTTPConnection that counts the TCP connections it opens.
+
+    http.client reconnects by itself after the server closed the connection, so
+    this shows whether keep-alive connections are reused.
+    """
+
+    opened = 0
+
+    def connect(self):
+        self.opened += 1
+        super().connect()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_clients(port, path, connections, duration):
+    """
+    Send requests from concurrent keep-alive clients until the duration has passed.
+
+    Returns the latency of every successful request in seconds, the number of
+    errors and the number of TCP connections opened.
+    """
+    latencies = []
+    counters = {'errors': 0, 'connections_opened': 0}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        own_latencies = []
+        errors = 0
+        connection = CountingConnection('127.0.0.1', port, timeout=30)
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    raise http.client.HTTPException(f"status {response.status}")
+                own_latencies.append(time.perf_counter() - started)
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                connection.close()
+        connection.close()
+        with lock:
+            latencies.extend(own_latencies)
+            counters['errors'] += errors
+            counters['connections_opened'] += connection.opened
+
+    threads = [threading.Thread(target=client) for _ in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, counters
+
+
+def run_mode(mode, args):
+    environment = {'SERVING_MODE': mode, 'BENCHMARK_LATENCY_MS': str(args.latency_ms)}
+    if args.cpus:
+        environment['WEB_CPUS'] = str(args.cpus)
+    settings = server_settings(environment)
+
+    with GunicornServer(environment) as server:
+        # Warm up every worker before measuring
+        run_clients(server.port, args.path, args.connections, 0.5)
+        latencies, counters = run_clients(server.port, args.path, args.connections, args.duration)
+
+    return {
+        'mode': mode,
+        **settings,
+        'requests': len(latencies),
+        'requests_per_second': round(len(latencies) / args.duration, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        **counters,
+    }
+
+
+def build_baseline_app():
+    """
+    The routes as they were before precomputed responses, plus per-request gzip.
+
+    The baseline gets the same metrics hooks as main.app so only the response
+    handling differs.
+    """
+    from flask import Flask, Response
+    import main
+    from metrics import RequestMetrics
+
+    baseline = Flask('baseline')
+    RequestMetrics(baseline, 'Benchmark', 'baseline', enabled=False)
+
+    @baseline.route('/')
+    def hello():
+        return main.HOME_PAGE_HTML
+
+    @baseline.route('/gzip-per-request')
+    def hello_gzip():
+        # What a compression middleware does: compress the body on every request
+        body = gzip.compress(main.HOME_PAGE_HTML.encode('utf-8'), compresslevel=6)
+        return Response(body, mimetype='text/html', headers={'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'})
+
+    @baseline.route('/health')
+    def health_check():
+        return {"status": "healthy", "service": "flask-fargate-app", "port": 8080}
+
+    return baseline
+
+
+def call_wsgi(app, environ):
+    """
+    Call a WSGI app directly, the way gunicorn does, and return (status, headers, body).
+    """
+    captured = []
+
+    def start_response(status, headers, exc_info=None):
+        captured.extend((status, headers))
+
+    body = b''.join(app(dict(environ), start_response))
+    return captured[0], captured[1], body
+
+
+def response_bytes(status, headers, body):
+    """
+    Bytes on the wire for a response: status line, headers and body.
+    """
+    head = f"HTTP/1.1 {status}\r\n" + ''.join(f"{name}: {value}\r\n" for name, value in headers) + '\r\n'
+    return len(head.encode('latin-1')) + len(body)
+
+
+def run_response_benchmark(requests, repeats=3):
+    """
+    Bytes and CPU time per request for each way of serving the page and the health check.
+    """
+    from werkzeug.test import EnvironBuilder
+    import main
+
+    baseline = build_baseline_app()
+    identity_etag = main.home_page.etags['identity']
+    cases = [
+        # (name, WSGI app, path, request headers)
+        ('page: before (string per request)', baseline, '/', {}),
+        ('page: before + gzip per request', baseline, '/gzip-per-request', {'Accept-Encoding': 'gzip'}),
+        ('page: precomputed identity', main.app, '/', {}),
+        ('page: precomputed gzip', main.app, '/', {'Accept-Encoding': 'gzip'}),
+        ('page: precomputed brotli', main.app, '/', {'Accept-Encoding': 'gzip, deflate, br'}),
+        ('page: revalidated (304)', main.app, '/', {'If-None-Match': identity_etag}),
+        ('health: before (dict per request)', baseline, '/health', {}),
+        ('health: precomputed', main.app, '/health', {}),
+    ]
+
+    results = []
+    for name, app, path, headers in cases:
+        environ = EnvironBuilder(path=path, headers=headers).get_environ()
+        status, response_headers, body = call_wsgi(app, environ)
+        best = None
+        for _ in range(repeats):
+            started = time.process_time()
+            for _ in range(requests):
+                call_wsgi(app, environ)
+            elapsed = time.process_time() - started
+            best = elapsed if best is None else min(best, elapsed)
+        results.append({
+            'case': name,
+            'status': int(status.split()[0]),
+            'content_encoding': dict(response_headers).get('Content-Encoding', 'identity'),
+            'bytes_per_response': response_bytes(status, response_headers, body),
+            'cpu_us_per_request': round(best / requests * 1e6, 2),
+        })
+    return results
+
+
+def suite_result(workload, unit, latency_per, latencies, elapsed, baseline_kb, operations=None, **extra):
+    """
+    Standard result record shared by the --suite workloads of every project.
+
+    operations counts units of work (defaults to one per latency sample);
+    throughput is operations per second.
+    """
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    operations = len(latencies) if operations is None else operations
+    return {
+        'workload': workload,
+        'operations': operations,
+        'unit': unit,
+        'seconds': round(elapsed, 3),
+        'throughput_per_second': round(operations / elapsed, 1),
+        'latency_per': latency_per,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p90_ms': round(percentile(latencies, 0.90) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3),
+        'peak_rss_mb': round(peak_kb / 1024, 1),
+        'rss_growth_mb': round((peak_kb - baseline_kb) / 1024, 1),
+        **extra,
+    }
+
+
+def run_suite(scale, seed=9):
+    """
+    End-to-end workload for run_benchmarks.py: 5000 * scale requests through
+    main.app, as a browser, a CDN and the load balancer would send them.
+
+    The routes do no I/O, so unlike the gunicorn load test no latency is simulated.
+    """
+    from werkzeug.test import EnvironBuilder
+    import main
+
+    etags = main.home_page.etags
+    mix = [
+        # (weight, path, request headers)
+        (35, '/', {'Accept-Encoding': 'gzip, deflate, br'}),
+        (10, '/', {'Accept-Encoding': 'gzip'}),
+        (5, '/', {}),
+        (20, '/', {'Accept-Encoding': 'gzip, deflate, br', 'If-None-Match': etags.get('br', etags['identity'])}),
+        (15, '/readyz', {}),
+        (10, '/livez', {}),
+        (5, '/health', {}),
+    ]
+    environs = [EnvironBuilder(path=path, headers=headers).get_environ() for _, path, headers in mix]
+    chooser = random.Random(seed)
+    sequence = chooser.choices(range(len(mix)), weights=[weight for weight, _, _ in mix], k=5000 * scale)
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    latencies = []
+    statuses = {}
+    response_bytes_sent = 0
+    elapsed = 0.0
+    for index in sequence:
+        started = time.perf_counter()
+        status, headers, body = call_wsgi(main.app, environs[index])
+        latency = time.perf_counter() - started
+        latencies.append(latency)
+        elapsed += latency
+        statuses[status.split()[0]] = statuses.get(status.split()[0], 0) + 1
+        response_bytes_sent += response_bytes(status, headers, body)
+
+    return suite_result(
+        'http-routes', 'requests', 'request', latencies, elapsed, baseline_kb,
+        statuses=statuses,
+        bytes_per_request=round(response_bytes_sent / len(latencies), 1),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mode', choices=MODES, action='append', help='serving mode(s) to test (default: all)')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='simulated I/O latency per request')
+    parser.add_argument('--connections', type=int, default=64, help='concurrent keep-alive clients')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds to measure each mode')
+    parser.add_argument('--path', default='/', help='path to request')
+    parser.add_argument('--cpus', type=float, help='size workers as if the container had this many vCPUs')
+    parser.add_argument('--responses', action='store_true',
+                        help='compare bytes and CPU per request of the response variants instead')
+    parser.add_argument('--requests', type=int, default=20000, help='requests per case for --responses')
+    parser.add_argument('--suite', action='store_true', help='run the end-to-end workload used by run_benchmarks.py')
+    parser.add_argument('--scale', type=int, default=1, help='workload size multiplier for --suite')
+    args = parser.parse_args()
+
+    if args.suite:
+        os.environ['METRICS_ENABLED'] = 'false'
+        print(json.dumps(run_suite(args.scale), indent=2))
+        return
+
+    if args.responses:
+        os.environ['METRICS_ENABLED'] = 'false'
+        print(json.dumps(run_response_benchmark(args.requests), indent=2))
+        return
+
+    results = [run_mode(mode, args) for mode in (args.mode or MODES)]
+    print(json.dumps({
+        'latency_ms': args.latency_ms,
+        'connections': args.connections,
+        'duration_seconds': args.duration,
+        'results': results,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
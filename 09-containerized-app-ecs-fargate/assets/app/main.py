@@ -1,15 +1,29 @@
-from flask import Flask
+from flask import Flask, Response
+import json
 import os
 
+from health import Readiness, probes_from_settings
+from metrics import RequestMetrics
+from precompressed import StaticResponse
+
 app = Flask(__name__)
 
-@app.route('/')
-def hello():
-    """
-    Main route that returns a greeting message from the Fargate container.
-    This demonstrates that the containerized application is running successfully.
-    """
-    return '''
+# Per-route request latency and status counts, written to stdout as CloudWatch
+# Embedded Metric Format every METRICS_FLUSH_SECONDS
+request_metrics = RequestMetrics(
+    app,
+    namespace=os.environ.get('METRICS_NAMESPACE', 'FargateApp'),
+    service='flask-fargate-app',
+    flush_seconds=float(os.environ.get('METRICS_FLUSH_SECONDS', 60)),
+    enabled=os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+)
+
+# The greeting page never changes while the container runs, so it is rendered
+# and compressed once at startup. Browsers may reuse it for PAGE_CACHE_SECONDS
+# and then revalidate it with If-None-Match, which costs a 304 with no body.
+PAGE_CACHE_SECONDS = int(os.environ.get('PAGE_CACHE_SECONDS', 300))
+
+HOME_PAGE_HTML = '''
     <html>
         <head>
             <title>Hello from Fargate!</title>
@@ -36,17 +50,65 @@ def hello():
     </html>
     '''
 
+home_page = StaticResponse(HOME_PAGE_HTML, 'text/html; charset=utf-8', f'public, max-age={PAGE_CACHE_SECONDS}')
+
+# The health check body is constant, so it is encoded once and every probe
+# only copies it into a response
+HEALTH_BODY = json.dumps({
+    "status": "healthy",
+    "service": "flask-fargate-app",
+    "port": 8080
+}).encode('utf-8')
+
+# Readiness: dependencies this app needs, probed in the background. Set
+# READINESS_TCP_ENDPOINTS (e.g. 'mydb.cluster-xyz.us-east-1.rds.amazonaws.com:5432')
+# and READINESS_HTTP_URLS (e.g. 'http://inventory.internal/ping') as comma-separated lists.
+# A worker also reports not ready while all its threads or connection slots are
+# busy; gunicorn.conf.py passes that capacity in WEB_WORKER_CAPACITY.
+worker_capacity = int(os.environ.get('WEB_WORKER_CAPACITY', 0))
+readiness = Readiness(
+    app,
+    probes_from_settings(
+        os.environ.get('READINESS_TCP_ENDPOINTS', ''),
+        os.environ.get('READINESS_HTTP_URLS', ''),
+        timeout=float(os.environ.get('READINESS_PROBE_TIMEOUT', 2))
+    ),
+    interval=float(os.environ.get('READINESS_PROBE_INTERVAL', 10)),
+    ttl=float(os.environ.get('READINESS_PROBE_TTL', 30)),
+    # The readiness request needs a slot too, so one slot is kept for it
+    max_in_flight=int(os.environ.get('READINESS_MAX_IN_FLIGHT', 0)) or (
+        worker_capacity - 1 if worker_capacity > 1 else None
+    )
+)
+readiness.start()
+
+@app.route('/')
+def hello():
+    """
+    Main route that returns a greeting message from the Fargate container.
+    This demonstrates that the containerized application is running successfully.
+    """
+    return home_page.response()
+
 @app.route('/health')
+@app.route('/livez')
 def health_check():
     """
-    Health check endpoint for the Application Load Balancer.
-    This endpoint is used by the ALB to determine if the container is healthy.
+    Liveness endpoint: the worker is running and answering requests.
+    It checks nothing else, so restarting the container is the right fix when it fails.
+    /health is kept for existing load balancer configurations.
+    """
+    return Response(HEALTH_BODY, mimetype='application/json')
+
+@app.route('/readyz')
+def readiness_check():
+    """
+    Readiness endpoint for the Application Load Balancer.
+    Returns 503 while a dependency probe fails or the worker is saturated, so the
+    ALB stops sending new requests to this target. Reads cached state only.
     """
-    return {
-        "status": "healthy",
-        "service": "flask-fargate-app",
-        "port": 8080
-    }
+    ready, report = readiness.status()
+    return Response(json.dumps(report), status=200 if ready else 503, mimetype='application/json')
 
 if __name__ == '__main__':
     # Run the Flask application on port 8080
@@ -0,0 +1,79 @@
+"""
+Request metrics for the Flask application, written as CloudWatch Embedded Metric Format (EMF).
+
+Every request's latency and status class is recorded per route. The recorded
+values are written to stdout as EMF JSON lines every flush_seconds (and when
+the worker exits), so the request path never waits for CloudWatch. Each line
+also carries a count/p50/p99/max summary of every timer. The EMF recorder itself
+is emf_metrics.py, shared with the Lambda functions.
+
+EMF lines only become CloudWatch metrics when they reach CloudWatch Logs through
+the CloudWatch agent or FireLens; with the plain awslogs driver they stay log lines.
+"""
+
+import atexit
+import threading
+import time
+
+from flask import g, request
+
+from emf_metrics import Metrics
+
+
+class RequestMetrics:
+    """
+    Records latency and status counts of every request, per route, for a Flask app.
+
+    Each gunicorn worker keeps its own recorder and flushes it independently.
+    """
+
+    def __init__(self, app, namespace, service, flush_seconds=60, enabled=True):
+        self.namespace = namespace
+        self.service = service
+        self.flush_seconds = flush_seconds
+        self.enabled = enabled
+        self.routes = {}
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        atexit.register(self.flush)
+
+    def route(self, name):
+        """
+        Return the recorder for a route, creating it on first use.
+        """
+        metrics = self.routes.get(name)
+        if metrics is None:
+            with self.lock:
+                metrics = self.routes.setdefault(
+                    name, Metrics(self.namespace, {'Service': self.service}, self.enabled)
+                )
+        return metrics
+
+    def before_request(self):
+        g.metrics_started = time.perf_counter()
+
+    def after_request(self, response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            # The URL rule ('/items/<id>') rather than the path keeps the number of routes bounded
+            rule = request.url_rule.rule if request.url_rule else 'unmatched'
+            metrics = self.route(f"{request.method} {rule}")
+            metrics.record('RequestLatency', (time.perf_counter() - started) * 1000)
+            metrics.count('Requests')
+            metrics.count(f"Status{response.status_code // 100}xx")
+
+        if time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+        return response
+
+    def flush(self):
+        """
+        Write the metrics of every route and return their summaries.
+        """
+        with self.lock:
+            self.last_flush = time.monotonic()
+            routes = list(self.routes.items())
+        return {name: metrics.flush({'Route': name}) for name, metrics in routes}
@@ -0,0 +1,112 @@
+"""
+Static responses rendered and compressed once, at startup.
+
+A StaticResponse keeps the identity, gzip and (when the brotli package is
+installed) brotli encodings of a body, each with a strong ETag. Serving one
+only picks the encoding the client accepts and compares ETags, so no request
+renders or compresses anything. Clients and caches that send If-None-Match
+with a matching ETag get an empty 304 Not Modified instead of the body.
+"""
+
+import gzip
+import hashlib
+
+from flask import Response, request
+
+# brotli is optional; without it only gzip and identity are offered
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are not worth compressing (the savings would not cover the headers)
+MIN_COMPRESS_BYTES = 256
+# Distinct Accept-Encoding headers whose negotiated encoding is remembered;
+# browsers send only a handful of different values
+ENCODING_CACHE_SIZE = 64
+
+
+class StaticResponse:
+    """
+    A response body with its encodings and ETags computed once.
+
+    Args:
+        body: Response body (str, encoded as UTF-8, or bytes)
+        content_type: Content-Type header value, e.g. 'text/html; charset=utf-8'
+        cache_control: Cache-Control header value sent with every response
+    """
+
+    def __init__(self, body, content_type, cache_control):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+
+        encodings = {'identity': body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            if brotli is not None:
+                encodings['br'] = brotli.compress(body, quality=11)
+            encodings['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+        # Offer the compressed encodings only where they are actually smaller
+        self.encodings = {
+            name: data for name, data in encodings.items()
+            if name == 'identity' or len(data) < len(body)
+        }
+        self.preference = [name for name in ('br', 'gzip') if name in self.encodings]
+
+        # Each encoding is a different representation, so each gets its own strong ETag
+        digest = hashlib.sha256(body).hexdigest()[:32]
+        self.etags = {
+            name: f'"{digest}"' if name == 'identity' else f'"{digest}-{name}"'
+            for name in self.encodings
+        }
+        self.encoding_cache = {}
+
+        # Headers of the 304 and 200 responses for each encoding, built once
+        self.not_modified_headers = {}
+        self.headers = {}
+        for name in self.encodings:
+            headers = [('ETag', self.etags[name]), ('Cache-Control', cache_control)]
+            if self.preference:
+                headers.append(('Vary', 'Accept-Encoding'))
+            self.not_modified_headers[name] = headers
+            headers = headers + [('Content-Type', content_type)]
+            if name != 'identity':
+                headers.append(('Content-Encoding', name))
+            self.headers[name] = headers
+
+    def encoding_for(self, accept_encoding):
+        """
+        Return the best encoding an Accept-Encoding header allows, preferring brotli over gzip.
+        """
+        if not self.preference or not accept_encoding:
+            return 'identity'
+        encoding = self.encoding_cache.get(accept_encoding)
+        if encoding is None:
+            encoding = request.accept_encodings.best_match(self.preference, default='identity')
+            if len(self.encoding_cache) < ENCODING_CACHE_SIZE:
+                self.encoding_cache[accept_encoding] = encoding
+        return encoding
+
+    def response(self):
+        """
+        Build the response for the current request: the body, or 304 if the client's copy is current.
+        """
+        encoding = self.encoding_for(request.headers.get('Accept-Encoding'))
+        if not_modified(request.headers.get('If-None-Match'), self.etags[encoding]):
+            return Response(status=304, headers=self.not_modified_headers[encoding])
+        return Response(self.encodings[encoding], headers=self.headers[encoding])
+
+
+def not_modified(if_none_match, etag):
+    """
+    Return True if an If-None-Match header value matches the ETag.
+
+    If-None-Match uses weak comparison, so a W/ prefix is ignored.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(
+        candidate.strip().removeprefix('W/') == etag
+        for candidate in if_none_match.split(',')
+    )
@@ -0,0 +1,162 @@
+"""
+Run the local benchmark suite of every project and compare it with an earlier run.
+
+Each project's assets/local_benchmark.py has a --suite mode that runs its
+handler in-process against in-memory stand-ins for DynamoDB, SQS, S3 and
+Firehose with injected latency, and prints one JSON result: throughput,
+latency percentiles and peak memory. This script runs those suites, each in a
+fresh Python process so peak memory is measured per project, and collects the
+results with the git commit they were measured at.
+
+Save a run on one commit, then compare another commit against it:
+
+    python run_benchmarks.py --output baseline.json
+    git checkout my-branch
+    python run_benchmarks.py --compare baseline.json
+
+With --compare the script exits with status 1 if any project's throughput
+dropped, or its p99 latency or peak memory grew, by more than --threshold percent.
+
+Usage:
+    pip install boto3 flask werkzeug brotli
+    python run_benchmarks.py
+    python run_benchmarks.py --project 02-serverless-api --scale 3 --latency-ms 5
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Project directory -> path of its benchmark script
+SUITES = {
+    '02-serverless-api': 'assets/local_benchmark.py',
+    '03-decoupled-application-sqs-lambda': 'assets/local_benchmark.py',
+    '08-serverless-data-pipeline': 'assets/local_benchmark.py',
+    '09-containerized-app-ecs-fargate': 'assets/app/local_benchmark.py',
+}
+
+# Metric -> True if a higher value is better
+COMPARED_METRICS = {
+    'throughput_per_second': True,
+    'p99_ms': False,
+    'peak_rss_mb': False,
+}
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+def run_suite(project, scale, latency_ms):
+    """
+    Run one project's --suite in a new process and return its parsed result.
+    """
+    script = os.path.join(ROOT_DIR, project, SUITES[project])
+    completed = subprocess.run(
+        [sys.executable, script, '--suite', '--scale', str(scale), '--latency-ms', str(latency_ms)],
+        cwd=os.path.dirname(script), capture_output=True, text=True
+    )
+    if completed.returncode != 0:
+        return {'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else
+                f"exit status {completed.returncode}"}
+    return json.loads(completed.stdout)
+
+
+def median_run(runs):
+    """
+    Pick the run with the median throughput, so one noisy run does not count as a regression.
+    """
+    failed = [run for run in runs if 'error' in run]
+    if failed:
+        return failed[0]
+    ordered = sorted(runs, key=lambda run: run['throughput_per_second'])
+    return ordered[len(ordered) // 2]
+
+
+def compare(baseline, current, threshold):
+    """
+    Return the regressions of current against baseline, one dict per project and metric.
+    """
+    regressions = []
+    for project, result in current['results'].items():
+        previous = baseline.get('results', {}).get(project)
+        if not previous or 'error' in previous or 'error' in result:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            before, after = previous.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            if (-change if higher_is_better else change) > threshold:
+                regressions.append({
+                    'project': project,
+                    'metric': metric,
+                    'baseline': before,
+                    'current': after,
+                    'change_percent': round(change, 1)
+                })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--project', choices=sorted(SUITES), action='append',
+                        help='project(s) to benchmark (default: all)')
+    parser.add_argument('--scale', type=int, default=1, help='workload size multiplier')
+    parser.add_argument('--latency-ms', type=float, default=2.0,
+                        help='simulated latency of each AWS API call')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs per project; the run with the median throughput is reported')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    parser.add_argument('--compare', metavar='BASELINE', help='results file of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='percent change counted as a regression for --compare')
+    args = parser.parse_args()
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'scale': args.scale,
+        'latency_ms': args.latency_ms,
+        'repeat': args.repeat,
+        'results': {},
+    }
+    for project in args.project or SUITES:
+        print(f"Running {project}...", file=sys.stderr)
+        runs = [run_suite(project, args.scale, args.latency_ms) for _ in range(args.repeat)]
+        report['results'][project] = median_run(runs)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if (baseline.get('scale'), baseline.get('latency_ms')) != (args.scale, args.latency_ms):
+            print('Warning: the baseline was run with a different --scale or --latency-ms', file=sys.stderr)
+        report['baseline_commit'] = baseline.get('commit')
+        report['regressions'] = compare(baseline, report, args.threshold)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+    failed = [project for project, result in report['results'].items() if 'error' in result]
+    if failed or report.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
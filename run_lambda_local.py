@@ -0,0 +1,419 @@
+"""
+Replay recorded events through a project's Lambda function in simulated execution environments.
+
+Each simulated container is a new Python process. It loads the handler the way
+the Lambda runtime does: the function's module is imported once, during Init.
+It then handles one invocation at a time and keeps its module state (clients,
+caches, checkpoints) between invocations, like a warm execution environment.
+An invocation goes to an idle container. A new container starts only while every
+existing one is busy, up to --containers (the function's concurrency limit).
+
+The report separates three durations:
+- init_ms: importing the function's module, which Lambda reports as Init Duration
+- first_invocation_ms: the handler on a new container, including work done
+  lazily on first use, such as creating boto3 clients
+- warm_invocation_ms: every later invocation on a container that is already running
+
+AWS calls go to local endpoints that this script starts in front of the
+in-memory stand-ins from the project's local_benchmark.py, with --latency-ms
+added to each call. Project 02 gets a DynamoDB endpoint, and project 08 gets one
+endpoint for S3 and Firehose. Project 03 makes no AWS calls with its default
+settings. The containers find the endpoints through the
+AWS_ENDPOINT_URL_<SERVICE> environment variables, so the functions build real
+boto3 clients.
+
+The endpoints are seeded from the events:
+- The DynamoDB table holds generated items plus every item an API Gateway event refers to.
+- S3 holds an object for every S3 event, of the size the event records.
+  Uploads named sample-data.csv get that file.
+
+Function output (print, logging, EMF metric lines) goes to --log-file, together
+with the START, END and REPORT lines that Lambda writes, so stdout holds only
+the JSON report. The containers share this machine's /tmp, and neither the
+timeout nor the memory size is enforced. Invocations that run longer than
+--timeout are counted as timeouts.
+
+Usage:
+    python run_lambda_local.py 02-serverless-api --containers 4 --repeat 50
+    python run_lambda_local.py 03-decoupled-application-sqs-lambda --containers 1 --repeat 20
+    python run_lambda_local.py 08-serverless-data-pipeline --containers 2 --interval-ms 500
+    python run_lambda_local.py 02-serverless-api --events my-events/ --events get-item.json
+"""
+
+import argparse
+import importlib
+import importlib.util
+import json
+import logging
+import math
+import multiprocessing
+import os
+import resource
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from glob import glob
+from urllib.parse import unquote_plus
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Project directory -> handler setting, the function's settings from the
+# project's README (Lambda's defaults where it keeps them) and its AWS endpoint
+FUNCTIONS = {
+    '02-serverless-api': {
+        'handler': 'lambda_function.lambda_handler',
+        'function_name': 'ServerlessAPI-Function',
+        'timeout': 3,
+        'memory_mb': 128,
+        'backend': 'dynamodb',
+    },
+    '03-decoupled-application-sqs-lambda': {
+        'handler': 'lambda_function.lambda_handler',
+        'function_name': 'sqs-message-processor',
+        'timeout': 3,
+        'memory_mb': 128,
+        'backend': None,
+    },
+    '08-serverless-data-pipeline': {
+        'handler': 'transform-lambda.lambda_handler',
+        'function_name': 'csv-to-json-transformer',
+        'timeout': 60,
+        'memory_mb': 128,
+        'backend': 's3-firehose',
+    },
+}
+
+# Log line format of the Lambda Python runtime
+LOG_FORMAT = '[%(levelname)s]\t%(asctime)s.%(msecs)03dZ\t%(aws_request_id)s\t%(message)s'
+LOG_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# State of the simulated container running in this process (set by start_container)
+container = None
+
+
+class LambdaContext:
+    """
+    The context object the Lambda runtime passes to the handler.
+    """
+
+    def __init__(self, request_id, timeout):
+        function_name = os.environ['AWS_LAMBDA_FUNCTION_NAME']
+        self.function_name = function_name
+        self.function_version = os.environ['AWS_LAMBDA_FUNCTION_VERSION']
+        self.invoked_function_arn = f"arn:aws:lambda:{os.environ['AWS_REGION']}:123456789012:function:{function_name}"
+        self.memory_limit_in_mb = os.environ['AWS_LAMBDA_FUNCTION_MEMORY_SIZE']
+        self.aws_request_id = request_id
+        self.log_group_name = f"/aws/lambda/{function_name}"
+        self.log_stream_name = f"local/[$LATEST]{os.getpid()}"
+        self.deadline = time.monotonic() + timeout
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - time.monotonic()) * 1000))
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Adds the current invocation's request ID to log records, as the runtime does.
+    """
+
+    def filter(self, record):
+        record.aws_request_id = container['request_id'] if container else ''
+        return True
+
+
+def start_container(task_root, handler, environment, log_path):
+    """
+    Init phase of a new container: set up the runtime environment and import the function.
+
+    Runs once in every worker process of the pool.
+    """
+    global container
+    os.environ.update(environment)
+    os.chdir(task_root)
+    sys.path.insert(0, task_root)
+
+    log = open(log_path, 'a', buffering=1)
+    sys.stdout = sys.stderr = log
+    log_handler = logging.StreamHandler(log)
+    log_handler.setFormatter(logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT))
+    log_handler.addFilter(RequestIdFilter())
+    logging.getLogger().addHandler(log_handler)
+
+    module_name, function_name = handler.rsplit('.', 1)
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    init_ms = (time.perf_counter() - started) * 1000
+    container = {
+        'handler': getattr(module, function_name),
+        'init_ms': init_ms,
+        'invocations': 0,
+        'request_id': None,
+        'log': log,
+    }
+
+
+def invoke(event_name, event, timeout):
+    """
+    Handle one invocation on this process's container and return its timings.
+    """
+    request_id = str(uuid.uuid4())
+    container['request_id'] = request_id
+    cold = container['invocations'] == 0
+    log = container['log']
+    log.write(f"START RequestId: {request_id} Version: $LATEST\n")
+
+    error = None
+    result = None
+    started = time.perf_counter()
+    try:
+        result = container['handler'](event, LambdaContext(request_id, timeout))
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    duration_ms = (time.perf_counter() - started) * 1000
+    container['invocations'] += 1
+
+    max_memory_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    report = (f"REPORT RequestId: {request_id}\tDuration: {duration_ms:.2f} ms\t"
+              f"Billed Duration: {math.ceil(duration_ms)} ms\t"
+              f"Memory Size: {os.environ['AWS_LAMBDA_FUNCTION_MEMORY_SIZE']} MB\t"
+              f"Max Memory Used: {max_memory_mb:.0f} MB")
+    if cold:
+        report += f"\tInit Duration: {container['init_ms']:.2f} ms"
+    log.write(f"END RequestId: {request_id}\n{report}\n")
+
+    return {
+        'event': event_name,
+        'container': os.getpid(),
+        'cold': cold,
+        'init_ms': container['init_ms'] if cold else None,
+        'duration_ms': duration_ms,
+        'timed_out': duration_ms > timeout * 1000,
+        'error': error,
+        'outcome': outcome(result, error),
+        'max_memory_mb': max_memory_mb,
+    }
+
+
+def outcome(result, error):
+    """
+    Short description of what an invocation returned, for counting.
+    """
+    if error is not None:
+        return 'error'
+    if isinstance(result, dict) and 'statusCode' in result:
+        return f"status {result['statusCode']}"
+    if isinstance(result, dict) and 'batchItemFailures' in result:
+        return f"{len(result['batchItemFailures'])} batch item failures"
+    return 'ok'
+
+
+def load_benchmark_module(project):
+    """
+    Import a project's local_benchmark.py, which holds its AWS stand-ins.
+    """
+    path = os.path.join(ROOT_DIR, project, 'assets', 'local_benchmark.py')
+    spec = importlib.util.spec_from_file_location(f"local_benchmark_{project.split('-')[0]}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@contextmanager
+def dynamodb_backend(project, events, latency_ms):
+    """
+    DynamoDB endpoint with generated items plus those the API Gateway events refer to.
+    """
+    benchmark = load_benchmark_module(project)
+    items = benchmark.generate_items(200)
+    for event in events:
+        item_id = (event.get('pathParameters') or {}).get('id')
+        if item_id:
+            items.append(dict(items[0], id=item_id))
+    table = benchmark.StubTable(latency_ms, items)
+    with benchmark.LocalDynamoDBServer(table) as server:
+        yield {'AWS_ENDPOINT_URL_DYNAMODB': server.endpoint_url}, lambda: {'dynamodb': dict(table.calls)}
+
+
+@contextmanager
+def s3_firehose_backend(project, events, latency_ms):
+    """
+    S3 and Firehose endpoint with an object for every S3 event record.
+    """
+    benchmark = load_benchmark_module(project)
+    s3 = benchmark.StubS3Client(latency_ms)
+    for event in events:
+        for record in event.get('Records', []):
+            key = unquote_plus(record['s3']['object']['key'])
+            if os.path.basename(key) == 'sample-data.csv':
+                with open(benchmark.SAMPLE_DATA_FILE, 'rb') as f:
+                    body = f.read()
+            else:
+                body = b''.join(benchmark.iter_csv_chunks(record['s3']['object'].get('size', 1024 * 1024)))
+            s3.put_object(Bucket=record['s3']['bucket']['name'], Key=key, Body=body)
+    firehose = benchmark.StubFirehoseClient(latency_ms, keep_records=False)
+    with benchmark.LocalS3FirehoseServer(s3, firehose) as server:
+        endpoints = {'AWS_ENDPOINT_URL_S3': server.endpoint_url, 'AWS_ENDPOINT_URL_FIREHOSE': server.endpoint_url}
+        yield endpoints, lambda: {
+            's3': s3.calls,
+            'firehose': firehose.calls,
+            'firehose_records': firehose.records_received,
+        }
+
+
+BACKENDS = {
+    'dynamodb': dynamodb_backend,
+    's3-firehose': s3_firehose_backend,
+}
+
+
+def load_events(paths):
+    """
+    Read event files; a directory contributes every *.json file in it, in name order.
+    """
+    events = []
+    for path in paths:
+        files = sorted(glob(os.path.join(path, '*.json'))) if os.path.isdir(path) else [path]
+        for file in files:
+            with open(file) as f:
+                events.append((os.path.basename(file), json.load(f)))
+    if not events:
+        raise SystemExit(f"No event files found in {', '.join(paths)}")
+    return events
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(values):
+    if not values:
+        return None
+    return {
+        'count': len(values),
+        'p50': round(percentile(values, 0.50), 2),
+        'p90': round(percentile(values, 0.90), 2),
+        'p99': round(percentile(values, 0.99), 2),
+        'max': round(max(values), 2),
+    }
+
+
+def build_report(results):
+    by_container = {}
+    by_event = {}
+    for result in results:
+        by_container.setdefault(result['container'], []).append(result)
+        by_event.setdefault(result['event'], []).append(result)
+
+    containers = []
+    for number, invocations in enumerate(by_container.values(), start=1):
+        warm = [result['duration_ms'] for result in invocations if not result['cold']]
+        containers.append({
+            'container': number,
+            'invocations': len(invocations),
+            'init_ms': round(invocations[0]['init_ms'], 2),
+            'first_invocation_ms': round(invocations[0]['duration_ms'], 2),
+            'warm_p50_ms': round(percentile(warm, 0.50), 2) if warm else None,
+            'max_memory_used_mb': round(max(result['max_memory_mb'] for result in invocations), 1),
+        })
+
+    events = {}
+    for name, invocations in by_event.items():
+        outcomes = {}
+        for result in invocations:
+            outcomes[result['outcome']] = outcomes.get(result['outcome'], 0) + 1
+        errors = [result['error'] for result in invocations if result['error']]
+        events[name] = {
+            'invocations': len(invocations),
+            'cold': sum(result['cold'] for result in invocations),
+            'warm_ms': summarize([result['duration_ms'] for result in invocations if not result['cold']]),
+            'outcomes': outcomes,
+        }
+        if errors:
+            events[name]['first_error'] = errors[0]
+
+    cold = [result for result in results if result['cold']]
+    return {
+        'invocations': len(results),
+        'cold_starts': len(cold),
+        'init_ms': summarize([result['init_ms'] for result in cold]),
+        'first_invocation_ms': summarize([result['duration_ms'] for result in cold]),
+        'warm_invocation_ms': summarize([result['duration_ms'] for result in results if not result['cold']]),
+        'errors': sum(result['error'] is not None for result in results),
+        'timeouts': sum(result['timed_out'] for result in results),
+        'containers': containers,
+        'events': events,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('project', choices=sorted(FUNCTIONS), help='project whose Lambda function to run')
+    parser.add_argument('--events', action='append',
+                        help='event file or directory of event files (default: the project\'s assets/events)')
+    parser.add_argument('--containers', type=int, default=2, help='maximum number of concurrent containers')
+    parser.add_argument('--repeat', type=int, default=10, help='times to replay the events')
+    parser.add_argument('--interval-ms', type=float, default=0.0,
+                        help='pause between invocations (0 sends them all at once)')
+    parser.add_argument('--latency-ms', type=float, default=2.0, help='simulated latency of each AWS API call')
+    parser.add_argument('--timeout', type=float, help='function timeout in seconds (default: from the README)')
+    parser.add_argument('--memory-mb', type=int, help='memory size reported to the function (default: from the README)')
+    parser.add_argument('--log-file', default=os.devnull, help='file that receives the function logs')
+    args = parser.parse_args()
+
+    config = FUNCTIONS[args.project]
+    task_root = os.path.join(ROOT_DIR, args.project, 'assets')
+    events = load_events(args.events or [os.path.join(task_root, 'events')])
+    timeout = args.timeout or config['timeout']
+    environment = {
+        'AWS_LAMBDA_FUNCTION_NAME': config['function_name'],
+        'AWS_LAMBDA_FUNCTION_VERSION': '$LATEST',
+        'AWS_LAMBDA_FUNCTION_MEMORY_SIZE': str(args.memory_mb or config['memory_mb']),
+        'AWS_REGION': 'us-east-1',
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        # The local endpoints accept any credentials
+        'AWS_ACCESS_KEY_ID': 'local',
+        'AWS_SECRET_ACCESS_KEY': 'local',
+        'LAMBDA_TASK_ROOT': task_root,
+    }
+
+    with ExitStack() as stack:
+        backend_calls = None
+        if config['backend']:
+            backend = BACKENDS[config['backend']](args.project, [event for _, event in events], args.latency_ms)
+            endpoints, backend_calls = stack.enter_context(backend)
+            environment.update(endpoints)
+
+        # spawn, so every container starts from a fresh interpreter rather than a copy of this one
+        executor = stack.enter_context(ProcessPoolExecutor(
+            max_workers=args.containers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=start_container,
+            initargs=(task_root, config['handler'], environment, os.path.abspath(args.log_file)),
+        ))
+        started = time.perf_counter()
+        futures = []
+        for _ in range(args.repeat):
+            for name, event in events:
+                futures.append(executor.submit(invoke, name, event, timeout))
+                if args.interval_ms:
+                    time.sleep(args.interval_ms / 1000)
+        results = [future.result() for future in futures]
+        elapsed = time.perf_counter() - started
+        aws_calls = backend_calls() if backend_calls else {}
+
+    print(json.dumps({
+        'function': args.project,
+        'handler': config['handler'],
+        'max_containers': args.containers,
+        'aws_latency_ms': args.latency_ms,
+        'seconds': round(elapsed, 3),
+        **build_report(results),
+        'aws_calls': aws_calls,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
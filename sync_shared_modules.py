@@ -0,0 +1,73 @@
+"""
+Copy the modules in shared/ next to every function and app that uses them.
+
+The Lambda functions are deployed as the files of their assets folder (pasted
+into the console editor, or zipped), and the Fargate image is built from
+assets/app, so none of them can import from shared/ directly. Each one gets its
+own copy instead, made by this script. Edit the module in shared/, then run:
+
+    python sync_shared_modules.py
+
+--check changes nothing and exits with status 1 if any copy is missing or is not
+byte-identical to its source, e.g. before a commit or in CI:
+
+    python sync_shared_modules.py --check
+"""
+
+import argparse
+import os
+import shutil
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Shared module -> copies of it, relative to the repository root
+SHARED_MODULES = {
+    'shared/emf_metrics.py': [
+        '02-serverless-api/assets/emf_metrics.py',
+        '03-decoupled-application-sqs-lambda/assets/emf_metrics.py',
+        '08-serverless-data-pipeline/assets/emf_metrics.py',
+        '09-containerized-app-ecs-fargate/assets/app/emf_metrics.py',
+    ],
+}
+
+
+def read_bytes(path):
+    try:
+        with open(os.path.join(ROOT_DIR, path), 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def stale_copies():
+    """
+    Return (source, copy) pairs whose copy is missing or differs from the source.
+    """
+    stale = []
+    for source, copies in SHARED_MODULES.items():
+        content = read_bytes(source)
+        stale.extend((source, copy) for copy in copies if read_bytes(copy) != content)
+    return stale
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--check', action='store_true', help='only report copies that are out of date')
+    args = parser.parse_args()
+
+    stale = stale_copies()
+    for source, copy in stale:
+        if args.check:
+            print(f"{copy} differs from {source}", file=sys.stderr)
+        else:
+            shutil.copyfile(os.path.join(ROOT_DIR, source), os.path.join(ROOT_DIR, copy))
+            print(f"Copied {source} to {copy}")
+
+    if args.check and stale:
+        print('Run python sync_shared_modules.py to update them', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()